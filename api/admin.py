@@ -3,12 +3,19 @@ from django.utils.html import format_html
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 from django.contrib import messages
+from django.db import transaction
 from .models import (
     CustomUser, ArtistProfile, BuyerProfile, Category, Artwork,
     Job, Bid, Equipment, Order, ArtworkOrderItem, EquipmentOrderItem,
-    Payment, Message, Review, Contract, Notification, PlatformAnalytics
+    Payment, Message, Review, Contract, Notification, PlatformAnalytics,
+    ArtworkProcessingJob
 )
 from .email_service import EmailService
+from .analytics_rollups import merge_deltas, record_deltas, revenue_deltas
+from .duplicate_index import refresh_duplicate_neighbourhoods
+from .revenue_rollups import record_payment_revenue
+from .suggest_index import refresh_artworks as refresh_artwork_suggestions
+from .user_stats import refresh_user_stats
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -147,13 +154,24 @@ class ArtworkAdmin(admin.ModelAdmin):
         self.message_user(request, f'{updated} artworks unfeatured.')
     unfeature_artworks.short_description = "Unfeature selected artworks"
     
+    def set_availability(self, queryset, is_available):
+        artworks = Artwork.objects.filter(pk__in=list(queryset.values_list('pk', flat=True)))
+        artwork_ids = list(artworks.values_list('pk', flat=True))
+        updated = artworks.update(is_available=is_available)
+        # update() skips the save signals that keep the duplicate flags, the
+        # search suggestions and the artists' artwork counts current
+        refresh_duplicate_neighbourhoods(artwork_ids)
+        refresh_artwork_suggestions(artwork_ids)
+        refresh_user_stats(artworks.values_list('artist_id', flat=True).distinct(), 'artworks')
+        return updated
+    
     def approve_artworks(self, request, queryset):
-        updated = queryset.update(is_available=True)
+        updated = self.set_availability(queryset, True)
         self.message_user(request, f'{updated} artworks approved.')
     approve_artworks.short_description = "Approve selected artworks"
     
     def reject_artworks(self, request, queryset):
-        updated = queryset.update(is_available=False)
+        updated = self.set_availability(queryset, False)
         self.message_user(request, f'{updated} artworks rejected.')
     reject_artworks.short_description = "Reject selected artworks"
     
@@ -280,7 +298,16 @@ class PaymentAdmin(admin.ModelAdmin):
     payment_actions.short_description = 'Quick Actions'
     
     def refund_payments(self, request, queryset):
-        updated = queryset.filter(status='completed').update(status='refunded')
+        with transaction.atomic():
+            completed = list(queryset.filter(status='completed'))
+            updated = Payment.objects.filter(pk__in=[payment.pk for payment in completed]).update(status='refunded')
+            # update() skips the save signals that keep the rollups and the
+            # payers' and payees' dashboard stats current
+            record_deltas(merge_deltas(*(revenue_deltas(payment.amount, -1) for payment in completed)))
+            for payment in completed:
+                record_payment_revenue(payment, -1)
+            refresh_user_stats({payment.payer_id for payment in completed}, 'payments')
+            refresh_user_stats({payment.payee_id for payment in completed}, 'earnings')
         self.message_user(request, f'{updated} payments refunded.')
     refund_payments.short_description = "Refund selected payments"
     
@@ -332,6 +359,12 @@ class PlatformAnalyticsAdmin(admin.ModelAdmin):
     search_fields = ('date',)
     ordering = ('-date',)
 
+@admin.register(ArtworkProcessingJob)
+class ArtworkProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ('artwork', 'status', 'attempts', 'created_at', 'started_at', 'completed_at')
+    list_filter = ('status',)
+    search_fields = ('artwork__title', 'last_error')
+
 
 # Customize admin site
 admin.site.site_header = "ArtConnect Admin Dashboard"
@@ -2,6 +2,7 @@
 from rest_framework import serializers
 from .models import *
 from .serializers import *
+from .duplicate_clusters import similarity_percentage
 
 class AdminUserSerializer(serializers.ModelSerializer):
     """
@@ -96,15 +97,26 @@ class AdminArtworkSerializer(serializers.ModelSerializer):
             'artist_email', 'category', 'category_name', 'artwork_type',
             'price', 'is_available', 'is_featured', 'views_count', 
             'likes_count', 'created_at', 'updated_at', 'image',
-            'watermarked_image', 'moderation_status'
+            'watermarked_image', 'duplicate_risk', 'moderation_status'
         ]
 
     def get_duplicate_risk(self, obj):
-        if obj.similarity_score > 80:
+        # Nearest-neighbour distances come precomputed from the catalog-wide
+        # clustering pass (see duplicate_clusters.py) instead of a per-row scan
+        distances = self.context.get('duplicate_distances')
+        if distances is None:
+            # Outside the clustering view the stored flag is all there is: it
+            # means a neighbour within DUPLICATE_THRESHOLD bits, a HIGH risk
+            return 'HIGH' if obj.has_duplicates else 'NONE'
+        distance = distances.get(obj.id)
+        if distance is None:
+            return 'NONE'
+        similarity = similarity_percentage(distance)
+        if similarity > 80:
             return 'HIGH'
-        elif obj.similarity_score > 60:
+        elif similarity > 60:
             return 'MEDIUM'
-        elif obj.similarity_score > 40:
+        elif similarity > 40:
             return 'LOW'
         return 'NONE'
 
@@ -20,6 +20,12 @@ admin_urlpatterns = [
     # ===== Dashboard & Analytics =====
     path('dashboard/', admin_dashboard_stats, name='admin-dashboard'),
     path('revenue-report/', admin_revenue_report, name='admin-revenue-report'),
+    path('duplicate-clusters/', admin_duplicate_clusters, name='admin-duplicate-clusters'),
+
+    # ===== Streaming Exports =====
+    path('exports/<str:resource>.<str:export_format>',
+         admin_export,
+         name='admin-export'),
     
     # ===== User Management Actions =====
     path('users/<int:pk>/verify/', 
@@ -118,6 +124,12 @@ Admin API Endpoints Summary:
 DASHBOARD & ANALYTICS:
 - GET    /api/admin/dashboard/                    - Comprehensive admin dashboard stats
 - GET    /api/admin/revenue-report/              - Detailed revenue report with date filters
+- GET    /api/admin/duplicate-clusters/          - Catalog-wide near-duplicate artwork groups
+
+EXPORTS (streamed; accept the Payment/Order/CustomUser filter parameters):
+- GET    /api/admin/exports/payments.csv         - Payments as CSV (or .ndjson)
+- GET    /api/admin/exports/orders.csv           - Orders as CSV (or .ndjson)
+- GET    /api/admin/exports/users.csv            - Users as CSV (or .ndjson)
 
 USER MANAGEMENT:
 - GET    /api/admin/users/                       - List all users with admin details
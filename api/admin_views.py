@@ -7,6 +7,7 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.db.models import Q, Avg, Count, Sum, F
 from django.utils import timezone
@@ -16,6 +17,14 @@ from decimal import Decimal
 
 from .models import *
 from .serializers import *
+from .admin_serializers import AdminArtworkSerializer
+from .duplicate_clusters import MAX_THRESHOLD, find_catalog_duplicate_groups
+from .exports import CONTENT_TYPES, EXPORTS, export_response, filtered_export
+from .duplicate_index import refresh_duplicate_neighbourhoods
+from .pagination import CursorSelectablePaginationMixin
+from .stats_cache import get_or_compute
+from .suggest_index import refresh_artworks as refresh_artwork_suggestions
+from .user_stats import refresh_user_stats
 from .permissions import IsOwnerOrReadOnly, IsArtistOrReadOnly, IsBuyerOrReadOnly
 
 User = get_user_model()
@@ -32,8 +41,8 @@ class IsAdminOrStaff(permissions.BasePermission):
             (request.user.user_type == 'admin' or request.user.is_staff or request.user.is_superuser)
         )
 
-# Admin Pagination
-class AdminPagination(PageNumberPagination):
+# Admin Pagination; `?pagination=cursor` switches a request to keyset pages
+class AdminPagination(CursorSelectablePaginationMixin, PageNumberPagination):
     page_size = 50
     page_size_query_param = 'page_size'
     max_page_size = 200
@@ -390,70 +399,108 @@ class AdminOrderManagementViewSet(ModelViewSet):
 @permission_classes([IsAdminOrStaff])
 def admin_dashboard_stats(request):
     """
-    Comprehensive admin dashboard statistics
+    Comprehensive admin dashboard statistics, cached for
+    ADMIN_DASHBOARD_CACHE_TTL seconds and recomputed by one request at a time
     """
+    return Response(get_or_compute(
+        'admin_dashboard_stats',
+        compute_admin_dashboard_stats,
+        ttl=getattr(settings, 'ADMIN_DASHBOARD_CACHE_TTL', 60),
+    ))
+
+
+def compute_admin_dashboard_stats():
+    """One conditional-aggregation query per table"""
     # Date ranges
     today = timezone.now().date()
     week_ago = today - timedelta(days=7)
     month_ago = today - timedelta(days=30)
 
     # User stats
-    user_stats = {
-        'total_users': CustomUser.objects.count(),
-        'new_users_today': CustomUser.objects.filter(created_at__date=today).count(),
-        'new_users_week': CustomUser.objects.filter(created_at__date__gte=week_ago).count(),
-        'new_users_month': CustomUser.objects.filter(created_at__date__gte=month_ago).count(),
-        'verified_users': CustomUser.objects.filter(is_verified=True).count(),
-        'active_users': CustomUser.objects.filter(is_active=True).count(),
-        'artists': CustomUser.objects.filter(user_type='artist').count(),
-        'buyers': CustomUser.objects.filter(user_type='buyer').count(),
-    }
+    user_stats = CustomUser.objects.aggregate(
+        total_users=Count('id'),
+        new_users_today=Count('id', filter=Q(created_at__date=today)),
+        new_users_week=Count('id', filter=Q(created_at__date__gte=week_ago)),
+        new_users_month=Count('id', filter=Q(created_at__date__gte=month_ago)),
+        verified_users=Count('id', filter=Q(is_verified=True)),
+        active_users=Count('id', filter=Q(is_active=True)),
+        artists=Count('id', filter=Q(user_type='artist')),
+        buyers=Count('id', filter=Q(user_type='buyer')),
+    )
 
     # Content stats
+    artworks = Artwork.objects.aggregate(
+        total_artworks=Count('id'),
+        featured_artworks=Count('id', filter=Q(is_featured=True)),
+    )
+    jobs = Job.objects.aggregate(
+        total_jobs=Count('id'),
+        active_jobs=Count('id', filter=Q(status='open')),
+        in_progress_jobs=Count('id', filter=Q(status='in_progress')),
+        completed_jobs=Count('id', filter=Q(status='completed')),
+    )
+    categories = Category.objects.aggregate(
+        total_categories=Count('id'),
+        active_categories=Count('id', filter=Q(is_active=True)),
+    )
     content_stats = {
-        'total_artworks': Artwork.objects.count(),
-        'featured_artworks': Artwork.objects.filter(is_featured=True).count(),
+        'total_artworks': artworks['total_artworks'],
+        'featured_artworks': artworks['featured_artworks'],
         'pending_artworks': 0,  # No longer using AI review
-        'total_jobs': Job.objects.count(),
-        'active_jobs': Job.objects.filter(status='open').count(),
-        'in_progress_jobs': Job.objects.filter(status='in_progress').count(),
-        'completed_jobs': Job.objects.filter(status='completed').count(),
-        'total_categories': Category.objects.count(),
-        'active_categories': Category.objects.filter(is_active=True).count(),
+        **jobs,
+        **categories,
     }
 
     # Financial stats
+    completed = Q(status='completed')
+    payments = Payment.objects.aggregate(
+        total_revenue=Sum('amount', filter=completed),
+        revenue_today=Sum('amount', filter=completed & Q(created_at__date=today)),
+        revenue_week=Sum('amount', filter=completed & Q(created_at__date__gte=week_ago)),
+        revenue_month=Sum('amount', filter=completed & Q(created_at__date__gte=month_ago)),
+        total_payments=Count('id'),
+        completed_payments=Count('id', filter=completed),
+        pending_payments=Count('id', filter=Q(status='pending')),
+    )
+    orders = Order.objects.aggregate(
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        completed_orders=Count('id', filter=Q(status='delivered')),
+    )
     financial_stats = {
-        'total_revenue': Payment.objects.filter(status='completed').aggregate(
-            Sum('amount')
-        )['amount__sum'] or 0,
-        'revenue_today': Payment.objects.filter(
-            status='completed', created_at__date=today
-        ).aggregate(Sum('amount'))['amount__sum'] or 0,
-        'revenue_week': Payment.objects.filter(
-            status='completed', created_at__date__gte=week_ago
-        ).aggregate(Sum('amount'))['amount__sum'] or 0,
-        'revenue_month': Payment.objects.filter(
-            status='completed', created_at__date__gte=month_ago
-        ).aggregate(Sum('amount'))['amount__sum'] or 0,
-        'total_payments': Payment.objects.count(),
-        'completed_payments': Payment.objects.filter(status='completed').count(),
-        'pending_payments': Payment.objects.filter(status='pending').count(),
-        'total_orders': Order.objects.count(),
-        'pending_orders': Order.objects.filter(status='pending').count(),
-        'completed_orders': Order.objects.filter(status='delivered').count(),
+        'total_revenue': payments['total_revenue'] or 0,
+        'revenue_today': payments['revenue_today'] or 0,
+        'revenue_week': payments['revenue_week'] or 0,
+        'revenue_month': payments['revenue_month'] or 0,
+        'total_payments': payments['total_payments'],
+        'completed_payments': payments['completed_payments'],
+        'pending_payments': payments['pending_payments'],
+        **orders,
     }
 
     # Activity stats
+    bids = Bid.objects.aggregate(
+        total_bids=Count('id'),
+        pending_bids=Count('id', filter=Q(status='pending')),
+    )
+    messages = Message.objects.aggregate(
+        total_messages=Count('id'),
+        unread_messages=Count('id', filter=Q(is_read=False)),
+    )
+    reviews = Review.objects.aggregate(
+        total_reviews=Count('id'),
+        average_rating=Avg('rating'),
+    )
+    contracts = Contract.objects.aggregate(
+        total_contracts=Count('id'),
+        active_contracts=Count('id', filter=Q(status='active')),
+    )
     activity_stats = {
-        'total_bids': Bid.objects.count(),
-        'pending_bids': Bid.objects.filter(status='pending').count(),
-        'total_messages': Message.objects.count(),
-        'unread_messages': Message.objects.filter(is_read=False).count(),
-        'total_reviews': Review.objects.count(),
-        'average_rating': Review.objects.aggregate(Avg('rating'))['rating__avg'] or 0,
-        'total_contracts': Contract.objects.count(),
-        'active_contracts': Contract.objects.filter(status='active').count(),
+        **bids,
+        **messages,
+        'total_reviews': reviews['total_reviews'],
+        'average_rating': reviews['average_rating'] or 0,
+        **contracts,
     }
 
     # Recent activity
@@ -481,20 +528,20 @@ def admin_dashboard_stats(request):
         ),
     }
 
-    return Response({
+    return {
         'user_stats': user_stats,
         'content_stats': content_stats,
         'financial_stats': financial_stats,
         'activity_stats': activity_stats,
         'recent_activity': recent_activity,
         'generated_at': timezone.now(),
-    })
+    }
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrStaff])
 def admin_revenue_report(request):
     """
-    Detailed revenue report for admin
+    Detailed revenue report for admin, read from the daily revenue rollups
     """
     # Get date range from query params
     start_date = request.GET.get('start_date')
@@ -510,44 +557,35 @@ def admin_revenue_report(request):
     else:
         end_date = timezone.now().date()
 
+    # Read from the daily rollups, see api.revenue_rollups
+    revenue = RevenueRollup.objects.filter(day__range=[start_date, end_date]).order_by()
+    spend = BuyerSpendRollup.objects.filter(day__range=[start_date, end_date]).order_by()
+
     # Revenue by payment method
-    revenue_by_method = Payment.objects.filter(
-        status='completed',
-        created_at__date__range=[start_date, end_date]
-    ).values('payment_method').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('-total')
+    revenue_by_method = revenue.values('payment_method').annotate(
+        total=Sum('total'),
+        count=Sum('payment_count')
+    ).filter(count__gt=0).order_by('-total')
 
     # Daily revenue
-    daily_revenue = Payment.objects.filter(
-        status='completed',
-        created_at__date__range=[start_date, end_date]
-    ).extra(
-        select={'day': 'date(created_at)'}
-    ).values('day').annotate(
-        total=Sum('amount'),
-        count=Count('id')
-    ).order_by('day')
+    daily_revenue = revenue.values('day').annotate(
+        total=Sum('total'),
+        count=Sum('payment_count')
+    ).filter(count__gt=0).order_by('day')
 
     # Top earning artists
-    top_artists = Payment.objects.filter(
-        status='completed',
-        payee__isnull=False,
-        created_at__date__range=[start_date, end_date]
-    ).values('payee__username').annotate(
-        total_earned=Sum('amount'),
-        payment_count=Count('id')
-    ).order_by('-total_earned')[:10]
+    top_artists = revenue.filter(payee__isnull=False).values('payee__username').annotate(
+        total_earned=Sum('total'),
+        payment_count=Sum('payment_count')
+    ).filter(payment_count__gt=0).order_by('-total_earned')[:10]
 
     # Top spending buyers
-    top_buyers = Payment.objects.filter(
-        status='completed',
-        created_at__date__range=[start_date, end_date]
-    ).values('payer__username').annotate(
-        total_spent=Sum('amount'),
-        payment_count=Count('id')
-    ).order_by('-total_spent')[:10]
+    top_buyers = spend.values('payer__username').annotate(
+        total_spent=Sum('total'),
+        payment_count=Sum('payment_count')
+    ).filter(payment_count__gt=0).order_by('-total_spent')[:10]
+
+    totals = revenue.aggregate(total_revenue=Sum('total'), total_transactions=Sum('payment_count'))
 
     return Response({
         'date_range': {
@@ -558,14 +596,70 @@ def admin_revenue_report(request):
         'daily_revenue': list(daily_revenue),
         'top_artists': list(top_artists),
         'top_buyers': list(top_buyers),
-        'total_revenue': Payment.objects.filter(
-            status='completed',
-            created_at__date__range=[start_date, end_date]
-        ).aggregate(Sum('amount'))['amount__sum'] or 0,
-        'total_transactions': Payment.objects.filter(
-            status='completed',
-            created_at__date__range=[start_date, end_date]
-        ).count(),
+        'total_revenue': totals['total_revenue'] or 0,
+        'total_transactions': totals['total_transactions'] or 0,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def admin_export(request, resource, export_format):
+    """
+    Stream every payment, order or user matching the api.filters FilterSet
+    parameters as CSV or NDJSON, e.g. /api/admin/exports/payments.csv?status=completed
+    """
+    if resource not in EXPORTS or export_format not in CONTENT_TYPES:
+        return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+
+    filterset, spec = filtered_export(resource, request.GET)
+    if not filterset.is_valid():
+        return Response(filterset.errors, status=status.HTTP_400_BAD_REQUEST)
+    return export_response(resource, filterset, spec, export_format)
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def admin_duplicate_clusters(request):
+    """
+    Catalog-wide near-duplicate groups based on perceptual hashes
+    """
+    try:
+        threshold = int(request.GET.get('threshold', 5))
+    except ValueError:
+        return Response({'error': 'threshold must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 <= threshold <= MAX_THRESHOLD:
+        return Response(
+            {'error': f'threshold must be between 0 and {MAX_THRESHOLD}'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    available_only = request.GET.get('available_only', 'false').lower() in ('1', 'true', 'yes')
+
+    started = timezone.now()
+    scanned, groups = find_catalog_duplicate_groups(threshold=threshold, available_only=available_only)
+
+    # Serialize every clustered artwork once, with its nearest-neighbour
+    # distance so the serializer can report duplicate risk without rescanning
+    nearest = {}
+    for group in groups:
+        nearest.update(group['nearest_distances'])
+    artworks = Artwork.objects.select_related('artist', 'category').in_bulk(list(nearest))
+    serializer_context = {'request': request, 'duplicate_distances': nearest}
+
+    results = []
+    for group in groups:
+        members = [artworks[artwork_id] for artwork_id in group['artwork_ids'] if artwork_id in artworks]
+        results.append({
+            'size': group['size'],
+            'max_distance': group['max_distance'],
+            'artworks': AdminArtworkSerializer(members, many=True, context=serializer_context).data,
+            'pairs': group['pairs'],
+        })
+
+    return Response({
+        'threshold': threshold,
+        'available_only': available_only,
+        'artworks_scanned': scanned,
+        'group_count': len(results),
+        'duplicate_artworks': len(nearest),
+        'groups': results,
+        'elapsed_ms': int((timezone.now() - started).total_seconds() * 1000),
     })
 
 @api_view(['POST'])
@@ -636,4 +730,11 @@ def bulk_artwork_action(request):
     else:
         return Response({'error': 'Invalid action'}, status=status.HTTP_400_BAD_REQUEST)
     
+    if action in ('approve', 'reject'):
+        # .update() skips the save signals, so refresh duplicate flags,
+        # suggestions and the artists' artwork counts by hand
+        refresh_duplicate_neighbourhoods(artwork_ids)
+        refresh_artwork_suggestions(artwork_ids)
+        refresh_user_stats(artworks.values_list('artist_id', flat=True).distinct(), 'artworks')
+    
     return Response({'message': message, 'affected_artworks': count})
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+Hourly platform analytics rollups.
+
+Every signup, job post, job completion, artwork upload and completed payment
+adds its delta to the AnalyticsRollup row of the hour it happened in, so
+platform totals are a SUM over a few rows per day instead of a recount of
+every table. The signals in api.signals record the deltas; code that bypasses
+the save signals with QuerySet.update() calls record_deltas itself. The
+backfill_analytics_rollups command rebuilds the rows from history.
+"""
+
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from .models import AnalyticsRollup
+
+
+PLATFORM_FEE_RATE = Decimal('0.05')
+
+DELTA_FIELDS = [
+    'users_joined', 'artists_joined', 'buyers_joined', 'admins_joined',
+    'jobs_posted', 'jobs_completed', 'artworks_uploaded', 'revenue', 'platform_fees',
+]
+DECIMAL_FIELDS = {'revenue', 'platform_fees'}
+
+
+def bucket_start(at=None):
+    """Start of the UTC hour `at` (default now) falls in"""
+    at = (at or timezone.now()).astimezone(dt_timezone.utc)
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def user_deltas(user_type, sign=1):
+    deltas = {'users_joined': sign}
+    if user_type in ('artist', 'buyer', 'admin'):
+        deltas[f'{user_type}s_joined'] = sign
+    return deltas
+
+
+def revenue_deltas(amount, sign=1):
+    amount = Decimal(amount or 0)
+    return {
+        'revenue': sign * amount,
+        'platform_fees': sign * (amount * PLATFORM_FEE_RATE).quantize(Decimal('0.01')),
+    }
+
+
+def merge_deltas(*deltas):
+    merged = {}
+    for delta in deltas:
+        for field, value in delta.items():
+            merged[field] = merged.get(field, 0) + value
+    return merged
+
+
+def record_deltas(deltas, at=None):
+    """Add the deltas to the rollup of the hour `at` (default now)"""
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    bucket = bucket_start(at)
+    increments = {field: F(field) + value for field, value in deltas.items()}
+    if AnalyticsRollup.objects.filter(bucket=bucket).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            AnalyticsRollup.objects.create(bucket=bucket, **deltas)
+    except IntegrityError:
+        # Created concurrently by another event of the same hour
+        AnalyticsRollup.objects.filter(bucket=bucket).update(**increments)
+
+
+def _zeroed(row):
+    return {
+        field: (row[field] or Decimal('0.00')) if field in DECIMAL_FIELDS else (row[field] or 0)
+        for field in DELTA_FIELDS
+    }
+
+
+def rollup_totals(until=None):
+    """Cumulative totals of every rollup before `until` (default all)"""
+    rollups = AnalyticsRollup.objects.all()
+    if until is not None:
+        rollups = rollups.filter(bucket__lt=until)
+    return _zeroed(rollups.aggregate(**{field: Sum(field) for field in DELTA_FIELDS}))
+
+
+def rollup_series(since, granularity='hour'):
+    """Per hour or per day deltas since `since`, oldest first"""
+    rollups = AnalyticsRollup.objects.filter(bucket__gte=since)
+    if granularity == 'day':
+        rows = rollups.order_by().values(period=TruncDay('bucket')).annotate(
+            **{field: Sum(field) for field in DELTA_FIELDS}
+        ).order_by('period')
+    else:
+        rows = rollups.values(*DELTA_FIELDS, period=F('bucket')).order_by('period')
+    return [{'period': row['period'], **_zeroed(row)} for row in rows]
@@ -0,0 +1,209 @@
+"""
+Catalog-wide near-duplicate clustering over artwork perceptual hashes.
+
+All hashes are packed into a contiguous (N, words) uint64 matrix and compared
+block by block with XOR + popcount, so memory stays bounded by the block size
+no matter how large the catalog is. Pairs within the Hamming threshold are
+merged with a union-find into connected components (duplicate groups).
+"""
+
+import numpy as np
+
+from .models import Artwork
+
+
+# 512 x 512 rows x 4 words x 8 bytes = 8MB of XOR scratch space per block
+DEFAULT_BLOCK_SIZE = 512
+# Largest Hamming threshold accepted from callers; past a quarter of the 256
+# hash bits unrelated images start to cluster and the pair list explodes
+MAX_THRESHOLD = 64
+
+_BYTE_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def similarity_percentage(distance):
+    """Same percentage scale used by the duplicate check endpoints"""
+    return round((64 - distance) / 64 * 100, 2)
+
+
+def _popcount(words):
+    """Per-element popcount of a uint64 array"""
+    bitwise_count = getattr(np, 'bitwise_count', None)
+    if bitwise_count is not None:
+        return bitwise_count(words)
+    as_bytes = words.view(np.uint8).reshape(words.shape + (8,))
+    return _BYTE_POPCOUNT[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def pack_hashes(rows):
+    """
+    Pack (artwork_id, hex_hash) rows into an id vector and a uint64 matrix.
+
+    Hashes whose length differs from the most common one (e.g. left over from
+    an older hash size) or that are not valid hex are skipped.
+    """
+    rows = [(artwork_id, hash_hex) for artwork_id, hash_hex in rows if hash_hex]
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 1), dtype=np.uint64)
+
+    lengths = {}
+    for _, hash_hex in rows:
+        lengths[len(hash_hex)] = lengths.get(len(hash_hex), 0) + 1
+    hex_length = max(lengths, key=lengths.get)
+    # Pad to a whole number of 64-bit words
+    padded_length = -(-hex_length // 16) * 16
+
+    ids = []
+    chunks = []
+    for artwork_id, hash_hex in rows:
+        if len(hash_hex) != hex_length:
+            continue
+        try:
+            chunks.append(bytes.fromhex(hash_hex.rjust(padded_length, '0')))
+        except ValueError:
+            continue
+        ids.append(artwork_id)
+
+    words = padded_length // 16
+    matrix = np.frombuffer(b''.join(chunks), dtype='>u8').astype(np.uint64)
+    return np.asarray(ids, dtype=np.int64), np.ascontiguousarray(matrix.reshape(len(ids), words))
+
+
+def iter_close_pairs(matrix, threshold, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Yield (i, j, distance) arrays for every row pair i < j whose Hamming
+    distance is <= threshold, one batch per block pair.
+    """
+    count = matrix.shape[0]
+    for start_i in range(0, count, block_size):
+        block_i = matrix[start_i:start_i + block_size]
+        for start_j in range(start_i, count, block_size):
+            block_j = matrix[start_j:start_j + block_size]
+
+            xor = block_i[:, None, :] ^ block_j[None, :, :]
+            distances = _popcount(xor).sum(axis=-1, dtype=np.uint16)
+
+            mask = distances <= threshold
+            if start_i == start_j:
+                # Only the strict upper triangle of a diagonal block
+                mask &= np.triu(np.ones(mask.shape, dtype=bool), k=1)
+
+            rows_i, rows_j = np.nonzero(mask)
+            if rows_i.size:
+                yield rows_i + start_i, rows_j + start_j, distances[rows_i, rows_j]
+
+
+class _UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+
+def find_duplicate_groups(rows, threshold=5, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Cluster (artwork_id, hex_hash) rows into duplicate groups.
+
+    Returns a list of groups, largest first. Each group is a dict with the
+    member artwork ids, every close pair inside the group with its distance,
+    and each member's distance to its nearest neighbour.
+    """
+    ids, matrix = pack_hashes(rows)
+    union_find = _UnionFind(len(ids))
+    pairs = []
+
+    for rows_i, rows_j, distances in iter_close_pairs(matrix, threshold, block_size):
+        for i, j, distance in zip(rows_i.tolist(), rows_j.tolist(), distances.tolist()):
+            union_find.union(i, j)
+            pairs.append((i, j, distance))
+
+    groups = {}
+    nearest = {}
+    for i, j, distance in pairs:
+        root = union_find.find(i)
+        group = groups.setdefault(root, {'members': set(), 'pairs': []})
+        group['members'].update((i, j))
+        group['pairs'].append((int(ids[i]), int(ids[j]), distance))
+        for row in (i, j):
+            if distance < nearest.get(row, distance + 1):
+                nearest[row] = distance
+
+    results = []
+    for group in groups.values():
+        members = sorted(group['members'])
+        group_pairs = sorted(group['pairs'], key=lambda pair: (pair[2], pair[0], pair[1]))
+        results.append({
+            'artwork_ids': [int(ids[row]) for row in members],
+            'size': len(members),
+            'max_distance': max(pair[2] for pair in group_pairs),
+            'nearest_distances': {int(ids[row]): nearest[row] for row in members},
+            'pairs': [
+                {
+                    'artwork_a': a,
+                    'artwork_b': b,
+                    'similarity_score': distance,
+                    'similarity_percentage': similarity_percentage(distance),
+                }
+                for a, b, distance in group_pairs
+            ],
+        })
+
+    results.sort(key=lambda group: (-group['size'], group['artwork_ids'][0]))
+    return results
+
+
+def find_catalog_duplicate_groups(threshold=5, available_only=False, block_size=DEFAULT_BLOCK_SIZE):
+    """Run find_duplicate_groups over every hashed artwork in the catalog"""
+    queryset = Artwork.objects.filter(perceptual_hash__isnull=False)
+    if available_only:
+        queryset = queryset.filter(is_available=True)
+    rows = queryset.values_list('id', 'perceptual_hash').order_by('id')
+    rows = list(rows.iterator(chunk_size=5000))
+    return len(rows), find_duplicate_groups(rows, threshold, block_size)
+
+
+def sync_duplicate_flags(threshold=5, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    Recompute Artwork.has_duplicates for the whole catalog in one pass.
+
+    Used to backfill the flag and to repair it after bulk writes. Returns the
+    number of artworks flagged.
+    """
+    rows = Artwork.objects.filter(perceptual_hash__isnull=False).values_list(
+        'id', 'perceptual_hash', 'is_available'
+    ).order_by('id')
+    rows = list(rows.iterator(chunk_size=5000))
+    available = {artwork_id for artwork_id, _, is_available in rows if is_available}
+
+    ids, matrix = pack_hashes((artwork_id, hash_hex) for artwork_id, hash_hex, _ in rows)
+    flagged = set()
+    for rows_i, rows_j, _ in iter_close_pairs(matrix, threshold, block_size):
+        for a, b in zip(ids[rows_i].tolist(), ids[rows_j].tolist()):
+            if b in available:
+                flagged.add(a)
+            if a in available:
+                flagged.add(b)
+
+    # Both directions in chunks of 500 ids, within SQLite's variable limit
+    stale_ids = sorted(
+        set(Artwork.objects.filter(has_duplicates=True).values_list('id', flat=True).iterator(chunk_size=5000))
+        - flagged
+    )
+    for start in range(0, len(stale_ids), 500):
+        Artwork.objects.filter(id__in=stale_ids[start:start + 500]).update(has_duplicates=False)
+    flagged_ids = sorted(flagged)
+    for start in range(0, len(flagged_ids), 500):
+        Artwork.objects.filter(
+            id__in=flagged_ids[start:start + 500], has_duplicates=False
+        ).update(has_duplicates=True)
+    return len(flagged)
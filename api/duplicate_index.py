@@ -0,0 +1,365 @@
+"""
+In-memory BK-tree index over artwork perceptual hashes.
+
+The index maps the 256-bit aHash of every hashed artwork to its id so that a
+radius-k Hamming query only walks the part of the tree within k bits of the
+probe, instead of comparing the probe against every row in the catalog.
+
+It is loaded lazily once per worker process and kept up to date from the
+Artwork save/delete signals. Hashes written by other processes (new uploads,
+the process_artwork_jobs worker, the rehash_artworks command) are picked up
+before each lookup by an indexed range query on Artwork.updated_at, which
+every writer of perceptual_hash bumps. Matches are checked against the
+database before they are returned, so artworks deleted or re-hashed
+elsewhere never show up as stale duplicates. The whole index is still
+reloaded every MAX_AGE seconds to catch anything the sync missed.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+
+# Hamming distance at which two artworks count as duplicates of each other
+DUPLICATE_THRESHOLD = 5
+
+
+def parse_hash(hash_hex):
+    """Convert a hex perceptual hash into an int, or None if it is invalid"""
+    if not hash_hex:
+        return None
+    try:
+        return int(hash_hex, 16)
+    except (TypeError, ValueError):
+        return None
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two integer hashes"""
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree keyed on Hamming distance.
+
+    Every node holds one hash value and the set of ids that share it. Children
+    are keyed by their distance to the parent, so the triangle inequality lets
+    a query skip every subtree outside [d - radius, d + radius].
+
+    BK-trees do not support structural deletion: removing an id only empties
+    the id set of its node, which keeps routing through it. The owner rebuilds
+    the tree once too many empty nodes have accumulated.
+    """
+
+    __slots__ = ('root', 'size', 'node_count')
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+        self.node_count = 0
+
+    @staticmethod
+    def _new_node(value, item_id):
+        # [hash value, set of ids, {distance: child node}]
+        return [value, {item_id}, {}]
+
+    def add(self, value, item_id):
+        """Insert item_id under the given hash value"""
+        self.size += 1
+        if self.root is None:
+            self.root = self._new_node(value, item_id)
+            self.node_count = 1
+            return
+
+        node = self.root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                if item_id in node[1]:
+                    self.size -= 1
+                node[1].add(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = self._new_node(value, item_id)
+                self.node_count += 1
+                return
+            node = child
+
+    def remove(self, value, item_id):
+        """Remove item_id from the node holding value; returns True if found"""
+        node = self.root
+        while node is not None:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                if item_id in node[1]:
+                    node[1].discard(item_id)
+                    self.size -= 1
+                    return True
+                return False
+            node = node[2].get(distance)
+        return False
+
+    def query(self, value, radius):
+        """Return a list of (item_id, distance) within radius of value"""
+        results = []
+        if self.root is None:
+            return results
+
+        stack = [self.root]
+        while stack:
+            node_value, ids, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius:
+                for item_id in ids:
+                    results.append((item_id, distance))
+            low = distance - radius
+            high = distance + radius
+            for child_distance, child in children.items():
+                if low <= child_distance <= high:
+                    stack.append(child)
+        return results
+
+
+class PerceptualHashIndex:
+    """
+    Process-wide duplicate lookup index.
+
+    Holds a BKTree plus an id -> hash map so that updates can find the node
+    an artwork currently lives in. All public methods are thread safe.
+    """
+
+    # Rebuild the tree once more than this share of nodes are empty
+    REBUILD_RATIO = 0.5
+    # Reload from the database after this many seconds
+    MAX_AGE = 15 * 60
+    # Re-read rows updated this long before the last sync, for clock skew
+    # between processes and transactions that committed late
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tree = BKTree()
+        self._hashes = {}
+        self._synced_at = None
+        self._loaded = False
+        self._loaded_at = 0
+
+    def _load(self):
+        from .models import Artwork
+
+        tree = BKTree()
+        hashes = {}
+        synced_at = timezone.now()
+        rows = Artwork.objects.filter(
+            perceptual_hash__isnull=False
+        ).values_list('id', 'perceptual_hash').order_by('id')
+
+        for artwork_id, hash_hex in rows.iterator(chunk_size=2000):
+            value = parse_hash(hash_hex)
+            if value is None:
+                continue
+            tree.add(value, artwork_id)
+            hashes[artwork_id] = value
+
+        self._tree = tree
+        self._hashes = hashes
+        self._synced_at = synced_at
+        self._loaded = True
+        self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self):
+        if not self._loaded or time.monotonic() - self._loaded_at > self.MAX_AGE:
+            self._load()
+            return
+
+        # Pick up hashes written by other processes since the last sync.
+        # This is a range scan on the updated_at index, so it stays cheap.
+        from .models import Artwork
+
+        synced_at = timezone.now()
+        changed = Artwork.objects.filter(
+            updated_at__gte=self._synced_at - self.SYNC_OVERLAP
+        ).values_list('id', 'perceptual_hash')
+        for artwork_id, hash_hex in changed:
+            self._add(artwork_id, hash_hex)
+        self._synced_at = synced_at
+
+    def _verified(self, matches, value):
+        """Drop matches deleted or re-hashed by other processes since they were indexed"""
+        from .models import Artwork
+
+        if not matches:
+            return matches
+        current = dict(
+            Artwork.objects.filter(id__in=[artwork_id for artwork_id, _ in matches]).values_list(
+                'id', 'perceptual_hash'
+            )
+        )
+        verified = []
+        for artwork_id, distance in matches:
+            if artwork_id not in current:
+                self._discard(artwork_id)
+                continue
+            if parse_hash(current[artwork_id]) != self._hashes.get(artwork_id):
+                self._add(artwork_id, current[artwork_id])
+                new_value = self._hashes.get(artwork_id)
+                if new_value is None:
+                    continue
+                distance = hamming_distance(value, new_value)
+            verified.append((artwork_id, distance))
+        return verified
+
+    def _add(self, artwork_id, hash_hex):
+        value = parse_hash(hash_hex)
+        current = self._hashes.get(artwork_id)
+        if current == value:
+            return
+        if current is not None:
+            self._tree.remove(current, artwork_id)
+            del self._hashes[artwork_id]
+        if value is not None:
+            self._tree.add(value, artwork_id)
+            self._hashes[artwork_id] = value
+        self._maybe_rebuild()
+
+    def _maybe_rebuild(self):
+        tree = self._tree
+        if tree.node_count > 64 and tree.node_count - tree.size > tree.node_count * self.REBUILD_RATIO:
+            rebuilt = BKTree()
+            for artwork_id, value in self._hashes.items():
+                rebuilt.add(value, artwork_id)
+            self._tree = rebuilt
+
+    def update(self, artwork_id, hash_hex):
+        """Insert or move an artwork after it was saved"""
+        with self._lock:
+            if not self._loaded:
+                # Will be read from the database on first use
+                return
+            self._add(artwork_id, hash_hex)
+
+    def _discard(self, artwork_id):
+        value = self._hashes.pop(artwork_id, None)
+        if value is not None:
+            self._tree.remove(value, artwork_id)
+            self._maybe_rebuild()
+
+    def discard(self, artwork_id):
+        """Drop an artwork after it was deleted"""
+        with self._lock:
+            self._discard(artwork_id)
+
+    def query(self, hash_hex, radius):
+        """
+        Return [(artwork_id, distance), ...] for all indexed artworks within
+        `radius` bits of hash_hex, closest first.
+        """
+        value = parse_hash(hash_hex)
+        if value is None:
+            return []
+        with self._lock:
+            self._ensure_loaded()
+            matches = self._verified(self._tree.query(value, radius), value)
+        matches = [match for match in matches if match[1] <= radius]
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def reset(self):
+        """Forget everything; the next query reloads from the database"""
+        with self._lock:
+            self._tree = BKTree()
+            self._hashes = {}
+            self._synced_at = None
+            self._loaded = False
+
+    def __len__(self):
+        return len(self._hashes)
+
+
+_index = PerceptualHashIndex()
+
+
+def get_duplicate_index():
+    """Return the perceptual hash index of the current process"""
+    return _index
+
+
+def refresh_duplicate_flags(artwork_ids, threshold=DUPLICATE_THRESHOLD):
+    """
+    Recompute the stored has_duplicates flag for the given artworks.
+
+    An artwork has duplicates when some other available artwork lies within
+    `threshold` bits of its perceptual hash. Returns {artwork_id: flag}.
+    """
+    from .models import Artwork
+
+    artwork_ids = set(artwork_ids)
+    if not artwork_ids:
+        return {}
+
+    index = get_duplicate_index()
+    hashes = dict(
+        Artwork.objects.filter(id__in=artwork_ids).values_list('id', 'perceptual_hash')
+    )
+    neighbours = {
+        artwork_id: [
+            other_id for other_id, _ in index.query(hash_hex, threshold)
+            if other_id != artwork_id
+        ]
+        for artwork_id, hash_hex in hashes.items()
+        if hash_hex
+    }
+
+    candidate_ids = {other_id for ids in neighbours.values() for other_id in ids}
+    available_ids = set(
+        Artwork.objects.filter(id__in=candidate_ids, is_available=True).values_list('id', flat=True)
+    )
+
+    flags = {
+        artwork_id: any(other_id in available_ids for other_id in neighbours.get(artwork_id, ()))
+        for artwork_id in hashes
+    }
+
+    flagged = [artwork_id for artwork_id, flag in flags.items() if flag]
+    unflagged = [artwork_id for artwork_id, flag in flags.items() if not flag]
+    # Plain UPDATEs so that no save signals fire again
+    if flagged:
+        Artwork.objects.filter(id__in=flagged, has_duplicates=False).update(has_duplicates=True)
+    if unflagged:
+        Artwork.objects.filter(id__in=unflagged, has_duplicates=True).update(has_duplicates=False)
+    return flags
+
+
+def refresh_duplicate_neighbourhoods(artwork_ids, threshold=DUPLICATE_THRESHOLD):
+    """
+    Refresh the flags of the given artworks and of every artwork within
+    `threshold` bits of them, since their hash or availability affects all of
+    their neighbours. Use after bulk .update() calls that bypass the signals.
+    """
+    from .models import Artwork
+
+    artwork_ids = set(artwork_ids)
+    index = get_duplicate_index()
+    affected = set(artwork_ids)
+    hashes = Artwork.objects.filter(
+        id__in=artwork_ids, perceptual_hash__isnull=False
+    ).values_list('perceptual_hash', flat=True)
+    for hash_hex in hashes:
+        affected.update(other_id for other_id, _ in index.query(hash_hex, threshold))
+    return refresh_duplicate_flags(affected, threshold)
+
+
+def refresh_duplicate_neighbourhood(artwork, threshold=DUPLICATE_THRESHOLD):
+    """Refresh one saved artwork and its neighbours, updating the instance too"""
+    affected = {
+        other_id for other_id, _ in get_duplicate_index().query(artwork.perceptual_hash, threshold)
+    }
+    affected.add(artwork.id)
+    flags = refresh_duplicate_flags(affected, threshold)
+    if artwork.id in flags:
+        artwork.has_duplicates = flags[artwork.id]
+    return flags
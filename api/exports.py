@@ -0,0 +1,96 @@
+"""
+Streaming CSV / NDJSON exports for admins.
+
+An export is one query read with .iterator(chunk_size) over a values_list()
+projection and written out row by row through a StreamingHttpResponse, so
+memory use stays constant however many rows are exported. Each export
+accepts the query parameters of its model's FilterSet in api.filters.
+"""
+
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .filters import CustomUserFilter, OrderFilter, PaymentFilter
+from .models import CustomUser, Order, Payment
+
+
+DEFAULT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# name: (queryset, filterset class, [(column, lookup)])
+EXPORTS = {
+    'payments': (Payment.objects.all(), PaymentFilter, [
+        ('id', 'id'), ('transaction_id', 'transaction_id'), ('created_at', 'created_at'),
+        ('status', 'status'), ('hire_status', 'hire_status'), ('payment_method', 'payment_method'),
+        ('amount', 'amount'), ('payer_id', 'payer_id'), ('payer_username', 'payer__username'),
+        ('payee_id', 'payee_id'), ('payee_username', 'payee__username'),
+        ('order_id', 'order_id'), ('job_id', 'job_id'),
+    ]),
+    'orders': (Order.objects.all(), OrderFilter, [
+        ('id', 'id'), ('created_at', 'created_at'), ('updated_at', 'updated_at'),
+        ('order_type', 'order_type'), ('status', 'status'), ('total_amount', 'total_amount'),
+        ('buyer_id', 'buyer_id'), ('buyer_username', 'buyer__username'),
+    ]),
+    'users': (CustomUser.objects.all(), CustomUserFilter, [
+        ('id', 'id'), ('username', 'username'), ('email', 'email'),
+        ('first_name', 'first_name'), ('last_name', 'last_name'), ('user_type', 'user_type'),
+        ('is_verified', 'is_verified'), ('is_active', 'is_active'), ('is_staff', 'is_staff'),
+        ('created_at', 'created_at'), ('last_login', 'last_login'),
+    ]),
+}
+
+
+class _Echo:
+    """File-like object whose write() returns the line for csv.writer"""
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, str) and value[:1] in ('=', '+', '-', '@'):
+        # Keep spreadsheets from evaluating user-provided text as a formula
+        return "'" + value
+    return value
+
+
+def _csv_lines(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def _ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def filtered_export(name, params):
+    """(filterset, columns) of an export; the filterset may be invalid"""
+    queryset, filterset_class, spec = EXPORTS[name]
+    return filterset_class(params, queryset=queryset), spec
+
+
+def export_response(name, filterset, spec, export_format):
+    """StreamingHttpResponse writing every row the filterset selects"""
+    chunk_size = getattr(settings, 'ADMIN_EXPORT_CHUNK_SIZE', DEFAULT_CHUNK_SIZE)
+    columns = [column for column, _ in spec]
+    rows = filterset.qs.order_by('pk').values_list(*(lookup for _, lookup in spec)).iterator(
+        chunk_size=chunk_size
+    )
+    lines = _csv_lines(columns, rows) if export_format == 'csv' else _ndjson_lines(columns, rows)
+    response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[export_format])
+    filename = f'{name}-{timezone.now():%Y%m%d-%H%M%S}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
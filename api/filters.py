@@ -3,6 +3,8 @@ from django_filters import rest_framework as filters
 from django.db.models import Q, Count, Avg, Sum
 from decimal import Decimal
 from .models import *
+from . import search_index
+from .skill_tags import filter_by_skills
 
 
 class ArtworkFilter(filters.FilterSet):
@@ -84,7 +86,10 @@ class ArtworkFilter(filters.FilterSet):
         fields = ['artwork_type', 'category', 'is_available', 'is_featured']
     
     def filter_search(self, queryset, name, value):
-        """Search across multiple fields"""
+        """Search across multiple fields, with the full-text index if available"""
+        matches = search_index.filter_matches(queryset, search_index.ARTWORK, value)
+        if matches is not None:
+            return matches
         return queryset.filter(
             Q(title__icontains=value) |
             Q(description__icontains=value) |
@@ -160,6 +165,12 @@ class JobFilter(filters.FilterSet):
         label='Has Bids'
     )
     
+    # Skills filter
+    skills = filters.CharFilter(
+        method='filter_skills',
+        label='Requires All Skills (comma-separated)'
+    )
+    
     # Duration filter
     max_duration = filters.NumberFilter(
         field_name='duration_days',
@@ -188,8 +199,15 @@ class JobFilter(filters.FilterSet):
             return queryset.annotate(bid_count=Count('bids')).filter(bid_count__gt=0)
         return queryset.annotate(bid_count=Count('bids')).filter(bid_count=0)
     
+    def filter_skills(self, queryset, name, value):
+        """Filter jobs tagged with every listed skill"""
+        return filter_by_skills(queryset, value)
+    
     def filter_search(self, queryset, name, value):
-        """Search across multiple fields"""
+        """Search across multiple fields, with the full-text index if available"""
+        matches = search_index.filter_matches(queryset, search_index.JOB, value)
+        if matches is not None:
+            return matches
         return queryset.filter(
             Q(title__icontains=value) |
             Q(description__icontains=value) |
@@ -741,6 +759,10 @@ class ArtistProfileFilter(filters.FilterSet):
         lookup_expr='icontains',
         label='Skills Contain'
     )
+    skills = filters.CharFilter(
+        method='filter_skills',
+        label='Has All Skills (comma-separated)'
+    )
     
     # Verification filter
     is_verified = filters.BooleanFilter(
@@ -758,8 +780,15 @@ class ArtistProfileFilter(filters.FilterSet):
         model = ArtistProfile
         fields = ['experience_level', 'is_available']
     
+    def filter_skills(self, queryset, name, value):
+        """Filter artists tagged with every listed skill"""
+        return filter_by_skills(queryset, value)
+    
     def filter_search(self, queryset, name, value):
-        """Search across multiple fields"""
+        """Search across multiple fields, with the full-text index if available"""
+        matches = search_index.filter_matches(queryset, search_index.ARTIST, value)
+        if matches is not None:
+            return matches
         return queryset.filter(
             Q(user__username__icontains=value) |
             Q(user__first_name__icontains=value) |
@@ -1260,7 +1289,7 @@ class AdvancedArtworkFilter(ArtworkFilter):
     # Time-based filters
     trending = filters.BooleanFilter(
         method='filter_trending',
-        label='Trending (created in last 7 days with high engagement)'
+        label='Trending (high recent engagement, decayed over time)'
     )
     
     # Artist rating filter
@@ -1276,16 +1305,10 @@ class AdvancedArtworkFilter(ArtworkFilter):
         ).filter(engagement__gte=value)
     
     def filter_trending(self, queryset, name, value):
-        """Filter trending artworks"""
+        """Filter trending artworks, most trending first (see api.trending)"""
         if value:
-            from django.utils import timezone
-            from datetime import timedelta
-            seven_days_ago = timezone.now() - timedelta(days=7)
-            return queryset.filter(
-                created_at__gte=seven_days_ago
-            ).annotate(
-                engagement=models.F('views_count') + models.F('likes_count')
-            ).filter(engagement__gte=10).order_by('-engagement')
+            from .trending import score_cutoff
+            return queryset.filter(trending_score__gte=score_cutoff()).order_by('-trending_score')
         return queryset
     
     def filter_min_artist_rating(self, queryset, name, value):
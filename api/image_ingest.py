@@ -0,0 +1,163 @@
+"""
+Decode-once image ingest for uploads.
+
+An upload used to be opened by PIL once per consumer: the validators, the
+duplicate check in ArtworkViewSet.create, Artwork.generate_perceptual_hash
+and Artwork.apply_watermark. ImageIngest opens the upload once, reads the
+header metadata straight away and decodes the pixels only when they are
+first needed. The decoded image and the perceptual hash are then shared by
+every step of the request.
+
+Hashing and the integrity check only need a reduced-scale decode (JPEG
+draft mode), so a full-size decode happens only when the watermark is
+rendered in the request. Every decode is refused beyond MAX_IMAGE_PIXELS,
+judged from the header, which bounds memory for decompression bombs.
+
+The ingest is attached to the UploadedFile object as `_ingest`. DRF hands
+that same object on to the model, so Artwork.save picks it up as well.
+"""
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from PIL import Image
+
+from .image_processing import compute_perceptual_hash, request_draft
+from .watermark import render_watermark
+
+
+def max_image_pixels():
+    return getattr(settings, 'MAX_IMAGE_PIXELS', None)
+
+
+class ImageIngest:
+    """One uploaded image: header metadata, lazily decoded pixels and hash"""
+
+    def __init__(self, file):
+        self.file = file
+        try:
+            self._rewind()
+            self._image = Image.open(file)
+        finally:
+            self._rewind()
+        self.width, self.height = self._image.size
+        self.format = self._image.format
+        self.mode = self._image.mode
+        self._loaded = False
+        self._load_error = None
+        self._thumbnail = None
+        self._thumbnail_error = None
+        self._perceptual_hash = None
+
+    def _rewind(self):
+        # Leave the file where Django expects it for its own reads
+        if hasattr(self.file, 'seek'):
+            try:
+                self.file.seek(0)
+            except Exception:
+                pass
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    @property
+    def pixel_count(self):
+        return self.width * self.height
+
+    def exceeds_pixel_budget(self):
+        limit = max_image_pixels()
+        return bool(limit) and self.pixel_count > limit
+
+    def _check_pixel_budget(self):
+        if self.exceeds_pixel_budget():
+            raise ValueError(
+                f"Image has {self.pixel_count} pixels, more than the "
+                f"{max_image_pixels()} pixel limit"
+            )
+
+    def load(self):
+        """Decode the full pixel data; raises the decoder error if it is corrupt"""
+        if self._load_error is not None:
+            raise self._load_error
+        if not self._loaded:
+            self._check_pixel_budget()
+            try:
+                self._image.load()
+            except Exception as e:
+                self._load_error = e
+                raise
+            finally:
+                self._rewind()
+            self._loaded = True
+        return self._image
+
+    @property
+    def image(self):
+        """The decoded PIL image (do not modify it in place)"""
+        return self.load()
+
+    @property
+    def thumbnail(self):
+        """
+        Reduced-scale decode used for hashing and integrity checks. The whole
+        compressed stream is still read, so truncated or corrupt files fail
+        here just like on a full decode.
+        """
+        if self._loaded:
+            return self._image
+        if self._thumbnail_error is not None:
+            raise self._thumbnail_error
+        if self._thumbnail is None:
+            self._check_pixel_budget()
+            try:
+                self._rewind()
+                thumbnail = request_draft(Image.open(self.file))
+                thumbnail.load()
+            except Exception as e:
+                self._thumbnail_error = e
+                raise
+            finally:
+                self._rewind()
+
+            if thumbnail.size == self.size and thumbnail.mode == self.mode:
+                # No draft mode for this format: this already is the full image
+                self._image = thumbnail
+                self._loaded = True
+            self._thumbnail = thumbnail
+        return self._thumbnail
+
+    def check_integrity(self):
+        """Decode the upload (at reduced scale); raises if it is corrupt"""
+        self.thumbnail
+
+    @property
+    def perceptual_hash(self):
+        if self._perceptual_hash is None:
+            self._perceptual_hash = compute_perceptual_hash(self.thumbnail)
+        return self._perceptual_hash
+
+    def watermarked(self):
+        """RGB copy of the image with the tiled watermark"""
+        return render_watermark(self.image)
+
+
+def attached_ingest(file):
+    """
+    The ingest already attached to an upload, or None. Accepts the upload
+    itself or an uncommitted FieldFile wrapping it.
+    """
+    if isinstance(file, FieldFile):
+        file = file._file
+    return getattr(file, '_ingest', None)
+
+
+def get_ingest(file):
+    """Return the ingest of an upload, opening it on first use"""
+    ingest = attached_ingest(file)
+    if ingest is None:
+        ingest = ImageIngest(file)
+        try:
+            file._ingest = ingest
+        except AttributeError:
+            pass
+    return ingest
@@ -0,0 +1,92 @@
+"""
+Pure image processing steps for artwork uploads.
+
+Nothing in here touches the database or Django storage, so these functions
+can run inside a separate worker process (see the process_artwork_jobs
+management command). The caller reads the source image and writes the
+results back to the Artwork row.
+"""
+
+from io import BytesIO
+
+from PIL import Image
+import imagehash
+
+from .watermark import render_watermark
+
+
+HASH_SIZE = 16
+
+# Smallest edge the JPEG decoder may scale an image down to before hashing.
+# aHash only looks at a 16x16 thumbnail, and hashes of these reduced decodes
+# match full decodes to within a bit or so out of 256.
+HASH_DRAFT_SIZE = 512
+
+
+def open_image(source):
+    """Open a file path, file object or raw bytes with PIL"""
+    if isinstance(source, (bytes, bytearray)):
+        source = BytesIO(source)
+    return Image.open(source)
+
+
+def request_draft(img, size=HASH_DRAFT_SIZE):
+    """
+    Ask the decoder for a reduced-scale decode (JPEG DCT scaling) before the
+    image is loaded. Formats without a draft mode decode at full size.
+    """
+    try:
+        img.draft(img.mode, (size, size))
+    except Exception:
+        pass
+    return img
+
+
+def compute_perceptual_hash(img):
+    """
+    Average hash (aHash) of an opened image as a hex string.
+    aHash is good for detecting duplicates and resized images.
+    """
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+    return str(imagehash.average_hash(img, hash_size=HASH_SIZE))
+
+
+def hash_image(source):
+    """Perceptual hash of an image file, decoded at reduced scale when possible"""
+    with open_image(source) as img:
+        return compute_perceptual_hash(request_draft(img))
+
+
+def try_hash_image(source):
+    """
+    hash_image for pool.map: returns (hash, None) on success and
+    (None, error message) instead of raising
+    """
+    try:
+        return hash_image(source), None
+    except Exception as e:
+        return None, str(e) or e.__class__.__name__
+
+
+def encode_jpeg(img, quality=90):
+    """Encode an image as JPEG bytes"""
+    temp = BytesIO()
+    img.save(temp, format='JPEG', quality=quality)
+    return temp.getvalue()
+
+
+def process_artwork_image(source, need_hash=True, need_watermark=True):
+    """
+    Run the post-upload steps for one artwork image.
+
+    Returns a dict with the hex perceptual hash and the watermarked JPEG
+    bytes; a step that was not requested is returned as None.
+    """
+    result = {'perceptual_hash': None, 'watermark': None}
+    if need_hash:
+        result['perceptual_hash'] = hash_image(source)
+    if need_watermark:
+        with open_image(source) as img:
+            result['watermark'] = encode_jpeg(render_watermark(img))
+    return result
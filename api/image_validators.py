@@ -5,9 +5,10 @@ Add better error messages and validation for image uploads
 
 from django.core.exceptions import ValidationError
 from django.conf import settings
-from PIL import Image
 import os
 
+from .image_ingest import get_ingest
+
 
 def validate_image_file(image_field):
     """
@@ -44,54 +45,61 @@ def validate_image_file(image_field):
     
     # Validate image content using PIL
     try:
-        # Reset file pointer to beginning if possible
-        if hasattr(image_field, 'seek'):
-            image_field.seek(0)
+        # Open the upload once; the decoded image is shared with the
+        # duplicate check, hashing and watermarking
+        ingest = get_ingest(image_field)
+        
+        # Get image info from the header, before decoding the pixels
+        width, height = ingest.size
+        format_name = ingest.format
+        mode = ingest.mode
+        
+        # Check image dimensions
+        min_dimension = getattr(settings, 'MIN_IMAGE_DIMENSION', 100)
+        max_dimension = getattr(settings, 'MAX_IMAGE_DIMENSION', 10000)
+        
+        if width < min_dimension or height < min_dimension:
+            raise ValidationError(
+                f"Image too small. Minimum size is {min_dimension}x{min_dimension} pixels. "
+                f"Your image is {width}x{height} pixels."
+            )
+        
+        if width > max_dimension or height > max_dimension:
+            raise ValidationError(
+                f"Image too large. Maximum size is {max_dimension}x{max_dimension} pixels. "
+                f"Your image is {width}x{height} pixels."
+            )
+        
+        # Check the decoded size before decoding anything (decompression bombs)
+        if ingest.exceeds_pixel_budget():
+            max_pixels = getattr(settings, 'MAX_IMAGE_PIXELS')
+            raise ValidationError(
+                f"Image has too many pixels. Maximum is {max_pixels / 1000000:.0f} megapixels. "
+                f"Your image is {ingest.pixel_count / 1000000:.1f} megapixels ({width}x{height})."
+            )
+        
+        # Check color mode
+        if mode not in ['RGB', 'RGBA', 'L', 'P']:
+            raise ValidationError(
+                f"Unsupported color mode '{mode}'. "
+                f"Please convert your image to RGB format."
+            )
         
-        # Open and validate the image
-        with Image.open(image_field) as img:
-            # Get image info before verification
-            width, height = img.size
-            format_name = img.format
-            mode = img.mode
-            
-            # Check image dimensions
-            min_dimension = getattr(settings, 'MIN_IMAGE_DIMENSION', 100)
-            max_dimension = getattr(settings, 'MAX_IMAGE_DIMENSION', 10000)
-            
-            if width < min_dimension or height < min_dimension:
-                raise ValidationError(
-                    f"Image too small. Minimum size is {min_dimension}x{min_dimension} pixels. "
-                    f"Your image is {width}x{height} pixels."
-                )
-            
-            if width > max_dimension or height > max_dimension:
-                raise ValidationError(
-                    f"Image too large. Maximum size is {max_dimension}x{max_dimension} pixels. "
-                    f"Your image is {width}x{height} pixels."
-                )
-            
-            # Check color mode
-            if mode not in ['RGB', 'RGBA', 'L', 'P']:
-                raise ValidationError(
-                    f"Unsupported color mode '{mode}'. "
-                    f"Please convert your image to RGB format."
-                )
-            
-            # Check format
-            if format_name not in ['JPEG', 'PNG', 'GIF', 'BMP', 'WEBP']:
-                raise ValidationError(
-                    f"Unsupported image format '{format_name}'. "
-                    f"Please use JPEG, PNG, GIF, BMP, or WebP format."
-                )
-            
-            # Try to load the image data to check for corruption
-            try:
-                img.load()
-            except Exception as load_error:
-                raise ValidationError(
-                    f"Image appears to be corrupted: {str(load_error)}"
-                )
+        # Check format
+        if format_name not in ['JPEG', 'PNG', 'GIF', 'BMP', 'WEBP']:
+            raise ValidationError(
+                f"Unsupported image format '{format_name}'. "
+                f"Please use JPEG, PNG, GIF, BMP, or WebP format."
+            )
+        
+        # Try to load the image data to check for corruption. A reduced-scale
+        # decode still reads the whole file, and is reused for hashing
+        try:
+            ingest.check_integrity()
+        except Exception as load_error:
+            raise ValidationError(
+                f"Image appears to be corrupted: {str(load_error)}"
+            )
     
     except ValidationError:
         # Re-raise validation errors as-is
@@ -124,14 +132,6 @@ def validate_image_file(image_field):
                 f"Upload a valid image. The file you uploaded was either not an image or a corrupted image. "
                 f"Error details: {str(e)}"
             )
-    
-    finally:
-        # Reset file pointer if possible
-        if hasattr(image_field, 'seek'):
-            try:
-                image_field.seek(0)
-            except:
-                pass
 
 
 def validate_artwork_image(image_field):
@@ -152,34 +152,17 @@ def validate_profile_image(image_field):
     """
     validate_image_file(image_field)
     
-    # Additional profile image validations
-    try:
-        if hasattr(image_field, 'seek'):
-            image_field.seek(0)
-        
-        with Image.open(image_field) as img:
-            width, height = img.size
-            
-            # Profile images should be somewhat square
-            aspect_ratio = max(width, height) / min(width, height)
-            if aspect_ratio > 3:  # Allow up to 3:1 aspect ratio
-                raise ValidationError(
-                    f"Profile image aspect ratio too extreme. "
-                    f"Please use an image with a more square aspect ratio. "
-                    f"Current ratio: {aspect_ratio:.1f}:1"
-                )
-    
-    except ValidationError:
-        raise
-    except Exception:
-        # If we can't check aspect ratio, that's okay
-        pass
+    # Additional profile image validations, from the metadata read above
+    ingest = get_ingest(image_field)
+    width, height = ingest.size
     
-    finally:
-        if hasattr(image_field, 'seek'):
-            try:
-                image_field.seek(0)
-            except:
-                pass
+    # Profile images should be somewhat square
+    aspect_ratio = max(width, height) / min(width, height)
+    if aspect_ratio > 3:  # Allow up to 3:1 aspect ratio
+        raise ValidationError(
+            f"Profile image aspect ratio too extreme. "
+            f"Please use an image with a more square aspect ratio. "
+            f"Current ratio: {aspect_ratio:.1f}:1"
+        )
     
-    return image_field
\ No newline at end of file
+    return image_field
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.revenue_rollups import rebuild_revenue_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily revenue rollups behind the admin revenue report from every completed payment'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help='Payments read per keyset chunk (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        revenue_rows, spend_rows = rebuild_revenue_rollups(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {revenue_rows} revenue and {spend_rows} buyer spend rollups '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,145 @@
+import multiprocessing
+import resource
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw, ImageFilter
+
+from api.image_processing import compute_perceptual_hash, request_draft
+
+
+def full_decode_ingest(data):
+    """Header read, full decode for validation, hash from the full image"""
+    with Image.open(BytesIO(data)) as img:
+        img.size
+        img.load()
+        return compute_perceptual_hash(img)
+
+
+def draft_decode_ingest(data):
+    """Header read, reduced-scale decode for validation and hashing"""
+    with Image.open(BytesIO(data)) as img:
+        img.size
+        request_draft(img)
+        img.load()
+        return compute_perceptual_hash(img)
+
+
+MODES = {
+    'full': full_decode_ingest,
+    'draft': draft_decode_ingest,
+}
+
+
+def _status_kb(field):
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return None
+
+
+def reset_peak_rss():
+    """
+    Start a new peak RSS measurement and return the baseline in KB. On Linux
+    the high-water mark is reset; elsewhere the lifetime peak is used.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _status_kb('VmRSS')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss():
+    try:
+        return _status_kb('VmHWM')
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def run_mode(mode, data, iterations):
+    """Runs in a fresh process so that peak RSS belongs to this mode only"""
+    ingest = MODES[mode]
+    baseline_kb = reset_peak_rss()
+    timings = []
+    image_hash = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        image_hash = ingest(data)
+        timings.append((time.perf_counter() - started) * 1000)
+    peak_kb = peak_rss()
+    return timings, max(0, peak_kb - baseline_kb), image_hash
+
+
+def synthetic_photo(width, height):
+    """Smooth, photo-like JPEG (noise alone would not compress realistically)"""
+    img = Image.effect_noise((max(1, width // 16), max(1, height // 16)), 80)
+    img = img.convert('RGB').resize((width, height), Image.BICUBIC)
+    draw = ImageDraw.Draw(img)
+    for i in range(24):
+        x = (i * 7919) % width
+        y = (i * 104729) % height
+        radius = max(10, (i * 31) % max(11, width // 4))
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius),
+                     fill=((i * 53) % 256, (i * 97) % 256, (i * 151) % 256))
+    img = img.filter(ImageFilter.GaussianBlur(3))
+    output = BytesIO()
+    img.save(output, format='JPEG', quality=90)
+    return output.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Measure latency and peak RSS of full vs draft-mode image ingest'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1920x1080,4000x3000,8000x6000',
+            help='Comma separated WIDTHxHEIGHT list of synthetic JPEGs (default: %(default)s)'
+        )
+        parser.add_argument(
+            '--image', action='append', default=[],
+            help='Also measure this image file (can be repeated)'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=10,
+            help='Ingests per measurement (default: 10)'
+        )
+
+    def handle(self, *args, **options):
+        samples = []
+        for size in options['sizes'].split(','):
+            if not size.strip():
+                continue
+            try:
+                width, height = (int(part) for part in size.lower().split('x'))
+            except ValueError:
+                raise CommandError(f'Invalid size: {size}')
+            samples.append((f'{width}x{height}', synthetic_photo(width, height)))
+        for path in options['image']:
+            with open(path, 'rb') as f:
+                samples.append((path, f.read()))
+
+        iterations = max(1, options['iterations'])
+        context = multiprocessing.get_context('spawn')
+
+        self.stdout.write(
+            f"{'image':<24} {'mode':<6} {'mean':>9} {'p95':>9} {'peak RSS':>10}  hash"
+        )
+        for label, data in samples:
+            hashes = {}
+            for mode in MODES:
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    timings, peak_kb, image_hash = pool.submit(run_mode, mode, data, iterations).result()
+                hashes[mode] = image_hash
+                p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                self.stdout.write(
+                    f'{label:<24} {mode:<6} {statistics.mean(timings):>7.1f}ms {p95:>7.1f}ms '
+                    f'{peak_kb / 1024:>8.1f}MB  {image_hash[:16]}...'
+                )
+            distance = bin(int(hashes['full'], 16) ^ int(hashes['draft'], 16)).count('1')
+            self.stdout.write(f'{"":<24} hash distance full vs draft: {distance} bits')
@@ -0,0 +1,87 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageChops
+
+from api import watermark
+
+
+class Command(BaseCommand):
+    help = 'Compare the cached watermark renderer against the original per-tile implementation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='640x480,1920x1080,2500x1800,4000x3000',
+            help='Comma separated WIDTHxHEIGHT list of synthetic images (default: %(default)s)'
+        )
+        parser.add_argument(
+            '--image', action='append', default=[],
+            help='Also benchmark this image file (can be repeated)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Timed runs per image; the best run is reported (default: 5)'
+        )
+
+    def handle(self, *args, **options):
+        images = []
+        for size in options['sizes'].split(','):
+            if not size.strip():
+                continue
+            try:
+                width, height = (int(part) for part in size.lower().split('x'))
+            except ValueError:
+                raise CommandError(f'Invalid size: {size}')
+            images.append((f'{width}x{height}', Image.effect_noise((width, height), 64).convert('RGB')))
+        for path in options['image']:
+            with Image.open(path) as img:
+                images.append((path, img.convert('RGB')))
+
+        repeat = max(1, options['repeat'])
+        self.stdout.write(
+            f"{'image':<24} {'reference':>10} {'cold':>10} {'cached':>10} {'speedup':>8} "
+            f"{'layer MB':>9} {'strip MB':>9}  identical"
+        )
+        all_identical = True
+        for label, img in images:
+            reference_ms, expected = self.best_of(repeat, watermark.render_watermark_reference, img)
+
+            self.clear_caches()
+            started = time.perf_counter()
+            watermark.render_watermark(img)
+            cold_ms = (time.perf_counter() - started) * 1000
+
+            cached_ms, result = self.best_of(repeat, watermark.render_watermark, img)
+
+            identical = ImageChops.difference(expected, result).getbbox() is None
+            all_identical = all_identical and identical
+
+            # The reference builds a full-size RGBA layer; the new renderer
+            # only builds one band of it
+            strip = watermark.watermark_strip(img.width, img.height)
+            layer_mb = img.width * img.height * 4 / 1024 / 1024
+            strip_mb = strip.width * strip.height * 4 / 1024 / 1024
+
+            self.stdout.write(
+                f'{label:<24} {reference_ms:>8.1f}ms {cold_ms:>8.1f}ms {cached_ms:>8.1f}ms '
+                f'{reference_ms / cached_ms:>7.1f}x {layer_mb:>9.1f} {strip_mb:>9.1f}  {identical}'
+            )
+
+        if all_identical:
+            self.stdout.write(self.style.SUCCESS('All outputs are pixel-identical to the reference'))
+        else:
+            self.stdout.write(self.style.ERROR('Output differs from the reference implementation'))
+
+    def best_of(self, repeat, render, img):
+        best = None
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = render(img)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def clear_caches(self):
+        watermark.load_font.cache_clear()
+        watermark.get_cell.cache_clear()
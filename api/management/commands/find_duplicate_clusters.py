@@ -0,0 +1,73 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.duplicate_clusters import (
+    DEFAULT_BLOCK_SIZE, MAX_THRESHOLD, find_catalog_duplicate_groups, sync_duplicate_flags
+)
+
+
+class Command(BaseCommand):
+    help = 'Find groups of near-duplicate artworks across the whole catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=int, default=5,
+            help='Maximum Hamming distance between two hashes to count as duplicates (default: 5)'
+        )
+        parser.add_argument(
+            '--block-size', type=int, default=DEFAULT_BLOCK_SIZE,
+            help=f'Rows compared per block; bounds peak memory (default: {DEFAULT_BLOCK_SIZE})'
+        )
+        parser.add_argument(
+            '--available-only', action='store_true',
+            help='Only consider artworks that are currently available'
+        )
+        parser.add_argument(
+            '--update-flags', action='store_true',
+            help='Recompute the stored has_duplicates flag of every artwork'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the groups as JSON instead of a summary'
+        )
+
+    def handle(self, *args, **options):
+        if not 0 <= options['threshold'] <= MAX_THRESHOLD:
+            raise CommandError(f'--threshold must be between 0 and {MAX_THRESHOLD}')
+        if options['update_flags']:
+            started = time.perf_counter()
+            flagged = sync_duplicate_flags(
+                threshold=options['threshold'],
+                block_size=options['block_size'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Flagged {flagged} artworks as having duplicates '
+                f'in {time.perf_counter() - started:.2f}s'
+            ))
+            return
+
+        started = time.perf_counter()
+        scanned, groups = find_catalog_duplicate_groups(
+            threshold=options['threshold'],
+            available_only=options['available_only'],
+            block_size=options['block_size'],
+        )
+        elapsed = time.perf_counter() - started
+
+        if options['json']:
+            for group in groups:
+                group.pop('nearest_distances')
+            self.stdout.write(json.dumps(groups, indent=2))
+            return
+
+        for number, group in enumerate(groups, 1):
+            ids = ', '.join(str(artwork_id) for artwork_id in group['artwork_ids'])
+            self.stdout.write(
+                f"Group {number}: {group['size']} artworks (max distance {group['max_distance']}): {ids}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {scanned} artworks in {elapsed:.2f}s, found {len(groups)} duplicate groups'
+        ))
@@ -0,0 +1,215 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.image_processing import process_artwork_image
+from api.models import Artwork, ArtworkProcessingJob
+from api.renditions import RENDITION_FORMATS, RENDITION_SIZES, content_key, ensure_rendition
+
+
+class Command(BaseCommand):
+    help = 'Run queued artwork post-processing jobs (perceptual hash + watermark) in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Worker processes for image work; 0 runs jobs inline (default: CPU count)'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=20,
+            help='Jobs claimed per round (default: 20)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds to wait when the queue is empty (default: 5)'
+        )
+        parser.add_argument(
+            '--stale-after', type=int, default=600,
+            help='Reclaim jobs stuck in processing for this many seconds (default: 600)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of polling'
+        )
+        parser.add_argument(
+            '--warm-renditions', action='store_true',
+            help='Also generate every image rendition right after processing'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Put failed jobs back in the queue before starting'
+        )
+
+    def handle(self, *args, **options):
+        self.max_attempts = getattr(settings, 'ARTWORK_PROCESSING_MAX_ATTEMPTS', 3)
+        self.warm_renditions = options['warm_renditions']
+        self.completed = 0
+        self.failed = 0
+
+        if options['retry_failed']:
+            failed_jobs = ArtworkProcessingJob.objects.filter(status='failed')
+            Artwork.objects.filter(processing_job__in=failed_jobs).update(processing_status='pending')
+            requeued = failed_jobs.update(status='pending', attempts=0)
+            self.stdout.write(f'Requeued {requeued} failed jobs')
+
+        workers = options['workers']
+        pool = self.start_pool(workers)
+        try:
+            while True:
+                jobs = self.claim_jobs(options['batch_size'], options['stale_after'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                if not self.run_batch(pool, jobs):
+                    # A child died (e.g. killed for memory); start a fresh pool
+                    pool.shutdown(wait=False)
+                    pool = self.start_pool(workers)
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, stopping')
+        finally:
+            if pool is not None:
+                pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {self.completed} artworks, {self.failed} failures'
+        ))
+
+    def start_pool(self, workers):
+        if workers <= 0:
+            return None
+        # Children only run the pure image functions; never let them
+        # inherit open database connections
+        connections.close_all()
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+
+    def claim_jobs(self, batch_size, stale_after):
+        """Atomically move up to batch_size queued jobs to processing"""
+        now = timezone.now()
+        stale = Q(status='processing', started_at__lt=now - timedelta(seconds=stale_after))
+        candidates = ArtworkProcessingJob.objects.filter(
+            Q(status='pending') | stale
+        ).order_by('created_at').values_list('id', 'status', 'started_at')[:batch_size]
+
+        claimed = []
+        for job_id, job_status, started_at in candidates:
+            # Conditional UPDATE: when several workers race, only one wins each job
+            won = ArtworkProcessingJob.objects.filter(
+                id=job_id, status=job_status, started_at=started_at
+            ).update(status='processing', started_at=now, attempts=F('attempts') + 1)
+            if won:
+                claimed.append(job_id)
+
+        if not claimed:
+            return []
+        Artwork.objects.filter(processing_job__in=claimed).update(processing_status='processing')
+        return list(ArtworkProcessingJob.objects.select_related('artwork').filter(id__in=claimed))
+
+    def run_batch(self, pool, jobs):
+        """Process claimed jobs; returns False if the pool broke down"""
+        if pool is None:
+            for job in jobs:
+                try:
+                    result = process_artwork_image(*self.job_arguments(job.artwork))
+                except Exception as e:
+                    self.fail_job(job, e)
+                else:
+                    self.finish_job(job, result)
+            return True
+
+        healthy = True
+        futures = {}
+        for job in jobs:
+            try:
+                futures[pool.submit(process_artwork_image, *self.job_arguments(job.artwork))] = job
+            except BrokenProcessPool as e:
+                healthy = False
+                self.fail_job(job, e)
+            except Exception as e:
+                self.fail_job(job, e)
+
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                healthy = False
+                self.fail_job(job, e)
+            except Exception as e:
+                self.fail_job(job, e)
+            else:
+                self.finish_job(job, result)
+        return healthy
+
+    def job_arguments(self, artwork):
+        """Source image (path when on local disk, bytes otherwise) and the steps to run"""
+        try:
+            source = artwork.image.path
+        except NotImplementedError:
+            with artwork.image.open('rb') as f:
+                source = f.read()
+        return source, not artwork.perceptual_hash, not artwork.watermarked_image
+
+    def finish_job(self, job, result):
+        artwork = job.artwork
+        update_fields = ['processing_status']
+        try:
+            if result['perceptual_hash']:
+                artwork.perceptual_hash = result['perceptual_hash']
+                # updated_at is how other processes' duplicate indexes see the hash
+                update_fields.extend(['perceptual_hash', 'updated_at'])
+            if result['watermark']:
+                file_name = f"watermarked_{artwork.image.name.split('/')[-1]}"
+                artwork.watermarked_image.save(file_name, ContentFile(result['watermark']), save=False)
+                artwork.rendition_key = content_key(result['watermark'])
+                update_fields.extend(['watermarked_image', 'rendition_key'])
+            artwork.processing_status = 'ready'
+            # Goes through Artwork.save so the duplicate index and flags are updated
+            artwork.save(update_fields=update_fields)
+        except DatabaseError as e:
+            # Most likely the artwork was deleted while it was being processed
+            self.stderr.write(f'Could not save artwork #{artwork.id}: {e}')
+            return
+
+        ArtworkProcessingJob.objects.filter(id=job.id).update(
+            status='completed', completed_at=timezone.now(), last_error=''
+        )
+        self.completed += 1
+
+        if self.warm_renditions:
+            # Otherwise each rendition is generated on its first request
+            for size in RENDITION_SIZES:
+                for ext in RENDITION_FORMATS:
+                    try:
+                        ensure_rendition(artwork, size, ext)
+                    except Exception as e:
+                        self.stderr.write(f'Rendition {size}.{ext} of artwork #{artwork.id} failed: {e}')
+
+    def fail_job(self, job, error):
+        self.stderr.write(f'Processing artwork #{job.artwork_id} failed: {error}')
+        if job.attempts >= self.max_attempts:
+            ArtworkProcessingJob.objects.filter(id=job.id).update(
+                status='failed', completed_at=timezone.now(), last_error=str(error)
+            )
+            Artwork.objects.filter(id=job.artwork_id).update(processing_status='failed')
+            self.failed += 1
+        else:
+            # Back in the queue for another attempt
+            ArtworkProcessingJob.objects.filter(id=job.id).update(
+                status='pending', started_at=None, last_error=str(error)
+            )
+            Artwork.objects.filter(id=job.artwork_id).update(processing_status='pending')
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Run the job recommendation refreshes queued by saves when JOB_RECOMMENDATION_ASYNC is on'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=recommendations.DEFAULT_QUEUE_BATCH_SIZE,
+            help=f'Queued refreshes run per round (default: {recommendations.DEFAULT_QUEUE_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=5.0,
+            help='Seconds to wait when the queue is empty or a round failed (default: 5)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of polling'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        processed = 0
+        try:
+            while True:
+                try:
+                    count = recommendations.process_queue(options['batch_size'])
+                except Exception as e:
+                    # The batch is back in the queue
+                    self.stderr.write(f'Refreshing recommendations failed: {e}')
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+                processed += count
+                if not count:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, stopping')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Ran {processed} queued refreshes in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import search_index
+
+
+class Command(BaseCommand):
+    help = 'Refill the full-text search index from every artwork, job and artist profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows indexed per keyset chunk (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        if not search_index.is_available():
+            raise CommandError('The search index needs SQLite with FTS5; run migrate first')
+        started = time.perf_counter()
+        counts = search_index.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {counts[search_index.ARTWORK]} artworks, {counts[search_index.JOB]} jobs and '
+            f'{counts[search_index.ARTIST]} artist profiles in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import trigram_search
+from api.search_index import ARTIST, ARTWORK
+
+
+class Command(BaseCommand):
+    help = 'Refill the trigram postings behind fuzzy search from every artwork title and artist profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Rows indexed per keyset chunk (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        counts = trigram_search.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed trigrams of {counts[ARTWORK]} artworks and {counts[ARTIST]} artist profiles '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
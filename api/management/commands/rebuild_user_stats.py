@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models import CustomUser, UserDashboardStats
+from api.user_stats import STAT_GROUPS, compute_user_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the materialized dashboard stats of every user, repairing any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Users recomputed per round of grouped queries (default: 500)'
+        )
+        parser.add_argument(
+            '--user', type=int, action='append', dest='user_ids',
+            help='Only rebuild this user id; may be repeated'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = CustomUser.objects.order_by('pk')
+        if options['user_ids']:
+            users = users.filter(pk__in=options['user_ids'])
+        fields = [field for _, defaults in STAT_GROUPS.values() for field in defaults]
+
+        last_id = 0
+        rebuilt = drifted = 0
+        while True:
+            # Keyset walk over user ids
+            user_ids = list(users.filter(pk__gt=last_id).values_list('pk', flat=True)[:options['batch_size']])
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            stats = compute_user_stats(user_ids)
+            existing = UserDashboardStats.objects.in_bulk(user_ids)
+            changed = []
+            for user_id, values in stats.items():
+                row = existing.get(user_id)
+                if row is None:
+                    continue
+                if any(getattr(row, field) != value for field, value in values.items()):
+                    for field, value in values.items():
+                        setattr(row, field, value)
+                    changed.append(row)
+            UserDashboardStats.objects.bulk_update(changed, fields)
+            UserDashboardStats.objects.bulk_create([
+                UserDashboardStats(user_id=user_id, **values)
+                for user_id, values in stats.items() if user_id not in existing
+            ], ignore_conflicts=True)
+            rebuilt += len(user_ids)
+            drifted += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt dashboard stats of {rebuilt} users ({drifted} had drifted) '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,117 @@
+import time
+from collections import defaultdict
+from datetime import datetime, time as dt_time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from api.models import Artwork, ArtworkLike, ArtworkViewSketch
+from api.trending import LIKE_WEIGHT, VIEWER_WEIGHT, add_events, event_score
+from api.unique_views import HyperLogLog
+
+
+class Command(BaseCommand):
+    help = 'Fold new likes and unique viewers into the stored artwork trending scores'
+
+    # Re-read sketches updated this long before the artwork's last recompute, for
+    # clock skew between processes and view flushes that committed late
+    SYNC_OVERLAP = timedelta(seconds=60)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lookback-days', type=int, default=7,
+            help='Only consider events from this many recent days (default: 7)'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Repeat every this many seconds instead of running once (default: run once)'
+        )
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Reset every score and recount all events in the lookback window'
+        )
+        parser.add_argument(
+            '--rebuild-interval', type=float, default=24 * 3600,
+            help='When repeating, also rebuild every this many seconds so removed likes '
+                 'drop out of the scores; 0 disables it (default: daily)'
+        )
+
+    def handle(self, *args, **options):
+        rebuild = options['rebuild']
+        rebuilt_at = time.monotonic()
+        try:
+            while True:
+                started = time.perf_counter()
+                if rebuild:
+                    updated = self.rebuild(options['lookback_days'])
+                    rebuilt_at = time.monotonic()
+                else:
+                    updated = self.recompute(options['lookback_days'])
+                self.stdout.write(self.style.SUCCESS(
+                    f'Updated trending score of {updated} artworks in {time.perf_counter() - started:.2f}s'
+                ))
+                if options['interval'] <= 0:
+                    break
+                time.sleep(options['interval'])
+                rebuild = 0 < options['rebuild_interval'] <= time.monotonic() - rebuilt_at
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, stopping')
+
+    def rebuild(self, lookback_days):
+        """
+        Recount every score from the events still in the database, which is
+        what drops removed likes. One transaction, so readers never see the reset.
+        """
+        with transaction.atomic():
+            Artwork.objects.update(trending_score=0, trending_updated_at=None)
+            ArtworkViewSketch.objects.update(counted_viewers=0)
+            ArtworkLike.objects.filter(
+                counted_in_trending=True, created_at__gte=timezone.now() - timedelta(days=lookback_days)
+            ).update(counted_in_trending=False)
+            return self.recompute(lookback_days)
+
+    def recompute(self, lookback_days):
+        now = timezone.now()
+        since = now - timedelta(days=lookback_days)
+
+        # Likes are marked once counted, so one committed after a run that
+        # already went past its created_at is still picked up, and only once
+        events = defaultdict(list)
+        likes = list(ArtworkLike.objects.filter(
+            counted_in_trending=False, created_at__gte=since, created_at__lte=now,
+        ).values_list('pk', 'artwork_id', 'created_at'))
+        for _, artwork_id, created_at in likes:
+            events[artwork_id].append(event_score(LIKE_WEIGHT, created_at))
+
+        # Sketches remember how many of their viewers were counted, so
+        # re-reading the overlap never credits a viewer twice
+        sketches = list(ArtworkViewSketch.objects.filter(
+            Q(artwork__trending_updated_at__isnull=True)
+            | Q(updated_at__gt=F('artwork__trending_updated_at') - self.SYNC_OVERLAP),
+            day__gte=since.date(),
+        ).only('pk', 'artwork_id', 'day', 'registers', 'counted_viewers'))
+        for sketch in sketches:
+            viewers = len(HyperLogLog.from_bytes(sketch.registers))
+            new_viewers = viewers - sketch.counted_viewers
+            if new_viewers <= 0:
+                continue
+            # Credit them at the end of their day, or now for today's
+            day_end = timezone.make_aware(datetime.combine(sketch.day, dt_time.max))
+            events[sketch.artwork_id].append(event_score(new_viewers * VIEWER_WEIGHT, min(day_end, now)))
+            sketch.counted_viewers = viewers
+
+        with transaction.atomic():
+            artworks = list(Artwork.objects.filter(pk__in=events).only('pk', 'trending_score'))
+            for artwork in artworks:
+                artwork.trending_score = add_events(artwork.trending_score, events[artwork.pk])
+                artwork.trending_updated_at = now
+            Artwork.objects.bulk_update(artworks, ['trending_score', 'trending_updated_at'], batch_size=500)
+            ArtworkViewSketch.objects.bulk_update(sketches, ['counted_viewers'], batch_size=500)
+            like_ids = [like_id for like_id, _, _ in likes]
+            for start in range(0, len(like_ids), 500):
+                ArtworkLike.objects.filter(pk__in=like_ids[start:start + 500]).update(counted_in_trending=True)
+            # Likes that aged out uncounted never will be; keep them out of the partial index
+            ArtworkLike.objects.filter(counted_in_trending=False, created_at__lt=since).update(counted_in_trending=True)
+        return len(artworks)
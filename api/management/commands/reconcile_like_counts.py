@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Artwork, ArtworkLike
+
+
+def actual_like_count():
+    """Number of ArtworkLike rows of the outer artwork"""
+    likes = (
+        ArtworkLike.objects.filter(artwork=OuterRef('pk'))
+        .order_by()
+        .values('artwork')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    return Coalesce(Subquery(likes), 0)
+
+
+class Command(BaseCommand):
+    help = 'Repair artworks whose likes_count has drifted from their ArtworkLike rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Drifted artworks repaired per UPDATE (default: 500)'
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Repeat every this many seconds instead of running once (default: run once)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted artworks without repairing them'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                self.reconcile(options['batch_size'], options['dry_run'])
+                if options['interval'] <= 0:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Interrupted, stopping')
+
+    def reconcile(self, batch_size, dry_run):
+        drifted = list(
+            Artwork.objects.annotate(actual_likes=actual_like_count())
+            .exclude(likes_count=F('actual_likes'))
+            .values_list('pk', 'likes_count', 'actual_likes')
+        )
+        for pk, stored, actual in drifted:
+            self.stdout.write(f'Artwork {pk}: likes_count {stored}, {actual} likes')
+
+        if dry_run:
+            self.stdout.write(f'{len(drifted)} artworks have drifted like counts')
+            return
+
+        repaired = 0
+        for start in range(0, len(drifted), batch_size):
+            ids = [pk for pk, _, _ in drifted[start:start + batch_size]]
+            # Recount inside the UPDATE so likes made since the scan are included
+            repaired += Artwork.objects.filter(pk__in=ids).update(likes_count=actual_like_count())
+        self.stdout.write(self.style.SUCCESS(f'Repaired likes_count of {repaired} artworks'))
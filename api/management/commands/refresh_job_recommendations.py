@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed recommended artists of every open job'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=recommendations.DEFAULT_BATCH_SIZE,
+            help=f'Jobs scored per batch; bounds peak memory (default: {recommendations.DEFAULT_BATCH_SIZE})'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        jobs, stored = recommendations.rebuild(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Stored {stored} recommendations for {jobs} open jobs '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,216 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+
+from api.duplicate_clusters import sync_duplicate_flags
+from api.duplicate_index import get_duplicate_index
+from api.image_processing import try_hash_image
+from api.models import Artwork
+
+
+class Command(BaseCommand):
+    help = (
+        'Compute perceptual hashes for artworks in parallel and write them with bulk_update. '
+        'Does not re-run watermarking.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Re-hash every artwork (e.g. after changing the hash algorithm), not only unhashed ones'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=500,
+            help='Artwork ids fetched, hashed and written per chunk (default: 500)'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Hashing processes (default: CPU count)'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=None,
+            help='Stop after this many artworks'
+        )
+        parser.add_argument(
+            '--checkpoint', default=os.path.join(tempfile.gettempdir(), 'rehash_artworks.json'),
+            help='File recording progress after every chunk (default: %(default)s)'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue after the last id recorded in the checkpoint file'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Hash without writing anything and report throughput'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        workers = max(1, options['workers'])
+        dry_run = options['dry_run']
+        checkpoint_path = options['checkpoint']
+
+        state = {
+            'mode': 'all' if options['all'] else 'missing',
+            'last_id': 0,
+            'processed': 0,
+            'changed': 0,
+            'failed': 0,
+            'started_at': timezone.now().isoformat(),
+        }
+        if options['resume']:
+            state = self.load_checkpoint(checkpoint_path, state)
+            self.stdout.write(
+                f"Resuming after artwork #{state['last_id']} "
+                f"({state['processed']} already processed)"
+            )
+        elif os.path.exists(checkpoint_path) and not dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Ignoring existing checkpoint {checkpoint_path}; pass --resume to continue it'
+            ))
+
+        queryset = Artwork.objects.exclude(image='')
+        if not options['all']:
+            queryset = queryset.filter(Q(perceptual_hash__isnull=True) | Q(perceptual_hash=''))
+        remaining = queryset.filter(id__gt=state['last_id']).count()
+        if options['limit'] is not None:
+            remaining = min(remaining, options['limit'])
+        self.stdout.write(f'{remaining} artworks to hash with {workers} workers')
+
+        storage = Artwork._meta.get_field('image').storage
+        run_processed = 0
+        hashing_seconds = 0.0
+        started = time.perf_counter()
+
+        # Children only hash files; never let them inherit database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            while options['limit'] is None or run_processed < options['limit']:
+                size = chunk_size
+                if options['limit'] is not None:
+                    size = min(size, options['limit'] - run_processed)
+
+                # Keyset pagination on the primary key: every chunk is an index range scan
+                rows = list(
+                    queryset.filter(id__gt=state['last_id'])
+                    .order_by('id')
+                    .values_list('id', 'image', 'perceptual_hash')[:size]
+                )
+                if not rows:
+                    break
+
+                chunk_started = time.perf_counter()
+                sources = [self.source_for(storage, name) for _, name, _ in rows]
+                results = list(pool.map(
+                    try_hash_image, sources, chunksize=max(1, len(sources) // (workers * 4))
+                ))
+                hashing_seconds += time.perf_counter() - chunk_started
+
+                updates = []
+                updated_at = timezone.now()
+                for (artwork_id, _, old_hash), (new_hash, error) in zip(rows, results):
+                    if error:
+                        state['failed'] += 1
+                        self.stderr.write(f'Artwork #{artwork_id}: {error}')
+                    elif new_hash != old_hash:
+                        updates.append(Artwork(id=artwork_id, perceptual_hash=new_hash, updated_at=updated_at))
+
+                if not dry_run and updates:
+                    # bulk_update skips save(), so no watermarking and no per-row signals;
+                    # updated_at lets running duplicate indexes pick the new hashes up
+                    Artwork.objects.bulk_update(updates, ['perceptual_hash', 'updated_at'], batch_size=500)
+
+                state['changed'] += len(updates)
+                state['processed'] += len(rows)
+                state['last_id'] = rows[-1][0]
+                run_processed += len(rows)
+                if not dry_run:
+                    self.save_checkpoint(checkpoint_path, state)
+
+                rate = run_processed / max(time.perf_counter() - started, 1e-9)
+                self.stdout.write(
+                    f"  {run_processed}/{remaining} hashed, {state['changed']} changed, "
+                    f"{state['failed']} failed ({rate:.1f} artworks/s)"
+                )
+
+        elapsed = time.perf_counter() - started
+        rate = run_processed / elapsed if elapsed else 0.0
+
+        if dry_run:
+            self.report_dry_run(run_processed, state, elapsed, hashing_seconds, rate, options)
+            return
+
+        if run_processed:
+            # The hashes changed behind the signals' back: rebuild the
+            # in-process index and every stored has_duplicates flag
+            get_duplicate_index().reset()
+            flagged = sync_duplicate_flags()
+            self.stdout.write(f'Recomputed duplicate flags ({flagged} artworks have duplicates)')
+
+        if os.path.exists(checkpoint_path) and (options['limit'] is None or run_processed < options['limit']):
+            # Ran to the end of the queue
+            os.remove(checkpoint_path)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Hashed {run_processed} artworks in {elapsed:.1f}s ({rate:.1f}/s): "
+            f"{state['changed']} changed, {state['failed']} failed"
+        ))
+
+    def source_for(self, storage, name):
+        """Local path when the storage has one, file bytes otherwise"""
+        try:
+            return storage.path(name)
+        except NotImplementedError:
+            try:
+                with storage.open(name, 'rb') as f:
+                    return f.read()
+            except Exception:
+                # Let the worker report it like any other unreadable file
+                return name
+
+    def load_checkpoint(self, path, default):
+        try:
+            with open(path) as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f'No checkpoint found at {path}')
+        except ValueError as e:
+            raise CommandError(f'Checkpoint {path} is not valid JSON: {e}')
+        if state.get('mode') != default['mode']:
+            raise CommandError(
+                f"Checkpoint was written by a run {'with' if state.get('mode') == 'all' else 'without'} "
+                f"--all; pass the same options to resume it"
+            )
+        return {**default, **state}
+
+    def save_checkpoint(self, path, state):
+        # Write then rename so that an interrupted run never leaves a torn file
+        temp_path = f'{path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
+
+    def report_dry_run(self, processed, state, elapsed, hashing_seconds, rate, options):
+        queryset = Artwork.objects.exclude(image='')
+        if not options['all']:
+            queryset = queryset.filter(Q(perceptual_hash__isnull=True) | Q(perceptual_hash=''))
+        total = queryset.count()
+
+        self.stdout.write(self.style.SUCCESS('Dry run, nothing was written'))
+        self.stdout.write(f'  Artworks hashed:      {processed}')
+        self.stdout.write(f"  Hashes that differ:   {state['changed']}")
+        self.stdout.write(f"  Failures:             {state['failed']}")
+        self.stdout.write(f'  Wall time:            {elapsed:.2f}s ({hashing_seconds:.2f}s hashing)')
+        self.stdout.write(f'  Throughput:           {rate:.1f} artworks/s')
+        if rate:
+            self.stdout.write(
+                f'  Estimated full run:   {total / rate:.0f}s for {total} artworks'
+            )
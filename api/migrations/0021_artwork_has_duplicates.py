@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_add_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='has_duplicates',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_artwork_processing_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='rendition_key',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+    ]
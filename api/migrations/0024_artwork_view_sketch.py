@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_artwork_rendition_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtworkViewSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('registers', models.BinaryField()),
+                ('artwork', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_sketches', to='api.artwork')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['day'], name='api_artwork_day_9aa887_idx')],
+                'unique_together': {('artwork', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_artwork_view_sketch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artwork',
+            name='trending_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artwork',
+            name='trending_updated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='artworkviewsketch',
+            name='counted_viewers',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='artworkviewsketch',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['is_available', '-trending_score'], name='artwork_trending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='artwork',
+            index=models.Index(fields=['is_available', 'is_featured', '-trending_score'], name='artwork_featured_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:30
+
+import django.db.models.deletion
+import rest_framework.utils.encoders
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0026_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDashboardStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='dashboard_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_projects', models.PositiveIntegerField(default=0)),
+                ('ongoing_projects', models.PositiveIntegerField(default=0)),
+                ('active_bids', models.PositiveIntegerField(default=0)),
+                ('total_artworks', models.PositiveIntegerField(default=0)),
+                ('total_earnings', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('current_rating', models.DecimalField(decimal_places=2, default=0, max_digits=3)),
+                ('recent_reviews', models.JSONField(blank=True, default=list, encoder=rest_framework.utils.encoders.JSONEncoder)),
+                ('projects_posted', models.PositiveIntegerField(default=0)),
+                ('active_jobs', models.PositiveIntegerField(default=0)),
+                ('ongoing_posted_projects', models.PositiveIntegerField(default=0)),
+                ('total_orders', models.PositiveIntegerField(default=0)),
+                ('pending_orders', models.PositiveIntegerField(default=0)),
+                ('completed_orders', models.PositiveIntegerField(default=0)),
+                ('completed_order_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_spent', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('pending_payments', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0027_user_dashboard_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField(unique=True)),
+                ('users_joined', models.IntegerField(default=0)),
+                ('artists_joined', models.IntegerField(default=0)),
+                ('buyers_joined', models.IntegerField(default=0)),
+                ('admins_joined', models.IntegerField(default=0)),
+                ('jobs_posted', models.IntegerField(default=0)),
+                ('jobs_completed', models.IntegerField(default=0)),
+                ('artworks_uploaded', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('platform_fees', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+            ],
+            options={
+                'ordering': ['-bucket'],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+from django.db import OperationalError, migrations
+
+
+# Documents as built by api.search_index; rowid = pk << 2 | kind
+FILL_SQL = [
+    """
+    INSERT INTO api_search_index (rowid, title, tags, body)
+    SELECT a.id << 2 | 1, a.title, trim(u.username || ' ' || u.first_name || ' ' || u.last_name), a.description
+    FROM api_artwork a JOIN api_customuser u ON u.id = a.artist_id
+    """,
+    """
+    INSERT INTO api_search_index (rowid, title, tags, body)
+    SELECT j.id << 2 | 2, j.title, j.required_skills, j.description || ' ' || u.username
+    FROM api_job j JOIN api_customuser u ON u.id = j.buyer_id
+    """,
+    """
+    INSERT INTO api_search_index (rowid, title, tags, body)
+    SELECT p.id << 2 | 3, trim(u.username || ' ' || u.first_name || ' ' || u.last_name), p.skills,
+           p.bio || ' ' || p.portfolio_description || ' ' || u.email
+    FROM api_artistprofile p JOIN api_customuser u ON u.id = p.user_id
+    """,
+]
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; elsewhere searches keep their icontains filters
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        try:
+            cursor.execute(
+                "CREATE VIRTUAL TABLE api_search_index USING fts5("
+                "title, tags, body, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5
+            return
+        for sql in FILL_SQL:
+            cursor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS api_search_index')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0029_revenue_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
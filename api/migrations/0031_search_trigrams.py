@@ -0,0 +1,65 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:44
+
+import re
+
+from django.db import migrations, models
+
+
+ARTWORK, ARTIST = 1, 3  # api.search_index kinds
+MAX_WORD_LENGTH = 64
+
+
+# Copies of the api.trigram_search helpers as of this migration
+def words(text):
+    return {word[:MAX_WORD_LENGTH] for word in re.findall(r'\w+', (text or '').lower())}
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def document_postings(texts):
+    return [
+        (trigram, word)
+        for word in set().union(*(words(text) for text in texts))
+        for trigram in trigrams(word)
+    ]
+
+
+def fill_trigrams(apps, schema_editor):
+    SearchTrigram = apps.get_model('api', 'SearchTrigram')
+    documents = [
+        (ARTWORK, apps.get_model('api', 'Artwork').objects.values_list('pk', 'title')),
+        (ARTIST, apps.get_model('api', 'ArtistProfile').objects.values_list('pk', 'user__username', 'skills')),
+    ]
+    for kind, rows in documents:
+        SearchTrigram.objects.bulk_create((
+            SearchTrigram(trigram=trigram, kind=kind, object_id=pk, word=word)
+            for pk, *texts in rows.iterator()
+            for trigram, word in document_postings(texts)
+        ), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0030_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('kind', models.PositiveSmallIntegerField()),
+                ('object_id', models.PositiveIntegerField()),
+                ('word', models.CharField(max_length=64)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'trigram'], name='trigram_lookup_idx'), models.Index(fields=['kind', 'object_id'], name='trigram_object_idx')],
+            },
+        ),
+        migrations.RunPython(fill_trigrams, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+
+MAX_SKILL_LENGTH = 100
+
+
+# Copies of the api.skill_tags helpers as of this migration
+def normalize_skill(name):
+    return ' '.join(name.casefold().split())[:MAX_SKILL_LENGTH]
+
+
+def parse_skills(text):
+    names = (normalize_skill(name) for name in (text or '').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def tag_existing_rows(apps, schema_editor):
+    Skill = apps.get_model('api', 'Skill')
+    sources = [
+        (apps.get_model('api', 'ArtistProfile'), 'skills', 'artistprofile_id'),
+        (apps.get_model('api', 'Job'), 'required_skills', 'job_id'),
+    ]
+    parsed = [
+        (model, column, list(model.objects.values_list('pk', field)))
+        for model, field, column in sources
+    ]
+    names = {name for _, _, rows in parsed for _, text in rows for name in parse_skills(text)}
+    Skill.objects.bulk_create([Skill(name=name) for name in sorted(names)], ignore_conflicts=True)
+    skill_ids = dict(Skill.objects.values_list('name', 'id'))
+
+    for model, column, rows in parsed:
+        Link = model.skill_tags.through
+        Link.objects.bulk_create([
+            Link(**{column: pk, 'skill_id': skill_ids[name]})
+            for pk, text in rows
+            for name in parse_skills(text)
+        ], batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0031_search_trigrams'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='artistprofile',
+            name='skill_tags',
+            field=models.ManyToManyField(blank=True, related_name='artist_profiles', to='api.skill'),
+        ),
+        migrations.AddField(
+            model_name='job',
+            name='skill_tags',
+            field=models.ManyToManyField(blank=True, related_name='jobs', to='api.skill'),
+        ),
+        migrations.RunPython(tag_existing_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0032_skill_tags'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('matched_skills', models.PositiveSmallIntegerField(default=0)),
+                ('artist_profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='job_recommendations', to='api.artistprofile')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendations', to='api.job')),
+            ],
+            options={
+                'ordering': ['job', 'rank'],
+                'constraints': [models.UniqueConstraint(fields=('job', 'rank'), name='unique_job_recommendation_rank')],
+            },
+        ),
+    ]
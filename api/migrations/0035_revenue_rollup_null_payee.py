@@ -0,0 +1,40 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_payeeless_rollups(apps, schema_editor):
+    # unique_together never applied to rows without a payee; fold duplicates into the first row
+    RevenueRollup = apps.get_model('api', 'RevenueRollup')
+    duplicates = RevenueRollup.objects.filter(payee__isnull=True).values('day', 'payment_method').annotate(
+        rows=Count('id'), first=Min('id'), total_sum=Sum('total'), count_sum=Sum('payment_count')
+    ).filter(rows__gt=1)
+    for group in duplicates:
+        RevenueRollup.objects.filter(pk=group['first']).update(
+            total=group['total_sum'], payment_count=group['count_sum']
+        )
+        RevenueRollup.objects.filter(
+            payee__isnull=True, day=group['day'], payment_method=group['payment_method']
+        ).exclude(pk=group['first']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_artwork_updated_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_payeeless_rollups, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='revenuerollup',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(fields=('day', 'payment_method', 'payee'), name='unique_revenue_rollup'),
+        ),
+        migrations.AddConstraint(
+            model_name='revenuerollup',
+            constraint=models.UniqueConstraint(condition=models.Q(('payee__isnull', True)), fields=('day', 'payment_method'), name='unique_revenue_rollup_without_payee'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+# Artist documents as built by api.search_index, which no longer include the email
+FILL_ARTISTS_SQL = """
+    INSERT INTO api_search_index (rowid, title, tags, body)
+    SELECT p.id << 2 | 3, trim(u.username || ' ' || u.first_name || ' ' || u.last_name), p.skills,
+           p.bio || ' ' || p.portfolio_description
+    FROM api_artistprofile p JOIN api_customuser u ON u.id = p.user_id
+"""
+
+
+def reindex_artists(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite' or 'api_search_index' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM api_search_index WHERE rowid & 3 = 3')
+        cursor.execute(FILL_ARTISTS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0035_revenue_rollup_null_payee'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_artists, migrations.RunPython.noop),
+    ]
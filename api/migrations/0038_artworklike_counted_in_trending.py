@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:57
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_counted_likes(apps, schema_editor):
+    # The previous high-water mark credited every like up to the artwork's trending_updated_at
+    ArtworkLike = apps.get_model('api', 'ArtworkLike')
+    counted = ArtworkLike.objects.filter(created_at__lte=F('artwork__trending_updated_at')).values('pk')
+    ArtworkLike.objects.filter(pk__in=counted).update(counted_in_trending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0037_recommendation_refresh_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artworklike',
+            name='counted_in_trending',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_counted_likes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='artworklike',
+            index=models.Index(condition=models.Q(('counted_in_trending', False)), fields=['created_at'], name='artworklike_uncounted_idx'),
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth.models import AbstractUser
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+from datetime import datetime, timedelta
 from decimal import Decimal
 import uuid
 from PIL import Image
@@ -28,6 +30,11 @@ class CustomUser(AbstractUser):
     backup_codes = models.JSONField(default=list, blank=True)
     temp_2fa_secret = models.CharField(max_length=32, blank=True, null=True)  # Temporary secret for setup
     
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='user_created_idx'),
+        ]
+    
     def __str__(self):
         return f"{self.username} ({self.user_type})"
 
@@ -62,6 +69,17 @@ class TwoFactorSetupSession(models.Model):
 
  
 
+# Normalized skill tag, parsed from the comma-separated skill fields (see api.skill_tags)
+class Skill(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+
 # Artist Profile Model
 class ArtistProfile(models.Model):
     SKILL_LEVELS = (
@@ -73,6 +91,7 @@ class ArtistProfile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='artist_profile')
     bio = models.TextField(max_length=1000, blank=True)
     skills = models.TextField(help_text="Comma-separated skills")
+    skill_tags = models.ManyToManyField(Skill, related_name='artist_profiles', blank=True)
     experience_level = models.CharField(max_length=20, choices=SKILL_LEVELS, default='beginner')
     hourly_rate = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     portfolio_description = models.TextField(max_length=2000, blank=True)
@@ -157,6 +176,11 @@ from PIL import Image, ImageDraw, ImageFont
 from io import BytesIO
 from django.core.files.base import ContentFile
 import imagehash
+from .duplicate_index import get_duplicate_index
+from .image_processing import hash_image, encode_jpeg
+from .watermark import render_watermark
+from .image_ingest import attached_ingest, get_ingest
+from .renditions import content_key
 
 # Artwork Model
 class Artwork(models.Model):
@@ -166,6 +190,13 @@ class Artwork(models.Model):
         ('mixed', 'Mixed Media'),
     )
     
+    PROCESSING_STATUS = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    )
+    
     artist = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='artworks')
     title = models.CharField(max_length=200)
     description = models.TextField(max_length=2000)
@@ -179,107 +210,55 @@ class Artwork(models.Model):
     
     # Perceptual hash for duplicate detection
     perceptual_hash = models.CharField(max_length=64, blank=True, null=True, db_index=True)
+    # Kept in sync by signals; True when another available artwork is a near-duplicate
+    has_duplicates = models.BooleanField(default=False, db_index=True)
+    # Content hash of watermarked_image, names its cached renditions
+    rendition_key = models.CharField(max_length=40, blank=True, default='')
+    
+    # Post-upload processing (hash + watermark) state, see ArtworkProcessingJob
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS, default='ready')
     
     is_available = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     views_count = models.PositiveIntegerField(default=0)
     likes_count = models.PositiveIntegerField(default=0)
+    # Decayed engagement in log2 domain, maintained by recompute_trending (see api.trending)
+    trending_score = models.FloatField(default=0)
+    trending_updated_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
-    
-    
-    
-    def apply_watermark(self):
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_available', '-trending_score'], name='artwork_trending_idx'),
+            models.Index(fields=['is_available', 'is_featured', '-trending_score'], name='artwork_featured_trending_idx'),
+            models.Index(fields=['is_available', '-created_at', '-id'], name='artwork_available_created_idx'),
+            # Incremental sync of the duplicate index (api.duplicate_index)
+            models.Index(fields=['updated_at'], name='artwork_updated_idx'),
+        ]
+    
+    def apply_watermark(self, ingest=None):
         """
         Apply a bold, tiled, diagonal text watermark across the whole image
         so the watermark is clearly visible over the entire picture.
+        
+        Reuses the already decoded upload when an ImageIngest is given.
         """
         if not (self.image and (not self.watermarked_image)):
             return
 
         try:
-            original = Image.open(self.image).convert("RGBA")
-            txt = "© CultureUp"  # <- change text if you want
-
-            # pick a truetype bold font if available (preferred)
-            font_size = max(30, int(original.width * 0.12))  # ~12% of image width
-            font = None
-            for fpath in ("DejaVuSans-Bold.ttf", "arialbd.ttf", "arial.ttf"):
-                try:
-                    font = ImageFont.truetype(fpath, font_size)
-                    break
-                except Exception:
-                    font = None
-            if font is None:
-                # fallback (may be small, but will still work)
-                font = ImageFont.load_default()
-
-            # create a single watermark image (text) and rotate it
-            # first determine text size
-            dummy = Image.new("RGBA", (10, 10), (0, 0, 0, 0))
-            dummydraw = ImageDraw.Draw(dummy)
-            
-            try:
-                bbox = dummydraw.textbbox((0, 0), txt, font=font)
-                text_w = bbox[2] - bbox[0]
-                text_h = bbox[3] - bbox[1]
-            except AttributeError:
-                text_w, text_h = dummydraw.textsize(txt, font=font)
-
-            padding = int(font_size * 0.4)
-            text_img = Image.new("RGBA", (text_w + padding * 2, text_h + padding * 2), (0, 0, 0, 0))
-            text_draw = ImageDraw.Draw(text_img)
-
-            # draw text with stroke for better visibility
-            # stroke_width works on Pillow >= 5.2; fallback draws shadow
-            fill_color = (255, 255, 255, 200)   # white with high opacity
-            stroke_color = (0, 0, 0, 200)       # black stroke for contrast
-            try:
-                text_draw.text((padding, padding), txt, font=font,
-                            fill=fill_color, stroke_width=2, stroke_fill=stroke_color)
-            except TypeError:
-                # older Pillow: draw shadow then text
-                text_draw.text((padding+2, padding+2), txt, font=font, fill=stroke_color)
-                text_draw.text((padding, padding), txt, font=font, fill=fill_color)
-
-            # rotate watermark text image (diagonal)
-            angle = -30
-            rotated = text_img.rotate(angle, expand=1)
-
-            # create layer to tile watermark
-            layer = Image.new("RGBA", original.size, (0, 0, 0, 0))
-
-            # tile the rotated watermark across the layer
-            rw, rh = rotated.size
-            step_x = int(rw * 0.9)  # overlap a bit so it's continuous
-            step_y = int(rh * 0.9)
-            # start offsets to center pattern
-            start_x = -rw
-            start_y = -rh
-
-            for x in range(start_x, original.width + rw, step_x):
-                for y in range(start_y, original.height + rh, step_y):
-                    layer.paste(rotated, (x, y), rotated)
-
-            # optionally dim the watermark layer overall (if too strong)
-            # to make it uniformly semi-transparent multiply alpha
-            # choose alpha_factor between 0 (invisible) and 1 (full)
-            alpha_factor = 1.0  # 1.0 = full as drawn (we already used high alpha); reduce if too strong
-            if alpha_factor < 1.0:
-                # apply alpha multiplication
-                alpha = layer.split()[3].point(lambda p: int(p * alpha_factor))
-                layer.putalpha(alpha)
-
-            # composite the watermark layer on top of original
-            combined = Image.alpha_composite(original, layer).convert("RGB")
+            if ingest is not None:
+                combined = ingest.watermarked()
+            else:
+                with Image.open(self.image) as original:
+                    combined = render_watermark(original)
 
             # save to memory and to model field
-            temp = BytesIO()
-            combined.save(temp, format='JPEG', quality=90)
-            temp.seek(0)
             file_name = f"watermarked_{self.image.name.split('/')[-1]}"
-            self.watermarked_image.save(file_name, ContentFile(temp.read()), save=False)
+            data = encode_jpeg(combined)
+            self.watermarked_image.save(file_name, ContentFile(data), save=False)
+            self.rendition_key = content_key(data)
 
         except Exception as e:
             # for debugging you can log the exception
@@ -294,16 +273,13 @@ class Artwork(models.Model):
             return None
         
         try:
+            # Reuse the decoded upload if it went through validation
+            ingest = attached_ingest(self.image)
+            if ingest is not None:
+                return ingest.perceptual_hash
+            
             # Open image and generate hash
-            with Image.open(self.image) as img:
-                # Convert to RGB if needed
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                # Generate perceptual hash using average hash
-                # aHash is good for detecting duplicates and resized images
-                hash_value = imagehash.average_hash(img, hash_size=16)
-                return str(hash_value)
+            return hash_image(self.image)
         except (IOError, OSError, ValueError) as e:
             print(f"Error generating perceptual hash: {e}")
             return None
@@ -324,37 +300,38 @@ class Artwork(models.Model):
         if not self.perceptual_hash:
             return []
         
-        # Get all other artworks with perceptual hashes (exclude current artwork)
-        other_artworks = Artwork.objects.exclude(id=self.id).filter(
-            perceptual_hash__isnull=False,
-            is_available=True
+        # Look up near neighbours in the BK-tree index instead of scanning
+        # every hashed artwork
+        matches = [
+            (artwork_id, distance)
+            for artwork_id, distance in get_duplicate_index().query(self.perceptual_hash, similarity_threshold)
+            if artwork_id != self.id
+        ]
+        artworks = Artwork.objects.in_bulk(
+            [artwork_id for artwork_id, _ in matches]
         )
         
         duplicates = []
-        current_hash = imagehash.hex_to_hash(self.perceptual_hash)
-        
-        for artwork in other_artworks:
-            try:
-                other_hash = imagehash.hex_to_hash(artwork.perceptual_hash)
-                # Calculate hamming distance (similarity)
-                distance = current_hash - other_hash
-                
-                if distance <= similarity_threshold:
-                    duplicates.append({
-                        'artwork': artwork,
-                        'similarity_score': distance,
-                        'similarity_percentage': round((64 - distance) / 64 * 100, 2)
-                    })
-            except Exception as e:
-                print(f"Error comparing hashes: {e}")
+        for artwork_id, distance in matches:
+            artwork = artworks.get(artwork_id)
+            if artwork is None or not artwork.is_available:
                 continue
+            duplicates.append({
+                'artwork': artwork,
+                'similarity_score': distance,
+                'similarity_percentage': round((64 - distance) / 64 * 100, 2)
+            })
         
-        # Sort by similarity (lower distance = more similar)
-        duplicates.sort(key=lambda x: x['similarity_score'])
+        # Matches come back sorted by similarity (lower distance = more similar)
         return duplicates
 
+    @staticmethod
+    def hash_image_file(image_file):
+        """Perceptual hash of an uploaded image before it is saved"""
+        return get_ingest(image_file).perceptual_hash
+
     @classmethod
-    def find_duplicates_for_image(cls, image_file, similarity_threshold=5):
+    def find_duplicates_for_image(cls, image_file, similarity_threshold=5, image_hash=None):
         """
         Class method to check for duplicates before saving an artwork
         Used in views to prevent duplicate uploads
@@ -362,47 +339,37 @@ class Artwork(models.Model):
         Args:
             image_file: Django UploadedFile or file path
             similarity_threshold: Maximum hamming distance to consider as duplicate
+            image_hash: Already computed perceptual hash of image_file, if any
         
         Returns:
             List of duplicate artworks with similarity scores
         """
         try:
             # Generate hash for the uploaded image
-            with Image.open(image_file) as img:
-                if img.mode != 'RGB':
-                    img = img.convert('RGB')
-                
-                new_hash = imagehash.average_hash(img, hash_size=16)
-                new_hash_str = str(new_hash)
+            new_hash_str = image_hash or cls.hash_image_file(image_file)
             
-            # Compare with existing artworks
-            existing_artworks = cls.objects.filter(
-                perceptual_hash__isnull=False,
-                is_available=True
+            # Compare with existing artworks through the BK-tree index
+            matches = get_duplicate_index().query(new_hash_str, similarity_threshold)
+            artworks = cls.objects.select_related('artist').in_bulk(
+                [artwork_id for artwork_id, _ in matches]
             )
             
             duplicates = []
             
-            for artwork in existing_artworks:
-                try:
-                    existing_hash = imagehash.hex_to_hash(artwork.perceptual_hash)
-                    distance = new_hash - existing_hash
-                    
-                    if distance <= similarity_threshold:
-                        duplicates.append({
-                            'artwork': artwork,
-                            'similarity_score': distance,
-                            'similarity_percentage': round((64 - distance) / 64 * 100, 2),
-                            'artist': artwork.artist.username,
-                            'title': artwork.title,
-                            'upload_date': artwork.created_at
-                        })
-                except Exception as e:
-                    print(f"Error comparing with artwork {artwork.id}: {e}")
+            for artwork_id, distance in matches:
+                artwork = artworks.get(artwork_id)
+                if artwork is None or not artwork.is_available:
                     continue
+                duplicates.append({
+                    'artwork': artwork,
+                    'similarity_score': distance,
+                    'similarity_percentage': round((64 - distance) / 64 * 100, 2),
+                    'artist': artwork.artist.username,
+                    'title': artwork.title,
+                    'upload_date': artwork.created_at
+                })
             
-            # Sort by similarity
-            duplicates.sort(key=lambda x: x['similarity_score'])
+            # Matches come back sorted by similarity
             return duplicates
             
         except Exception as e:
@@ -410,24 +377,44 @@ class Artwork(models.Model):
             return []
 
 
+    @property
+    def is_processing_deferred(self):
+        return self.processing_status in ('pending', 'processing')
+
     def save(self, *args, **kwargs):
+        deferred = self.is_processing_deferred
+        creating = self._state.adding
+        # The upload is replaced by its stored name once saved, so grab the
+        # decoded image now
+        ingest = attached_ingest(self.image)
+
         # Generate perceptual hash if image is provided and hash doesn't exist
-        if self.image and not self.perceptual_hash:
+        if self.image and not self.perceptual_hash and not deferred:
             self.perceptual_hash = self.generate_perceptual_hash()
         
         super().save(*args, **kwargs)
         
+        if deferred:
+            # Hash and watermark are filled in by the process_artwork_jobs worker
+            if creating:
+                ArtworkProcessingJob.objects.get_or_create(artwork=self)
+            return
+        
         # Apply watermark after saving
         if self.image and not self.watermarked_image:
-            self.apply_watermark()
-            super().save(update_fields=['watermarked_image'])
+            self.apply_watermark(ingest)
+            super().save(update_fields=['watermarked_image', 'rendition_key'])
 
         
     
-    def increment_views(self):
-        """Increment view count"""
-        self.views_count += 1
-        self.save(update_fields=['views_count'])
+    def increment_views(self, viewer=None):
+        """
+        Count a view, by the viewer with the given unique_views.viewer_hash if
+        known. It is buffered and written in batches by the view counter;
+        views_count is bumped to include this process's pending views.
+        """
+        from .view_counter import get_view_counter
+        self.views_count += get_view_counter().record(self.pk, viewer)
     
     def get_likes_count(self):
         """Get total number of likes from ArtworkLike model"""
@@ -440,23 +427,33 @@ class Artwork(models.Model):
         return False
     
     def toggle_like(self, user):
-        """Toggle like for user - returns (liked, likes_count)"""
-        if not user.is_authenticated:
-            return False, self.get_likes_count()
-        
-        like, created = self.user_likes.get_or_create(user=user)
+        """
+        Toggle like for user - returns (liked, likes_count).
         
-        if not created:
-            # Like already exists, remove it (unlike)
-            like.delete()
-            liked = False
-        else:
-            # New like created
-            liked = True
+        The like row is inserted or deleted and likes_count moved by one with
+        an F() update in the same transaction, so concurrent toggles never
+        overwrite each other's count. reconcile_like_counts repairs any drift.
+        """
+        if not user.is_authenticated:
+            return False, self.likes_count
         
-        # Update the likes_count field to keep it in sync
-        self.likes_count = self.get_likes_count()
-        self.save(update_fields=['likes_count'])
+        artworks = Artwork.objects.filter(pk=self.pk)
+        with transaction.atomic():
+            deleted, _ = ArtworkLike.objects.filter(user=user, artwork=self).delete()
+            if deleted:
+                liked = False
+                artworks.filter(likes_count__gt=0).update(likes_count=models.F('likes_count') - 1)
+            else:
+                liked = True
+                try:
+                    with transaction.atomic():
+                        ArtworkLike.objects.create(user=user, artwork=self)
+                except IntegrityError:
+                    # A concurrent request of the same user liked it first
+                    pass
+                else:
+                    artworks.update(likes_count=models.F('likes_count') + 1)
+            self.likes_count = artworks.values_list('likes_count', flat=True).get()
         
         return liked, self.likes_count
     
@@ -486,6 +483,7 @@ class Job(models.Model):
     budget_max = models.DecimalField(max_digits=10, decimal_places=2)
     duration_days = models.PositiveIntegerField()
     required_skills = models.TextField(help_text="Comma-separated required skills")
+    skill_tags = models.ManyToManyField(Skill, related_name='jobs', blank=True)
     experience_level = models.CharField(max_length=20, choices=EXPERIENCE_LEVELS, default='entry')
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
     hired_artist = models.ForeignKey(
@@ -500,6 +498,11 @@ class Job(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='job_created_idx'),
+        ]
+    
     def calculate_average_bid(self):
         """Calculate average bid amount for this job"""
         bids = self.bids.all()
@@ -577,6 +580,11 @@ class Equipment(models.Model):
     is_available = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='equipment_created_idx'),
+        ]
+    
     def is_in_stock(self):
         """Check if equipment is in stock"""
         return self.stock_quantity > 0
@@ -629,6 +637,11 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+        ]
+    
     def calculate_total(self):
         """Calculate total order amount"""
         artwork_total = self.artwork_items.aggregate(
@@ -720,6 +733,13 @@ class Payment(models.Model):
     
 
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='payment_created_idx'),
+            models.Index(fields=['payer', '-created_at', '-id'], name='payment_payer_created_idx'),
+            models.Index(fields=['payee', '-created_at', '-id'], name='payment_payee_created_idx'),
+        ]
+    
     def save(self, *args, **kwargs):
         if not self.transaction_id:
             self.transaction_id = str(uuid.uuid4())
@@ -757,6 +777,12 @@ class Message(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender', '-created_at', '-id'], name='message_sender_created_idx'),
+            models.Index(fields=['receiver', '-created_at', '-id'], name='message_receiver_created_idx'),
+        ]
+    
     def mark_as_read(self):
         """Mark message as read"""
         self.is_read = True
@@ -859,11 +885,77 @@ class Notification(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', '-created_at', '-id'], name='notification_recipient_idx'),
+        ]
     
     def __str__(self):
         return f"Notification for {self.recipient.username}: {self.title}"
 
+# Completed payment revenue per day, see api.revenue_rollups
+class RevenueRollup(models.Model):
+    day = models.DateField()
+    payment_method = models.CharField(max_length=20, choices=Payment.PAYMENT_METHODS)
+    payee = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name='revenue_rollups', null=True, blank=True
+    )
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'payment_method', 'payee'], name='unique_revenue_rollup'),
+            # NULLs are distinct in the constraint above, so payee-less payments get their own
+            models.UniqueConstraint(
+                fields=['day', 'payment_method'], condition=models.Q(payee__isnull=True),
+                name='unique_revenue_rollup_without_payee'
+            ),
+        ]
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"Revenue for {self.day} ({self.payment_method})"
+
+
+class BuyerSpendRollup(models.Model):
+    day = models.DateField()
+    payer = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='spend_rollups')
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    payment_count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['day', 'payer']
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"Spend of {self.payer.username} on {self.day}"
+
+
 # Analytics Model for Admin Dashboard
+class AnalyticsRollup(models.Model):
+    """
+    Platform activity of one hour, as deltas. Rows are written as events
+    happen (see api.analytics_rollups) and summed for cumulative totals.
+    Deletions and reversals are recorded as negative deltas.
+    """
+    bucket = models.DateTimeField(unique=True)  # start of the hour, UTC
+    users_joined = models.IntegerField(default=0)
+    artists_joined = models.IntegerField(default=0)
+    buyers_joined = models.IntegerField(default=0)
+    admins_joined = models.IntegerField(default=0)
+    jobs_posted = models.IntegerField(default=0)
+    jobs_completed = models.IntegerField(default=0)
+    artworks_uploaded = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    platform_fees = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['-bucket']
+
+    def __str__(self):
+        return f"Analytics rollup for {self.bucket:%Y-%m-%d %H:00}"
+
+
 class PlatformAnalytics(models.Model):
     date = models.DateField(auto_now_add=True)
     total_users = models.PositiveIntegerField(default=0)
@@ -876,28 +968,21 @@ class PlatformAnalytics(models.Model):
     total_platform_fees = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
     
     def calculate_daily_stats(self):
-        """Calculate daily statistics"""
-        # Users
-        self.total_users = CustomUser.objects.count()
-        self.total_artists = CustomUser.objects.filter(user_type='artist').count()
-        self.total_buyers = CustomUser.objects.filter(user_type='buyer').count()
-        
-        # Jobs
-        self.total_jobs_posted = Job.objects.count()
-        self.total_jobs_completed = Job.objects.filter(status='completed').count()
-        
-        # Artworks
-        self.total_artworks_uploaded = Artwork.objects.count()
-        
-        # Revenue
-        completed_payments = Payment.objects.filter(status='completed')
-        self.total_revenue = completed_payments.aggregate(
-            total=models.Sum('amount')
-        )['total'] or Decimal('0.00')
-        
-        # Platform fees (assuming 5% fee)
-        self.total_platform_fees = self.total_revenue * Decimal('0.05')
-        
+        """Calculate daily statistics from the hourly rollups up to the end of the day"""
+        from .analytics_rollups import rollup_totals
+
+        day_end = timezone.make_aware(datetime.combine(self.date + timedelta(days=1), datetime.min.time()))
+        totals = rollup_totals(until=day_end)
+
+        self.total_users = totals['users_joined']
+        self.total_artists = totals['artists_joined']
+        self.total_buyers = totals['buyers_joined']
+        self.total_jobs_posted = totals['jobs_posted']
+        self.total_jobs_completed = totals['jobs_completed']
+        self.total_artworks_uploaded = totals['artworks_uploaded']
+        self.total_revenue = totals['revenue']
+        self.total_platform_fees = totals['platform_fees']
+
         self.save()
     
     class Meta:
@@ -914,10 +999,181 @@ class ArtworkLike(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='artwork_likes')
     artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='user_likes')
     created_at = models.DateTimeField(auto_now_add=True)
+    # Already credited to the artwork's trending score by recompute_trending
+    counted_in_trending = models.BooleanField(default=False)
     
     class Meta:
         unique_together = ['user', 'artwork']  # Ensures one like per user per artwork
         ordering = ['-created_at']
+        indexes = [
+            models.Index(
+                fields=['created_at'], condition=models.Q(counted_in_trending=False),
+                name='artworklike_uncounted_idx'
+            ),
+        ]
+    
+    @classmethod
+    def liked_artwork_ids(cls, user, artworks):
+        """IDs of the given artworks that the user has liked, in one query"""
+        if user is None or not user.is_authenticated:
+            return set()
+        artwork_ids = [artwork.pk for artwork in artworks]
+        if not artwork_ids:
+            return set()
+        return set(
+            cls.objects.filter(user=user, artwork_id__in=artwork_ids)
+            .values_list('artwork_id', flat=True)
+        )
+    
+    def __str__(self):
+        return f"{self.user.username} likes {self.artwork.title}"
+
+# Materialized dashboard counters of a user
+class UserDashboardStats(models.Model):
+    """
+    Counters shown by dashboard_stats, kept current by signals and
+    rebuilt by the rebuild_user_stats command (see api.user_stats)
+    """
+    user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, primary_key=True, related_name='dashboard_stats')
+    
+    # Artist side
+    total_projects = models.PositiveIntegerField(default=0)
+    ongoing_projects = models.PositiveIntegerField(default=0)
+    active_bids = models.PositiveIntegerField(default=0)
+    total_artworks = models.PositiveIntegerField(default=0)
+    total_earnings = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    current_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0)
+    recent_reviews = models.JSONField(default=list, blank=True, encoder=JSONEncoder)
+    
+    # Buyer side
+    projects_posted = models.PositiveIntegerField(default=0)
+    active_jobs = models.PositiveIntegerField(default=0)
+    ongoing_posted_projects = models.PositiveIntegerField(default=0)
+    total_orders = models.PositiveIntegerField(default=0)
+    pending_orders = models.PositiveIntegerField(default=0)
+    completed_orders = models.PositiveIntegerField(default=0)
+    completed_order_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_spent = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    pending_payments = models.PositiveIntegerField(default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Dashboard stats of user #{self.user_id}"
+
+# Daily unique-viewer sketch of an artwork
+class ArtworkViewSketch(models.Model):
+    """
+    zlib-compressed HyperLogLog registers of the viewers of an artwork on one
+    day. Written in batches by the view counter, read through api.unique_views.
+    """
+    artwork = models.ForeignKey(Artwork, on_delete=models.CASCADE, related_name='view_sketches')
+    day = models.DateField()
+    registers = models.BinaryField()
+    # Unique viewers already credited to the trending score
+    counted_viewers = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['artwork', 'day']
+        indexes = [
+            models.Index(fields=['day']),
+        ]
+    
+    def __str__(self):
+        return f"Viewers of artwork #{self.artwork_id} on {self.day}"
+
+class SearchTrigram(models.Model):
+    """
+    Trigram posting of one word of an indexed artwork title or artist
+    username/skills, for typo-tolerant search through api.trigram_search.
+    """
+    trigram = models.CharField(max_length=3)
+    kind = models.PositiveSmallIntegerField()  # api.search_index.ARTWORK or ARTIST
+    object_id = models.PositiveIntegerField()
+    word = models.CharField(max_length=64)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'trigram'], name='trigram_lookup_idx'),
+            models.Index(fields=['kind', 'object_id'], name='trigram_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.trigram!r} in {self.word}"
+
+class JobRecommendation(models.Model):
+    """
+    One of the top-K artists precomputed for an open job by
+    api.recommendations, served by the job's recommended-artists endpoint
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='recommendations')
+    artist_profile = models.ForeignKey(ArtistProfile, on_delete=models.CASCADE, related_name='job_recommendations')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    matched_skills = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['job', 'rank']
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'rank'], name='unique_job_recommendation_rank'),
+        ]
+
+    def __str__(self):
+        return f"#{self.rank} for job #{self.job_id}: artist profile #{self.artist_profile_id}"
+
+
+class RecommendationRefresh(models.Model):
+    """
+    A job or artist profile whose recommendations need rescoring, queued by
+    the signals when JOB_RECOMMENDATION_ASYNC is on and run by the
+    process_recommendation_refreshes management command
+    """
+    KIND_CHOICES = (
+        ('job', 'Job'),
+        ('profile', 'Artist profile'),
+    )
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+        constraints = [
+            # A row waiting in the queue covers every later change of the same object
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='unique_recommendation_refresh'),
+        ]
+
+    def __str__(self):
+        return f"Refresh recommendations of {self.kind} #{self.object_id}"
+
+# Background processing job for artwork uploads
+class ArtworkProcessingJob(models.Model):
+    """
+    Queue entry for the post-upload work (perceptual hash + watermark) of an
+    artwork. Claimed and run by the process_artwork_jobs management command.
+    """
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    )
+    
+    artwork = models.OneToOneField(Artwork, on_delete=models.CASCADE, related_name='processing_job')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
     
     def __str__(self):
-        return f"{self.user.username} likes {self.artwork.title}"
\ No newline at end of file
+        return f"Processing job for artwork #{self.artwork_id} ({self.status})"
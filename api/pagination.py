@@ -0,0 +1,58 @@
+"""
+Opt-in cursor (keyset) pagination for high-volume lists.
+
+Page-number pages cost a COUNT(*) plus an OFFSET scan that grows with the
+page number. A request that sends `?pagination=cursor`, or follows a `cursor`
+link, is paginated on (-created_at, -id) instead: every page is one range
+scan of a composite index, however deep it is. Requests without either
+parameter keep the page-number format, so existing clients are unaffected.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Newest first; the OrderingFilter of the view is ignored in cursor mode"""
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+
+class CursorSelectablePaginationMixin:
+    """
+    Mix into a page-number paginator to let each request choose cursor
+    pagination. Page size settings are shared with the page-number class.
+    """
+    cursor_pagination_class = CreatedAtCursorPagination
+    pagination_query_param = 'pagination'
+
+    def wants_cursor(self, request, view=None):
+        # Views whose other actions have their own ordering list the ones
+        # that may be keyset-paginated in `cursor_paginated_actions`
+        actions = getattr(view, 'cursor_paginated_actions', None)
+        if actions is not None and getattr(view, 'action', None) not in actions:
+            return False
+        params = request.query_params
+        return (
+            self.cursor_pagination_class.cursor_query_param in params
+            or params.get(self.pagination_query_param) == 'cursor'
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if not self.wants_cursor(request, view):
+            return super().paginate_queryset(queryset, request, view)
+
+        paginator = self.cursor_pagination_class()
+        paginator.page_size = self.page_size
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.max_page_size = self.max_page_size
+        self.cursor_paginator = paginator
+        return paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,279 @@
+"""
+Precomputed artist recommendations for open jobs.
+
+Every open job is scored against every available artist profile, and the
+best JOB_RECOMMENDATION_TOP_K are stored as JobRecommendation rows, so the
+recommended-artists endpoint only reads them. A score is a weighted sum of
+features in [0, 1]:
+
+    skills      share of the job's skill tags the artist has (api.skill_tags)
+    experience  1, less 0.5 per level the artist is below the job's level
+    rate        1 while hourly_rate * HOURS_PER_DAY * duration_days fits
+                budget_max, budget_max / estimate above it
+    rating      rating / 5
+    completion  completed / hired projects
+
+Artists sharing none of the skills a job lists are never recommended for it.
+Scoring is done for a batch of jobs at once as (jobs x artists) numpy
+matrices; skill overlap is one matrix product over the skills the batch uses.
+
+The signals in api.signals keep the lists current, for saves that change a
+ranking field. A saved job rescores only that job. A saved profile is scored
+against every open job, and only the jobs it is listed for or would now
+enter are rescored. By default the work runs in the saving request, once its
+transaction commits. Only with JOB_RECOMMENDATION_ASYNC does it leave the
+request: it is then queued as RecommendationRefresh rows for the
+process_recommendation_refreshes command, which rescores a whole batch of
+profiles in one pass over the jobs. The refresh_job_recommendations
+command recomputes everything.
+"""
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from .models import ArtistProfile, Job, JobRecommendation, RecommendationRefresh
+
+
+DEFAULT_TOP_K = 20
+# Jobs scored per batch; the score matrices are batch size x available artists
+DEFAULT_BATCH_SIZE = 128
+# Queued refreshes run per round by process_recommendation_refreshes
+DEFAULT_QUEUE_BATCH_SIZE = 500
+# Working hours assumed per day of Job.duration_days when pricing an artist
+HOURS_PER_DAY = 8
+
+WEIGHTS = {
+    'skills': 0.5,
+    'experience': 0.2,
+    'rate': 0.15,
+    'rating': 0.1,
+    'completion': 0.05,
+}
+
+ARTIST_LEVELS = {'beginner': 0, 'intermediate': 1, 'expert': 2}
+JOB_LEVELS = {'entry': 0, 'intermediate': 1, 'expert': 2}
+
+# Fields whose change can move a job or a profile in the rankings
+JOB_FIELDS = {'status', 'required_skills', 'experience_level', 'budget_max', 'duration_days'}
+PROFILE_FIELDS = {'skills', 'experience_level', 'hourly_rate', 'rating', 'is_available'}
+
+
+def top_k():
+    return getattr(settings, 'JOB_RECOMMENDATION_TOP_K', DEFAULT_TOP_K)
+
+
+def is_async():
+    return getattr(settings, 'JOB_RECOMMENDATION_ASYNC', False)
+
+
+def _skill_links(through, owner_column, owners):
+    links = np.array(
+        list(through.objects.filter(**{f'{owner_column}__in': owners}).values_list(owner_column, 'skill_id')),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    return links[:, 0], links[:, 1]
+
+
+class _Artists:
+    """Feature vectors of the available artist profiles, in primary key order"""
+
+    def __init__(self, queryset):
+        queryset = queryset.filter(is_available=True).order_by('pk')
+        rows = list(queryset.values_list('pk', 'user_id', 'experience_level', 'hourly_rate', 'rating'))
+        hired = {
+            row['hired_artist_id']: row
+            for row in Job.objects.filter(hired_artist__artist_profile__in=queryset).order_by().values(
+                'hired_artist_id'
+            ).annotate(total=Count('id'), completed=Count('id', filter=Q(status='completed')))
+        }
+
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.levels = np.array([ARTIST_LEVELS.get(row[2], 0) for row in rows], dtype=np.float32)
+        self.rates = np.array([float(row[3]) for row in rows], dtype=np.float32)
+        self.ratings = np.array([float(row[4]) / 5 for row in rows], dtype=np.float32)
+        self.completion = np.array([
+            hired[row[1]]['completed'] / hired[row[1]]['total'] if row[1] in hired else 0
+            for row in rows
+        ], dtype=np.float32)
+        owners, self.skill_ids = _skill_links(ArtistProfile.skill_tags.through, 'artistprofile_id', queryset)
+        self.skill_rows = np.searchsorted(self.ids, owners)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class _Jobs:
+    """Feature vectors of a batch of open jobs, in primary key order"""
+
+    def __init__(self, jobs):
+        self.ids = np.array([job.pk for job in jobs], dtype=np.int64)
+        self.levels = np.array([JOB_LEVELS.get(job.experience_level, 0) for job in jobs], dtype=np.float32)
+        self.budgets = np.array([float(job.budget_max) for job in jobs], dtype=np.float32)
+        self.days = np.array([job.duration_days for job in jobs], dtype=np.float32)
+        owners, self.skill_ids = _skill_links(Job.skill_tags.through, 'job_id', self.ids.tolist())
+        self.skill_rows = np.searchsorted(self.ids, owners)
+        self.skill_counts = np.bincount(self.skill_rows, minlength=len(self.ids)).astype(np.float32)
+
+
+def _open_jobs(queryset):
+    return queryset.filter(status='open').order_by('pk').only(
+        'pk', 'experience_level', 'budget_max', 'duration_days'
+    )
+
+
+def score(jobs, artists):
+    """
+    (scores, matched skills) as (jobs x artists) matrices; artists that may
+    not be recommended for a job score -inf
+    """
+    # Columns for just the skills this batch of jobs asks for
+    skills = np.unique(jobs.skill_ids)
+    job_skills = np.zeros((len(jobs.ids), len(skills)), dtype=np.float32)
+    job_skills[jobs.skill_rows, np.searchsorted(skills, jobs.skill_ids)] = 1
+    artist_skills = np.zeros((len(artists), len(skills)), dtype=np.float32)
+    wanted = np.isin(artists.skill_ids, skills)
+    artist_skills[artists.skill_rows[wanted], np.searchsorted(skills, artists.skill_ids[wanted])] = 1
+    matched = job_skills @ artist_skills.T
+
+    skill_score = matched / np.maximum(jobs.skill_counts, 1)[:, None]
+    experience = 1 - 0.5 * np.clip(jobs.levels[:, None] - artists.levels[None, :], 0, None)
+    estimate = artists.rates[None, :] * (HOURS_PER_DAY * jobs.days[:, None])
+    budget = np.broadcast_to(jobs.budgets[:, None], estimate.shape)
+    rate = np.divide(budget, estimate, out=np.ones_like(estimate), where=estimate > budget)
+
+    scores = (
+        WEIGHTS['skills'] * skill_score
+        + WEIGHTS['experience'] * experience
+        + WEIGHTS['rate'] * rate
+        + WEIGHTS['rating'] * artists.ratings[None, :]
+        + WEIGHTS['completion'] * artists.completion[None, :]
+    )
+    eligible = (matched > 0) | (jobs.skill_counts[:, None] == 0)
+    return np.where(eligible, scores, -np.inf), matched
+
+
+def _recommendations(jobs, artists, k):
+    """Unsaved JobRecommendation rows of the best k artists of every job"""
+    if not len(artists) or not len(jobs.ids):
+        return []
+    scores, matched = score(jobs, artists)
+    k = min(k, len(artists))
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    # Best score first, lowest profile id first among equal scores
+    order = np.lexsort((artists.ids[top], -top_scores), axis=1)
+    top = np.take_along_axis(top, order, axis=1)
+
+    recommendations = []
+    for row, job_id in enumerate(jobs.ids.tolist()):
+        for rank, column in enumerate(top[row].tolist(), start=1):
+            if not np.isfinite(scores[row, column]):
+                break
+            recommendations.append(JobRecommendation(
+                job_id=job_id, artist_profile_id=int(artists.ids[column]), rank=rank,
+                score=round(float(scores[row, column]), 6), matched_skills=int(matched[row, column]),
+            ))
+    return recommendations
+
+
+def _batches(queryset, batch_size):
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        last_id = batch[-1].pk
+        yield batch
+
+
+def refresh_jobs(job_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Recompute the lists of the given jobs; jobs that aren't open lose theirs"""
+    job_ids = list(job_ids)
+    if not job_ids:
+        return
+    artists = _Artists(ArtistProfile.objects.all())
+    with transaction.atomic():
+        JobRecommendation.objects.filter(job_id__in=job_ids).delete()
+        for batch in _batches(_open_jobs(Job.objects.filter(pk__in=job_ids)), batch_size):
+            JobRecommendation.objects.bulk_create(_recommendations(_Jobs(batch), artists, top_k()), batch_size=1000)
+
+
+def _affected_jobs(profile_ids, batch_size):
+    """The jobs the given artist profiles are listed for or would now make"""
+    k = top_k()
+    affected = set(JobRecommendation.objects.filter(artist_profile_id__in=profile_ids).values_list('job_id', flat=True))
+    artists = _Artists(ArtistProfile.objects.filter(pk__in=profile_ids))
+    if len(artists):
+        cutoffs = {
+            row['job_id']: row['lowest'] if row['listed'] >= k else -np.inf
+            for row in JobRecommendation.objects.order_by().values('job_id').annotate(
+                lowest=Min('score'), listed=Count('id')
+            )
+        }
+        for batch in _batches(_open_jobs(Job.objects.all()), batch_size):
+            jobs = _Jobs(batch)
+            best = score(jobs, artists)[0].max(axis=1)
+            for job_id, job_best in zip(jobs.ids.tolist(), best.tolist()):
+                if job_best > cutoffs.get(job_id, -np.inf):
+                    affected.add(job_id)
+    return affected
+
+
+def refresh(job_ids=(), profile_ids=(), batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recompute the lists of the given jobs, and of the jobs the given artist
+    profiles are on or would now make after the profiles changed
+    """
+    job_ids = set(job_ids)
+    profile_ids = list(profile_ids)
+    if profile_ids:
+        job_ids |= _affected_jobs(profile_ids, batch_size)
+    refresh_jobs(sorted(job_ids), batch_size)
+
+
+def refresh_profiles(profile_ids, batch_size=DEFAULT_BATCH_SIZE):
+    """Rescore the jobs whose lists the given artist profiles are on or would now make"""
+    refresh(profile_ids=profile_ids, batch_size=batch_size)
+
+
+def enqueue(job_ids=(), profile_ids=()):
+    """Queue the refresh of the given jobs and profiles for process_queue"""
+    RecommendationRefresh.objects.bulk_create([
+        *(RecommendationRefresh(kind='job', object_id=pk) for pk in set(job_ids)),
+        *(RecommendationRefresh(kind='profile', object_id=pk) for pk in set(profile_ids)),
+    ], ignore_conflicts=True)
+
+
+def process_queue(batch_size=DEFAULT_QUEUE_BATCH_SIZE):
+    """Run up to batch_size of the oldest queued refreshes at once; the number run"""
+    rows = list(RecommendationRefresh.objects.order_by('created_at', 'pk').values_list(
+        'pk', 'kind', 'object_id'
+    )[:batch_size])
+    if not rows:
+        return 0
+    job_ids = [object_id for _, kind, object_id in rows if kind == 'job']
+    profile_ids = [object_id for _, kind, object_id in rows if kind == 'profile']
+    # Claimed before scoring, so changes made meanwhile are queued again
+    RecommendationRefresh.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    try:
+        refresh(job_ids, profile_ids)
+    except Exception:
+        enqueue(job_ids, profile_ids)
+        raise
+    return len(rows)
+
+
+def rebuild(batch_size=DEFAULT_BATCH_SIZE):
+    """Recompute the list of every open job; (jobs, recommendations)"""
+    artists = _Artists(ArtistProfile.objects.all())
+    jobs = recommendations = 0
+    with transaction.atomic():
+        JobRecommendation.objects.all().delete()
+        for batch in _batches(_open_jobs(Job.objects.all()), batch_size):
+            rows = _recommendations(_Jobs(batch), artists, top_k())
+            JobRecommendation.objects.bulk_create(rows, batch_size=1000)
+            jobs += len(batch)
+            recommendations += len(rows)
+    return jobs, recommendations
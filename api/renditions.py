@@ -0,0 +1,115 @@
+"""
+Responsive renditions of watermarked artwork images.
+
+Each artwork gets thumbnail / medium / large versions of its watermarked
+image in WebP and JPEG. A rendition is generated the first time it is
+requested through ArtworkViewSet.rendition. It is then kept under
+MEDIA_ROOT/renditions/, named after a content hash of the watermarked
+image, so a regenerated watermark never serves stale renditions and
+identical images share files.
+"""
+
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from PIL import Image
+
+from .image_processing import open_image
+
+
+# Longest edge in pixels; images are never upscaled
+RENDITION_SIZES = {
+    'thumbnail': 320,
+    'medium': 800,
+    'large': 1600,
+}
+
+RENDITION_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def content_key(data):
+    """Content hash used to name the renditions of one watermarked image"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def rendition_name(key, size, ext):
+    return f'renditions/{key[:2]}/{key}_{size}.{ext}'
+
+
+def render_rendition(source, size, ext):
+    """Encode one rendition of an image file or bytes; pure, no storage access"""
+    max_edge = RENDITION_SIZES[size]
+    format_name, save_options = RENDITION_FORMATS[ext]
+    with open_image(source) as img:
+        # Let the JPEG decoder scale down first; it still returns >= max_edge
+        img.draft('RGB', (max_edge, max_edge))
+        img = img.convert('RGB')
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        output = BytesIO()
+        img.save(output, format=format_name, **save_options)
+        return output.getvalue()
+
+
+def get_rendition_key(artwork):
+    """
+    The artwork's content key. Artworks watermarked before renditions
+    existed get theirs computed from the stored file on first use.
+    """
+    if artwork.rendition_key:
+        return artwork.rendition_key
+    if not artwork.watermarked_image:
+        return None
+    with artwork.watermarked_image.open('rb') as f:
+        key = content_key(f.read())
+    type(artwork).objects.filter(pk=artwork.pk).update(rendition_key=key)
+    artwork.rendition_key = key
+    return key
+
+
+def ensure_rendition(artwork, size, ext, storage=default_storage):
+    """
+    Storage name of the requested rendition, generating it on first use.
+    Returns None while the artwork has no watermarked image yet.
+    """
+    key = get_rendition_key(artwork)
+    if key is None:
+        return None
+
+    name = rendition_name(key, size, ext)
+    if storage.exists(name):
+        return name
+
+    with artwork.watermarked_image.open('rb') as f:
+        data = render_rendition(f, size, ext)
+    saved_name = storage.save(name, ContentFile(data))
+    if saved_name != name:
+        # Another request generated the same rendition meanwhile; the content
+        # is identical, so keep theirs
+        storage.delete(saved_name)
+    return name
+
+
+def rendition_urls(artwork, request=None):
+    """
+    {size: {ext: url}} of the rendition endpoint, or None while the
+    watermark is still being processed.
+    """
+    if not artwork.watermarked_image:
+        return None
+
+    urls = {}
+    for size in RENDITION_SIZES:
+        urls[size] = {}
+        for ext in RENDITION_FORMATS:
+            url = reverse('artwork-renditions', kwargs={'pk': artwork.pk, 'size': size, 'ext': ext})
+            if artwork.rendition_key:
+                # Lets clients and proxies cache per content version
+                url = f'{url}?v={artwork.rendition_key[:12]}'
+            urls[size][ext] = request.build_absolute_uri(url) if request else url
+    return urls
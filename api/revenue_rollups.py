@@ -0,0 +1,83 @@
+"""
+Daily revenue rollups behind admin_revenue_report.
+
+A completed payment adds its amount to the RevenueRollup row of its day,
+payment method and payee, and to the BuyerSpendRollup row of its day and
+payer. The day is the payment's creation day, as in the report before it was
+rolled up. Leaving `completed`, or being deleted, subtracts it again. The
+signals in api.signals keep the rows current; code that bypasses the save
+signals with QuerySet.update() calls record_payment_revenue itself. The
+backfill_revenue_rollups command rebuilds both tables from the payments.
+
+The report then reads a few rows per day in its range, whatever the number
+of payments.
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BuyerSpendRollup, Payment, RevenueRollup
+
+
+def revenue_keys(payment):
+    """The (model, key) of each rollup row a completed payment counts in"""
+    day = timezone.localdate(payment.created_at)
+    return [
+        (RevenueRollup, {'day': day, 'payment_method': payment.payment_method, 'payee_id': payment.payee_id}),
+        (BuyerSpendRollup, {'day': day, 'payer_id': payment.payer_id}),
+    ]
+
+
+def _add(model, key, total, count):
+    increments = {'total': F('total') + total, 'payment_count': F('payment_count') + count}
+    if model.objects.filter(**key).update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(total=total, payment_count=count, **key)
+    except IntegrityError:
+        # Created concurrently by another payment of the same day
+        model.objects.filter(**key).update(**increments)
+
+
+def record_payment_revenue(payment, sign=1):
+    """Count a completed payment in its rollups, or uncount it with sign=-1"""
+    for model, key in revenue_keys(payment):
+        _add(model, key, sign * payment.amount, sign)
+
+
+def rebuild_revenue_rollups(batch_size=2000):
+    """Recompute both tables from every completed payment, in keyset chunks"""
+    revenue = defaultdict(lambda: [Decimal('0'), 0])
+    spend = defaultdict(lambda: [Decimal('0'), 0])
+    payments = Payment.objects.filter(status='completed').order_by('pk').only(
+        'pk', 'created_at', 'payment_method', 'payee_id', 'payer_id', 'amount'
+    )
+    last_id = 0
+    with transaction.atomic():
+        while True:
+            batch = list(payments.filter(pk__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].pk
+            for payment in batch:
+                for model, key in revenue_keys(payment):
+                    row = (revenue if model is RevenueRollup else spend)[tuple(key.values())]
+                    row[0] += payment.amount
+                    row[1] += 1
+
+        RevenueRollup.objects.all().delete()
+        BuyerSpendRollup.objects.all().delete()
+        RevenueRollup.objects.bulk_create([
+            RevenueRollup(day=day, payment_method=method, payee_id=payee_id, total=total, payment_count=count)
+            for (day, method, payee_id), (total, count) in revenue.items()
+        ], batch_size=500)
+        BuyerSpendRollup.objects.bulk_create([
+            BuyerSpendRollup(day=day, payer_id=payer_id, total=total, payment_count=count)
+            for (day, payer_id), (total, count) in spend.items()
+        ], batch_size=500)
+    return len(revenue), len(spend)
@@ -0,0 +1,183 @@
+"""
+SQLite FTS5 full-text index over artworks, jobs and artist profiles.
+
+One FTS5 table holds a document per indexed row, with three columns ranked
+by BM25 with weights 10 / 5 / 1:
+
+    artwork: title          | artist names          | description
+    job:     title          | required skills       | description, buyer
+    artist:  names          | skills                | bio, portfolio
+
+The kind of row and its primary key are packed into the FTS rowid, so
+documents are replaced and deleted by rowid. The signals in api.signals keep
+the index in sync; the rebuild_search_index command refills it. Search terms
+are matched as word prefixes, all terms required. On databases without FTS5
+(or before the migration creating the table) is_available() is False and
+callers fall back to their icontains filters.
+"""
+
+import re
+
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import ArtistProfile, Artwork, Job
+
+
+TABLE = 'api_search_index'
+
+ARTWORK, JOB, ARTIST = 1, 2, 3
+KIND_BITS = 2  # rowid = pk << KIND_BITS | kind
+
+# Fields of CustomUser copied into documents
+USER_DOCUMENT_FIELDS = ('username', 'first_name', 'last_name')
+
+_available = None
+
+
+def is_available():
+    global _available
+    if _available is None:
+        _available = connection.vendor == 'sqlite' and TABLE in connection.introspection.table_names()
+    return _available
+
+
+def match_query(text):
+    """FTS5 query requiring every word of `text` as a prefix, or None"""
+    words = re.findall(r'\w+', (text or '').lower())
+    return ' '.join(f'"{word}"*' for word in words) or None
+
+
+def _join(*parts):
+    return ' '.join(part for part in parts if part)
+
+
+def artwork_document(artwork):
+    artist = artwork.artist
+    return artwork.title, _join(artist.username, artist.first_name, artist.last_name), artwork.description
+
+
+def job_document(job):
+    return job.title, job.required_skills, _join(job.description, job.buyer.username)
+
+
+def artist_document(profile):
+    user = profile.user
+    return (
+        _join(user.username, user.first_name, user.last_name), profile.skills,
+        _join(profile.bio, profile.portfolio_description),
+    )
+
+
+DOCUMENTS = {
+    ARTWORK: (Artwork.objects.select_related('artist'), artwork_document),
+    JOB: (Job.objects.select_related('buyer'), job_document),
+    ARTIST: (ArtistProfile.objects.select_related('user'), artist_document),
+}
+
+
+def _write(kind, objects, cursor):
+    build = DOCUMENTS[kind][1]
+    rows = [(obj.pk << KIND_BITS | kind, *build(obj)) for obj in objects]
+    cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+    cursor.executemany(f'INSERT INTO {TABLE} (rowid, title, tags, body) VALUES (%s, %s, %s, %s)', rows)
+
+
+def index_objects(kind, objects):
+    """Replace the documents of the given artworks, jobs or artist profiles"""
+    if not is_available() or not objects:
+        return
+    with connection.cursor() as cursor:
+        _write(kind, objects, cursor)
+
+
+def remove_objects(kind, pks):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(pk << KIND_BITS | kind,) for pk in pks])
+
+
+def index_user(user):
+    """Refresh every document that contains the user's names"""
+    index_objects(ARTWORK, list(DOCUMENTS[ARTWORK][0].filter(artist=user)))
+    index_objects(JOB, list(DOCUMENTS[JOB][0].filter(buyer=user)))
+    index_objects(ARTIST, list(DOCUMENTS[ARTIST][0].filter(user=user)))
+
+
+def rebuild(batch_size=1000):
+    """Refill the whole index from the tables, in keyset chunks; {kind: documents}"""
+    counts = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for kind, (queryset, _) in DOCUMENTS.items():
+            counts[kind] = 0
+            last_id = 0
+            while True:
+                batch = list(queryset.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+                _write(kind, batch, cursor)
+                counts[kind] += len(batch)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+    return counts
+
+
+def _matches_sql(kind):
+    return (
+        f'SELECT rowid >> {KIND_BITS} FROM {TABLE} '
+        f'WHERE {TABLE} MATCH %s AND rowid & {(1 << KIND_BITS) - 1} = {kind}'
+    )
+
+
+def filter_matches(queryset, kind, text):
+    """The queryset narrowed to rows matching `text`, or None if the index can't answer"""
+    query = match_query(text)
+    if not is_available() or query is None:
+        return None
+    return queryset.filter(pk__in=RawSQL(_matches_sql(kind), [query]))
+
+
+def ranked_ids(kind, text, limit=100, queryset=None):
+    """
+    Primary keys of the best BM25 matches of `text`, best first; only rows
+    of `queryset` if given, filtered before the limit
+    """
+    query = match_query(text)
+    if not is_available() or query is None:
+        return None
+    sql, params = _matches_sql(kind), [query]
+    if queryset is not None:
+        rows_sql, rows_params = queryset.order_by().values('pk').query.sql_with_params()
+        sql += f' AND rowid >> {KIND_BITS} IN ({rows_sql})'
+        params += rows_params
+    with connection.cursor() as cursor:
+        cursor.execute(f'{sql} ORDER BY bm25({TABLE}, 10.0, 5.0, 1.0) LIMIT %s', [*params, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ranked(queryset, kind, text, limit):
+    """The first `limit` rows of the queryset matching `text` by rank, or None"""
+    ids = ranked_ids(kind, text, limit, queryset)
+    if ids is None:
+        return None
+    rows = queryset.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter answered by the full-text index for views that set
+    `search_index_kind`, and by the usual `search_fields` otherwise
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        kind = getattr(view, 'search_index_kind', None)
+        text = request.query_params.get(self.search_param, '')
+        if kind is not None and text:
+            matches = filter_matches(queryset, kind, text)
+            if matches is not None:
+                return matches
+        return super().filter_queryset(request, queryset, view)
@@ -4,6 +4,7 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from .models import *
+from .renditions import rendition_urls
 from decimal import Decimal
 
 # User Authentication Serializers
@@ -202,16 +203,16 @@ class ArtworkSerializer(serializers.ModelSerializer):
     category = CategorySerializer(read_only=True)
     category_id = serializers.IntegerField(write_only=True, required=False)
     is_liked = serializers.SerializerMethodField()
-    has_duplicates = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
     
     class Meta:
         model = Artwork
         fields = ['id', 'artist', 'title', 'description', 'category', 'category_id',
-                 'artwork_type', 'price', 'image', 'watermarked_image', 'is_available',
+                 'artwork_type', 'price', 'image', 'watermarked_image', 'renditions', 'is_available',
                  'is_featured', 'views_count', 'likes_count', 'is_liked', 'has_duplicates',
-                 'created_at', 'updated_at']
+                 'processing_status', 'created_at', 'updated_at']
         read_only_fields = ['artist', 'views_count', 'likes_count', 'watermarked_image', 
-                           'is_liked', 'has_duplicates', 'is_available']
+                           'is_liked', 'has_duplicates', 'is_available', 'processing_status']
     
     def validate_image(self, value):
         """Custom image validation with detailed error messages"""
@@ -220,17 +221,17 @@ class ArtworkSerializer(serializers.ModelSerializer):
     
     def get_is_liked(self, obj):
         """Check if current user has liked this artwork"""
+        liked_ids = self.context.get('liked_artwork_ids')
+        if liked_ids is not None:
+            return obj.pk in liked_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.is_liked_by_user(request.user)
         return False
     
-    def get_has_duplicates(self, obj):
-        """Check if this artwork has potential duplicates"""
-        if not obj.perceptual_hash:
-            return False
-        duplicates = obj.check_for_duplicates(similarity_threshold=5)
-        return len(duplicates) > 0
+    def get_renditions(self, obj):
+        """URLs of the resized watermarked image, generated on first request"""
+        return rendition_urls(obj, self.context.get('request'))
     
     def create(self, validated_data):
         validated_data['artist'] = self.context['request'].user
@@ -241,24 +242,44 @@ class ArtworkListSerializer(serializers.ModelSerializer):
     artist_name = serializers.CharField(source='artist.username', read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     is_liked = serializers.SerializerMethodField()
+    renditions = serializers.SerializerMethodField()
     
     class Meta:
         model = Artwork
         fields = ['id', 'title', 'artist_name', 'category_name', 'artwork_type',
-                 'price', 'image', 'is_featured', 'views_count', 'likes_count', 'is_liked', 'created_at']
+                 'price', 'image', 'renditions', 'is_featured', 'views_count', 'likes_count',
+                 'is_liked', 'created_at']
     
     def get_is_liked(self, obj):
         """Check if current user has liked this artwork"""
+        liked_ids = self.context.get('liked_artwork_ids')
+        if liked_ids is not None:
+            return obj.pk in liked_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return obj.is_liked_by_user(request.user)
         return False
+    
+    def get_renditions(self, obj):
+        """URLs of the resized watermarked image, generated on first request"""
+        return rendition_urls(obj, self.context.get('request'))
        
        
        
      
         
 
+def artwork_list_context(request, artworks, context=None):
+    """
+    Serializer context for a page of artworks, with the requesting user's
+    liked artwork ids prefetched so is_liked costs one query per page.
+    """
+    context = dict(context or {}, request=request)
+    user = getattr(request, 'user', None)
+    context['liked_artwork_ids'] = ArtworkLike.liked_artwork_ids(user, artworks)
+    return context
+
+
 # Job/Project Serializers
 class JobSerializer(serializers.ModelSerializer):
     buyer = UserProfileSerializer(read_only=True)
@@ -308,6 +329,24 @@ class JobListSerializer(serializers.ModelSerializer):
         return obj.get_total_bids()
 
 
+class JobRecommendationSerializer(serializers.ModelSerializer):
+    """A precomputed recommended artist of a job, with the profile fields needed to list it"""
+    artist_profile_id = serializers.IntegerField(source='artist_profile.id', read_only=True)
+    artist_id = serializers.IntegerField(source='artist_profile.user.id', read_only=True)
+    username = serializers.CharField(source='artist_profile.user.username', read_only=True)
+    skills = serializers.CharField(source='artist_profile.skills', read_only=True)
+    experience_level = serializers.CharField(source='artist_profile.experience_level', read_only=True)
+    hourly_rate = serializers.DecimalField(
+        source='artist_profile.hourly_rate', max_digits=10, decimal_places=2, read_only=True
+    )
+    rating = serializers.DecimalField(source='artist_profile.rating', max_digits=3, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = JobRecommendation
+        fields = ['rank', 'score', 'matched_skills', 'artist_profile_id', 'artist_id', 'username',
+                  'skills', 'experience_level', 'hourly_rate', 'rating']
+
+
 
 class BidSerializer(serializers.ModelSerializer):
     artist = UserProfileSerializer(read_only=True)
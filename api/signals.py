@@ -1,9 +1,27 @@
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_save, pre_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Order, Payment, ArtworkOrderItem, EquipmentOrderItem
+from django.db import transaction
+from .models import (
+    Category, CustomUser, Order, Payment, Artwork, ArtworkOrderItem, EquipmentOrderItem, Job, Bid, Review, ArtistProfile
+)
 from .email_service import EmailService
+from .duplicate_index import (
+    DUPLICATE_THRESHOLD, get_duplicate_index, refresh_duplicate_flags, refresh_duplicate_neighbourhood
+)
+from .user_stats import refresh_user_stats
+from .analytics_rollups import merge_deltas, record_deltas, revenue_deltas, user_deltas
+from .revenue_rollups import record_payment_revenue, revenue_keys
+from .search_index import (
+    ARTIST, ARTWORK, JOB, USER_DOCUMENT_FIELDS, index_objects, index_user, remove_objects
+)
+from . import recommendations, trigram_search
+from .suggest_index import (
+    ARTIST as SUGGEST_ARTIST, ARTWORK as SUGGEST_ARTWORK, CATEGORY as SUGGEST_CATEGORY,
+    artist_suggestions, artwork_suggestions, category_suggestions, get_suggestion_index
+)
+from .skill_tags import sync_skill_tags
 import logging
 
 logger = logging.getLogger(__name__)
@@ -99,6 +117,8 @@ def track_payment_status_change(sender, instance, **kwargs):
         try:
             old_payment = Payment.objects.get(pk=instance.pk)
             instance._old_status = old_payment.status
+            # Snapshot for the revenue rollups
+            instance._old_payment = old_payment
         except Payment.DoesNotExist:
             pass
 
@@ -188,4 +208,408 @@ Please process this order for shipment.
             logger.info(f"Equipment sale notification sent for: {instance.equipment.name}")
             
         except Exception as e:
-            logger.error(f"Error sending equipment sale notification: {str(e)}")
\ No newline at end of file
+            logger.error(f"Error sending equipment sale notification: {str(e)}")
+
+DUPLICATE_FLAG_FIELDS = {'image', 'perceptual_hash', 'is_available'}
+
+@receiver(pre_save, sender=Artwork)
+def track_artwork_hash_change(sender, instance, update_fields=None, **kwargs):
+    """Remember the previous hash so that its old neighbours can be refreshed"""
+    instance._old_perceptual_hash = None
+    if update_fields is not None and not DUPLICATE_FLAG_FIELDS.intersection(update_fields):
+        return
+    if instance.pk:
+        instance._old_perceptual_hash = Artwork.objects.filter(pk=instance.pk).values_list(
+            'perceptual_hash', flat=True
+        ).first()
+
+@receiver(post_save, sender=Artwork)
+def update_duplicate_index(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the in-memory perceptual hash index and the stored has_duplicates
+    flags in sync with saved artworks
+    """
+    get_duplicate_index().update(instance.id, instance.perceptual_hash)
+
+    if update_fields is not None and not DUPLICATE_FLAG_FIELDS.intersection(update_fields):
+        return
+    try:
+        refresh_duplicate_neighbourhood(instance)
+        old_hash = getattr(instance, '_old_perceptual_hash', None)
+        if old_hash and old_hash != instance.perceptual_hash:
+            refresh_duplicate_flags(
+                other_id for other_id, _ in get_duplicate_index().query(old_hash, DUPLICATE_THRESHOLD)
+            )
+    except Exception as e:
+        logger.error(f"Error refreshing duplicate flags for artwork #{instance.id}: {str(e)}")
+
+@receiver(post_delete, sender=Artwork)
+def remove_from_duplicate_index(sender, instance, **kwargs):
+    """
+    Drop deleted artworks from the in-memory perceptual hash index and clear
+    the flag of neighbours that no longer have a duplicate
+    """
+    get_duplicate_index().discard(instance.id)
+    if instance.perceptual_hash:
+        try:
+            refresh_duplicate_flags(
+                other_id for other_id, _ in get_duplicate_index().query(instance.perceptual_hash, DUPLICATE_THRESHOLD)
+            )
+        except Exception as e:
+            logger.error(f"Error refreshing duplicate flags after deleting artwork #{instance.id}: {str(e)}")
+
+
+# ===== Materialized dashboard stats (see api.user_stats) =====
+
+def _refresh_stats(user_ids, *groups):
+    try:
+        refresh_user_stats(user_ids, *groups)
+    except Exception as e:
+        logger.error(f"Error refreshing dashboard stats ({', '.join(groups)}) of users {user_ids}: {str(e)}")
+
+@receiver(pre_save, sender=Job)
+def track_job_hired_artist(sender, instance, **kwargs):
+    """
+    Remember the previous hired artist so their counters can be refreshed
+    too, and the previous status for the analytics rollups
+    """
+    instance._old_hired_artist_id = instance._old_status = None
+    if instance.pk:
+        old = Job.objects.filter(pk=instance.pk).values_list('hired_artist_id', 'status').first()
+        if old:
+            instance._old_hired_artist_id, instance._old_status = old
+
+@receiver(post_save, sender=Job)
+@receiver(post_delete, sender=Job)
+def update_job_stats(sender, instance, **kwargs):
+    _refresh_stats([instance.buyer_id], 'posted_jobs')
+    _refresh_stats([instance.hired_artist_id, getattr(instance, '_old_hired_artist_id', None)], 'hired_jobs')
+
+@receiver(post_save, sender=Bid)
+@receiver(post_delete, sender=Bid)
+def update_bid_stats(sender, instance, **kwargs):
+    _refresh_stats([instance.artist_id], 'bids')
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def update_order_stats(sender, instance, **kwargs):
+    _refresh_stats([instance.buyer_id], 'orders')
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_payment_stats(sender, instance, **kwargs):
+    _refresh_stats([instance.payer_id], 'payments')
+    _refresh_stats([instance.payee_id], 'earnings')
+
+@receiver(post_save, sender=Artwork)
+def update_artwork_stats(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'is_available' not in update_fields:
+        return
+    _refresh_stats([instance.artist_id], 'artworks')
+
+@receiver(post_delete, sender=Artwork)
+def update_artwork_stats_on_delete(sender, instance, **kwargs):
+    _refresh_stats([instance.artist_id], 'artworks')
+
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=ArtistProfile)
+def update_review_stats(sender, instance, **kwargs):
+    user_id = instance.artist_id if sender is Review else instance.user_id
+    _refresh_stats([user_id], 'reviews')
+
+
+# ===== Hourly analytics rollups (see api.analytics_rollups) =====
+
+def _record_deltas(deltas, description):
+    try:
+        record_deltas(deltas)
+    except Exception as e:
+        logger.error(f"Error recording analytics rollup for {description}: {str(e)}")
+
+@receiver(pre_save, sender=CustomUser)
+def track_user_changes(sender, instance, update_fields=None, **kwargs):
+    """Remember the previous type, and the names copied into search documents"""
+    instance._old_values = {}
+    fields = [
+        field for field in ('user_type',) + USER_DOCUMENT_FIELDS
+        if update_fields is None or field in update_fields
+    ]
+    if instance.pk and fields:
+        instance._old_values = CustomUser.objects.filter(pk=instance.pk).values(*fields).first() or {}
+
+@receiver(post_save, sender=CustomUser)
+def record_user_rollup(sender, instance, created, **kwargs):
+    old_type = getattr(instance, '_old_values', {}).get('user_type')
+    if created:
+        _record_deltas(user_deltas(instance.user_type), f"new user #{instance.id}")
+    elif old_type and old_type != instance.user_type:
+        # Moved between types; the user total is unchanged
+        deltas = merge_deltas(user_deltas(old_type, -1), user_deltas(instance.user_type))
+        _record_deltas(deltas, f"user #{instance.id} type change")
+
+@receiver(post_delete, sender=CustomUser)
+def record_user_rollup_on_delete(sender, instance, **kwargs):
+    _record_deltas(user_deltas(instance.user_type, -1), f"deleted user #{instance.id}")
+
+@receiver(post_save, sender=Job)
+def record_job_rollup(sender, instance, created, **kwargs):
+    was_completed = getattr(instance, '_old_status', None) == 'completed'
+    is_completed = instance.status == 'completed'
+    deltas = {
+        'jobs_posted': 1 if created else 0,
+        'jobs_completed': int(is_completed) - int(was_completed),
+    }
+    _record_deltas(deltas, f"job #{instance.id}")
+
+@receiver(post_delete, sender=Job)
+def record_job_rollup_on_delete(sender, instance, **kwargs):
+    deltas = {'jobs_posted': -1, 'jobs_completed': -1 if instance.status == 'completed' else 0}
+    _record_deltas(deltas, f"deleted job #{instance.id}")
+
+@receiver(post_save, sender=Artwork)
+def record_artwork_rollup(sender, instance, created, **kwargs):
+    if created:
+        _record_deltas({'artworks_uploaded': 1}, f"new artwork #{instance.id}")
+
+@receiver(post_delete, sender=Artwork)
+def record_artwork_rollup_on_delete(sender, instance, **kwargs):
+    _record_deltas({'artworks_uploaded': -1}, f"deleted artwork #{instance.id}")
+
+
+# ===== Revenue rollups, hourly (api.analytics_rollups) and daily (api.revenue_rollups) =====
+
+@receiver(post_save, sender=Payment)
+def update_payment_rollups(sender, instance, created, **kwargs):
+    """Move a payment's revenue out of the rollups it was counted in and into its current ones"""
+    old = None if created else getattr(instance, '_old_payment', None)
+    was_completed = old is not None and old.status == 'completed'
+    is_completed = instance.status == 'completed'
+    if not (was_completed or is_completed):
+        return
+    if was_completed and is_completed and (
+        old.amount == instance.amount and revenue_keys(old) == revenue_keys(instance)
+    ):
+        return
+    try:
+        with transaction.atomic():
+            deltas = {}
+            if was_completed:
+                record_payment_revenue(old, -1)
+                deltas = revenue_deltas(old.amount, -1)
+            if is_completed:
+                record_payment_revenue(instance)
+                deltas = merge_deltas(deltas, revenue_deltas(instance.amount))
+            record_deltas(deltas)
+    except Exception as e:
+        logger.error(f"Error updating revenue rollups for payment {instance.transaction_id}: {str(e)}")
+
+@receiver(post_delete, sender=Payment)
+def update_payment_rollups_on_delete(sender, instance, **kwargs):
+    if instance.status != 'completed':
+        return
+    try:
+        with transaction.atomic():
+            record_payment_revenue(instance, -1)
+            record_deltas(revenue_deltas(instance.amount, -1))
+    except Exception as e:
+        logger.error(f"Error updating revenue rollups for deleted payment {instance.transaction_id}: {str(e)}")
+
+
+# ===== Full-text (api.search_index) and trigram (api.trigram_search) indexes =====
+
+ARTWORK_DOCUMENT_FIELDS = {'title', 'description', 'artist'}
+
+def _update_search_index(update, description):
+    try:
+        update()
+    except Exception as e:
+        logger.error(f"Error updating search index for {description}: {str(e)}")
+
+@receiver(post_save, sender=Artwork)
+def index_artwork(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not ARTWORK_DOCUMENT_FIELDS & set(update_fields):
+        return
+    _update_search_index(lambda: index_objects(ARTWORK, [instance]), f"artwork #{instance.id}")
+    if update_fields is None or 'title' in update_fields:
+        _update_search_index(
+            lambda: trigram_search.index_objects(ARTWORK, [instance]), f"trigrams of artwork #{instance.id}"
+        )
+
+@receiver(post_save, sender=Job)
+def index_job(sender, instance, **kwargs):
+    _update_search_index(lambda: index_objects(JOB, [instance]), f"job #{instance.id}")
+
+@receiver(post_save, sender=ArtistProfile)
+def index_artist_profile(sender, instance, **kwargs):
+    _update_search_index(lambda: index_objects(ARTIST, [instance]), f"artist profile #{instance.id}")
+    _update_search_index(
+        lambda: trigram_search.index_objects(ARTIST, [instance]), f"trigrams of artist profile #{instance.id}"
+    )
+
+@receiver(post_save, sender=CustomUser)
+def index_user_documents(sender, instance, created, **kwargs):
+    old_values = getattr(instance, '_old_values', {})
+    if created or not any(
+        old_values[field] != getattr(instance, field) for field in USER_DOCUMENT_FIELDS if field in old_values
+    ):
+        return
+    _update_search_index(lambda: index_user(instance), f"documents of user #{instance.id}")
+    if old_values.get('username', instance.username) != instance.username:
+        _update_search_index(
+            lambda: trigram_search.index_objects(ARTIST, list(ArtistProfile.objects.filter(user=instance))),
+            f"trigrams of user #{instance.id}"
+        )
+
+@receiver(post_delete, sender=Artwork)
+@receiver(post_delete, sender=Job)
+@receiver(post_delete, sender=ArtistProfile)
+def remove_from_search_index(sender, instance, **kwargs):
+    kind = {Artwork: ARTWORK, Job: JOB, ArtistProfile: ARTIST}[sender]
+    _update_search_index(lambda: remove_objects(kind, [instance.pk]), f"deleted {sender.__name__} #{instance.pk}")
+    if kind != JOB:
+        _update_search_index(
+            lambda: trigram_search.remove_objects(kind, [instance.pk]), f"trigrams of deleted {sender.__name__} #{instance.pk}"
+        )
+
+
+# ===== Search box suggestions (see api.suggest_index) =====
+
+def _update_suggestions(source, suggestions):
+    try:
+        get_suggestion_index().update(source, suggestions)
+    except Exception as e:
+        logger.error(f"Error updating suggestions of {source}: {str(e)}")
+
+def _profile_suggestions(profile):
+    if not profile.is_available:
+        return []
+    user = profile.user
+    return artist_suggestions(user.username, user.first_name, user.last_name, profile.skills)
+
+@receiver(post_save, sender=Artwork)
+def update_artwork_suggestions(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not {'title', 'is_available'} & set(update_fields):
+        return
+    suggestions = artwork_suggestions(instance.title) if instance.is_available else []
+    _update_suggestions((SUGGEST_ARTWORK, instance.pk), suggestions)
+
+@receiver(post_save, sender=ArtistProfile)
+def update_artist_suggestions(sender, instance, **kwargs):
+    _update_suggestions((SUGGEST_ARTIST, instance.pk), _profile_suggestions(instance))
+
+@receiver(post_save, sender=CustomUser)
+def update_user_suggestions(sender, instance, created, **kwargs):
+    old_values = getattr(instance, '_old_values', {})
+    if created or all(
+        old_values[field] == getattr(instance, field)
+        for field in ('username', 'first_name', 'last_name') if field in old_values
+    ):
+        return
+    for profile in ArtistProfile.objects.filter(user=instance):
+        _update_suggestions((SUGGEST_ARTIST, profile.pk), _profile_suggestions(profile))
+
+@receiver(post_save, sender=Category)
+def update_category_suggestions(sender, instance, **kwargs):
+    suggestions = category_suggestions(instance.name) if instance.is_active else []
+    _update_suggestions((SUGGEST_CATEGORY, instance.pk), suggestions)
+
+@receiver(post_delete, sender=Artwork)
+@receiver(post_delete, sender=ArtistProfile)
+@receiver(post_delete, sender=Category)
+def remove_suggestions(sender, instance, **kwargs):
+    source_type = {Artwork: SUGGEST_ARTWORK, ArtistProfile: SUGGEST_ARTIST, Category: SUGGEST_CATEGORY}[sender]
+    try:
+        get_suggestion_index().discard((source_type, instance.pk))
+    except Exception as e:
+        logger.error(f"Error removing suggestions of {sender.__name__} #{instance.pk}: {str(e)}")
+
+
+# ===== Normalized skill tags (see api.skill_tags) =====
+
+def _sync_skill_tags(instance, text, update_fields, field):
+    if update_fields is not None and field not in update_fields:
+        return
+    try:
+        sync_skill_tags(instance, text)
+    except Exception as e:
+        logger.error(f"Error syncing skill tags of {type(instance).__name__} #{instance.pk}: {str(e)}")
+
+@receiver(post_save, sender=ArtistProfile)
+def update_artist_skill_tags(sender, instance, update_fields=None, **kwargs):
+    _sync_skill_tags(instance, instance.skills, update_fields, 'skills')
+
+@receiver(post_save, sender=Job)
+def update_job_skill_tags(sender, instance, update_fields=None, **kwargs):
+    _sync_skill_tags(instance, instance.required_skills, update_fields, 'required_skills')
+
+
+# ===== Precomputed job recommendations (see api.recommendations) =====
+# Registered after the skill tag handlers, so scoring sees the synced tags
+
+def _refresh_recommendations(description, job_ids=(), profile_ids=()):
+    """
+    Rescore in this request once the save commits, or, with
+    JOB_RECOMMENDATION_ASYNC, queue it for process_recommendation_refreshes
+    """
+    def refresh():
+        try:
+            recommendations.refresh(job_ids, profile_ids)
+        except Exception as e:
+            logger.error(f"Error refreshing job recommendations for {description}: {str(e)}")
+
+    try:
+        if recommendations.is_async():
+            with transaction.atomic():
+                recommendations.enqueue(job_ids, profile_ids)
+        else:
+            transaction.on_commit(refresh)
+    except Exception as e:
+        logger.error(f"Error queueing job recommendations for {description}: {str(e)}")
+
+def _ranking_changed(instance, fields, created, update_fields):
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    old = getattr(instance, '_old_ranking', None)
+    if not fields or created or old is None:
+        return bool(fields)
+    return any(getattr(instance, field) != old[field] for field in fields)
+
+@receiver(pre_save, sender=Job)
+@receiver(pre_save, sender=ArtistProfile)
+def track_ranking_fields(sender, instance, update_fields=None, **kwargs):
+    """Remember the ranking fields, so saves that keep them skip the rescoring"""
+    fields = recommendations.JOB_FIELDS if sender is Job else recommendations.PROFILE_FIELDS
+    if update_fields is not None:
+        fields = fields & set(update_fields)
+    instance._old_ranking = None
+    if instance.pk and fields:
+        instance._old_ranking = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+@receiver(post_save, sender=Job)
+def update_job_recommendations(sender, instance, created, update_fields=None, **kwargs):
+    if _ranking_changed(instance, recommendations.JOB_FIELDS, created, update_fields):
+        _refresh_recommendations(f"job #{instance.pk}", job_ids=[instance.pk])
+    # Hiring and completing jobs change the completion rate of the artists involved
+    old_hired_artist_id = getattr(instance, '_old_hired_artist_id', None)
+    if (instance.hired_artist_id, instance.status) != (old_hired_artist_id, getattr(instance, '_old_status', None)):
+        user_ids = {instance.hired_artist_id, old_hired_artist_id} - {None}
+        if user_ids:
+            profile_ids = list(ArtistProfile.objects.filter(user_id__in=user_ids).values_list('pk', flat=True))
+            _refresh_recommendations(f"artists of job #{instance.pk}", profile_ids=profile_ids)
+
+@receiver(post_save, sender=ArtistProfile)
+def update_artist_recommendations(sender, instance, created, update_fields=None, **kwargs):
+    if _ranking_changed(instance, recommendations.PROFILE_FIELDS, created, update_fields):
+        _refresh_recommendations(f"artist profile #{instance.pk}", profile_ids=[instance.pk])
+
+@receiver(pre_delete, sender=ArtistProfile)
+def track_recommended_jobs(sender, instance, **kwargs):
+    """Remember the jobs listing the profile; the delete cascades to their lists"""
+    instance._recommended_job_ids = list(instance.job_recommendations.values_list('job_id', flat=True))
+
+@receiver(post_delete, sender=ArtistProfile)
+def refill_job_recommendations(sender, instance, **kwargs):
+    job_ids = getattr(instance, '_recommended_job_ids', [])
+    if job_ids:
+        _refresh_recommendations(f"deleted artist profile #{instance.pk}", job_ids=job_ids)
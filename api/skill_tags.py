@@ -0,0 +1,51 @@
+"""
+Normalized skill tags.
+
+ArtistProfile.skills and Job.required_skills stay free-text comma-separated
+fields; every save also links the row to one Skill per listed skill through
+the skill_tags many-to-many fields (see the signals in api.signals). The
+link tables are indexed on skill_id, which makes them an inverted index from
+a skill to its artists and jobs: filtering on exact skills is an indexed
+join instead of a substring scan that matches "art" inside "cartoon".
+"""
+
+from .models import Skill
+
+
+MAX_SKILL_LENGTH = 100
+
+
+def normalize_skill(name):
+    return ' '.join(name.casefold().split())[:MAX_SKILL_LENGTH]
+
+
+def parse_skills(text):
+    """Normalized, de-duplicated skill names of a comma-separated field, in order"""
+    names = (normalize_skill(name) for name in (text or '').split(','))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def skills_for_text(text):
+    """The Skill rows of a comma-separated field, created as needed"""
+    names = parse_skills(text)
+    if not names:
+        return []
+    Skill.objects.bulk_create([Skill(name=name) for name in names], ignore_conflicts=True)
+    return list(Skill.objects.filter(name__in=names))
+
+
+def sync_skill_tags(instance, text):
+    """Point the skill_tags of an artist profile or job at the skills in `text`"""
+    instance.skill_tags.set(skills_for_text(text))
+
+
+def filter_by_skills(queryset, text):
+    """Rows of an artist profile or job queryset tagged with every skill in `text`"""
+    names = parse_skills(text)
+    skill_ids = dict(Skill.objects.filter(name__in=names).values_list('name', 'id'))
+    if len(skill_ids) < len(names):
+        # Nobody has a skill that was never used
+        return queryset.none()
+    for skill_id in skill_ids.values():
+        queryset = queryset.filter(skill_tags=skill_id)
+    return queryset
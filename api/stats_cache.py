@@ -0,0 +1,44 @@
+"""
+TTL cache for expensive statistics with single-flight recomputation.
+
+Entries are kept in the Django cache for `ttl` seconds and then served stale
+for up to `stale_ttl` more while exactly one caller recomputes them. The
+recomputing caller is chosen with an atomic cache.add() lock, so concurrent
+requests, across threads and (with a shared cache backend) across processes,
+never stampede the database. Only a caller that finds no entry at all waits
+for the recomputation, polling for at most `wait` seconds before computing
+the value itself.
+"""
+
+import time
+
+from django.core.cache import cache
+
+
+def get_or_compute(key, compute, ttl=60, stale_ttl=300, lock_timeout=30, wait=10):
+    """Cached result of compute(), recomputed by one caller at a time"""
+    entry = cache.get(key)
+    now = time.time()
+    if entry is not None and entry['expires'] > now:
+        return entry['value']
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, True, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, {'value': value, 'expires': time.time() + ttl}, ttl + stale_ttl)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        # Someone else is refreshing it
+        return entry['value']
+
+    deadline = now + wait
+    while time.time() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value']
+    return compute()
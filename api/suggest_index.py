@@ -0,0 +1,248 @@
+"""
+In-memory prefix index behind the search box suggestions.
+
+Artwork titles, artist names, artist skills and category names are kept in
+a sorted array of (key, type, text) entries. Each phrase is stored once per
+word it contains, under the rest of the phrase from that word on, so "sea"
+suggests both "Seascape" and "Stormy sea". A prefix lookup bounds the
+entries under the prefix with two binary searches and ranks all of them; the
+result is cached per prefix until a phrase under that prefix changes, so
+short prefixes are not rescanned after every unrelated write. Lookups never
+touch the database.
+
+Like the duplicate index it is loaded lazily once per worker process and
+kept up to date from the model save/delete signals. Changes written by
+other processes are picked up when the whole index is reloaded, every
+MAX_AGE seconds. A reload reads the database outside the lock, so other
+requests keep using the old index until the new one is swapped in.
+"""
+
+import bisect
+import heapq
+import re
+import threading
+import time
+
+
+ARTWORK, ARTIST, SKILL, CATEGORY = 'artwork', 'artist', 'skill', 'category'
+
+DEFAULT_LIMIT = 10
+MAX_PHRASE_LENGTH = 100
+
+
+def normalize(text):
+    return ' '.join((text or '').casefold().split())
+
+
+def phrase_keys(text):
+    """The normalized phrase from each of its words on"""
+    phrase = normalize(text)[:MAX_PHRASE_LENGTH]
+    return [phrase[match.start():] for match in re.finditer(r'(?:^|(?<=\s))\S', phrase)]
+
+
+def artwork_suggestions(title):
+    return [(ARTWORK, title)]
+
+
+def artist_suggestions(username, first_name, last_name, skills):
+    suggestions = [(ARTIST, username)]
+    full_name = f'{first_name} {last_name}'.strip()
+    if full_name:
+        suggestions.append((ARTIST, full_name))
+    suggestions.extend((SKILL, normalize(skill)) for skill in (skills or '').split(','))
+    return suggestions
+
+
+def category_suggestions(name):
+    return [(CATEGORY, name)]
+
+
+class SuggestionIndex:
+    """
+    Process-wide suggestion index. Every source row (an artwork, artist
+    profile or category) contributes (type, text) suggestions; identical
+    suggestions from several rows are reference counted, and the count is
+    their popularity. All public methods are thread safe.
+    """
+
+    # Reload from the database after this many seconds
+    MAX_AGE = 15 * 60
+    # Ranked prefixes kept until the next change
+    CACHE_SIZE = 1024
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._entries = []  # sorted [(key, type, text)]
+        self._counts = {}  # (key, type, text) -> sources
+        self._sources = {}  # (source type, pk) -> [(type, text)]
+        self._ranked = {}  # prefix -> {limit: [(type, text)]}
+        self._pending = None  # updates made while a reload reads the database
+        self._generation = 0
+        self._loaded = False
+        self._loaded_at = 0
+
+    @classmethod
+    def _read(cls):
+        """(entries, counts, sources) of the rows in the database"""
+        from .models import ArtistProfile, Artwork, Category
+
+        sources = {}
+        artworks = Artwork.objects.filter(is_available=True).values_list('id', 'title')
+        for artwork_id, title in artworks.iterator(chunk_size=2000):
+            sources[(ARTWORK, artwork_id)] = artwork_suggestions(title)
+        profiles = ArtistProfile.objects.filter(is_available=True).values_list(
+            'id', 'user__username', 'user__first_name', 'user__last_name', 'skills'
+        )
+        for profile_id, *fields in profiles.iterator(chunk_size=2000):
+            sources[(ARTIST, profile_id)] = artist_suggestions(*fields)
+        for category_id, name in Category.objects.filter(is_active=True).values_list('id', 'name'):
+            sources[(CATEGORY, category_id)] = category_suggestions(name)
+        return cls._entries_of(sources)
+
+    @classmethod
+    def _entries_of(cls, sources):
+        """(entries, counts, sources) of {source: suggestions}"""
+        counts = {}
+        for suggestions in sources.values():
+            for entry in cls._entry_keys(suggestions):
+                counts[entry] = counts.get(entry, 0) + 1
+        # One sort instead of an insertion per entry
+        return sorted(counts), counts, sources
+
+    def _is_fresh(self):
+        return self._loaded and time.monotonic() - self._loaded_at <= self.MAX_AGE
+
+    def _ensure_loaded(self):
+        if self._is_fresh():
+            return
+        # One thread reloads; while a stale index is replaced the others keep reading it
+        if not self._reload_lock.acquire(blocking=not self._loaded):
+            return
+        try:
+            if self._is_fresh():
+                return
+            with self._lock:
+                self._pending = []
+                generation = self._generation
+            try:
+                entries, counts, sources = self._read()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                if generation == self._generation:
+                    self._entries, self._counts, self._sources = entries, counts, sources
+                    self._ranked = {}
+                    self._loaded = True
+                    self._loaded_at = time.monotonic()
+                    # Signals that fired during the read may not be in it
+                    for source, suggestions in self._pending:
+                        self._replace(source, suggestions)
+                self._pending = None
+        finally:
+            self._reload_lock.release()
+
+    @staticmethod
+    def _entry_keys(suggestions):
+        return {
+            (key, kind, text)
+            for kind, text in suggestions if normalize(text)
+            for key in phrase_keys(text)
+        }
+
+    def _remove(self, source):
+        for entry in self._entry_keys(self._sources.pop(source, ())):
+            count = self._counts[entry] - 1
+            if count:
+                self._counts[entry] = count
+                continue
+            del self._counts[entry]
+            del self._entries[bisect.bisect_left(self._entries, entry)]
+
+    def _add(self, source, suggestions):
+        self._sources[source] = suggestions
+        for entry in self._entry_keys(suggestions):
+            if entry in self._counts:
+                self._counts[entry] += 1
+            else:
+                self._counts[entry] = 1
+                bisect.insort(self._entries, entry)
+
+    def _replace(self, source, suggestions):
+        old = self._sources.get(source)
+        if old == suggestions:
+            return
+        self._remove(source)
+        if suggestions:
+            self._add(source, suggestions)
+        # Only the prefixes of keys whose count changed rank differently now
+        for key, _, _ in self._entry_keys(old or ()) ^ self._entry_keys(suggestions):
+            for end in range(1, len(key) + 1):
+                self._ranked.pop(key[:end], None)
+
+    def update(self, source, suggestions):
+        """Replace the suggestions of a source row; an empty list drops it"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((source, suggestions))
+            if not self._loaded:
+                # Will be read from the database on first use
+                return
+            self._replace(source, suggestions)
+
+    def discard(self, source):
+        self.update(source, [])
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        """[(type, text)] starting with prefix at a word, most common first"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        self._ensure_loaded()
+        with self._lock:
+            ranked = self._ranked.get(prefix, {}).get(limit)
+            if ranked is None:
+                if prefix not in self._ranked and len(self._ranked) >= self.CACHE_SIZE:
+                    self._ranked = {}
+                ranked = self._ranked.setdefault(prefix, {})[limit] = self._rank(prefix, limit)
+        return list(ranked)
+
+    def _rank(self, prefix, limit):
+        # Every key starting with prefix sorts below prefix + the highest code point
+        start = bisect.bisect_left(self._entries, (prefix,))
+        end = bisect.bisect_left(self._entries, (prefix + chr(0x10FFFF),), start)
+        matches = {}
+        for entry in self._entries[start:end]:
+            _, kind, text = entry
+            matches[(kind, text)] = max(matches.get((kind, text), 0), self._counts[entry])
+        ranked = heapq.nsmallest(limit, matches.items(), key=lambda item: (-item[1], len(item[0][1]), item[0][1]))
+        return [suggestion for suggestion, _ in ranked]
+
+    def reset(self):
+        """Forget everything; the next query reloads from the database"""
+        with self._lock:
+            self._entries, self._counts, self._sources, self._ranked = [], {}, {}, {}
+            self._generation += 1
+            self._loaded = False
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_index = SuggestionIndex()
+
+
+def get_suggestion_index():
+    """Return the suggestion index of the current process"""
+    return _index
+
+
+def refresh_artworks(artwork_ids):
+    """Resync artworks changed with QuerySet.update(), which skips the save signals"""
+    from .models import Artwork
+
+    rows = Artwork.objects.filter(pk__in=artwork_ids).values_list('pk', 'title', 'is_available')
+    for artwork_id, title, is_available in rows:
+        _index.update((ARTWORK, artwork_id), artwork_suggestions(title) if is_available else [])
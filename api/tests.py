@@ -1,3 +1,1457 @@
-from django.test import TestCase
+import csv
+import hashlib
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from .admin import ArtworkAdmin, PaymentAdmin
+from .admin_serializers import AdminArtworkSerializer
+from .analytics_rollups import bucket_start, rollup_totals
+from .duplicate_clusters import find_duplicate_groups, pack_hashes, sync_duplicate_flags
+from .duplicate_index import BKTree, get_duplicate_index, hamming_distance
+from . import search_index
+from .filters import ArtistProfileFilter, ArtworkFilter, JobFilter
+from .models import (
+    AnalyticsRollup, ArtistProfile, Artwork, ArtworkLike, ArtworkProcessingJob, ArtworkViewSketch, Bid, BuyerSpendRollup, Category,
+    CustomUser, Job, JobRecommendation, Payment, RecommendationRefresh, RevenueRollup, SearchTrigram, Skill, UserDashboardStats,
+)
+from .trending import LIKE_WEIGHT, add_events, decayed_score, event_score, score_cutoff
+from .suggest_index import SuggestionIndex, get_suggestion_index
+from .trigram_search import fuzzy, fuzzy_ids, trigrams
+from .unique_views import HyperLogLog, unique_viewers, unique_viewers_by_artwork, viewer_hash
+from .view_counter import ViewCounter
+from .image_ingest import ImageIngest, get_ingest
+from .image_processing import compute_perceptual_hash, hash_image
+from .image_validators import validate_artwork_image
+from .renditions import render_rendition, rendition_name
+from . import watermark
+
+
+def flip_bits(hash_hex, *bits):
+    """A 256-bit hex hash with the given bits inverted"""
+    value = int(hash_hex, 16)
+    for bit in bits:
+        value ^= 1 << bit
+    return f'{value:064x}'
+
+
+def create_hashed_artwork(artist, category, title, perceptual_hash, **kwargs):
+    # A stored hash and watermark keep Artwork.save from opening the image
+    return Artwork.objects.create(
+        artist=artist, category=category, title=title, description='Oil', price=10,
+        image=f'artworks/{title}.jpg', watermarked_image=f'watermarked/{title}.jpg',
+        perceptual_hash=perceptual_hash, **kwargs
+    )
+
+
+class DuplicateIndexTests(TestCase):
+    """The BK-tree index answers radius queries and follows other processes' writes"""
+
+    def setUp(self):
+        get_duplicate_index().reset()
+        self.addCleanup(get_duplicate_index().reset)
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.category = Category.objects.create(name='Painting')
+        self.base = 'ab' * 32
+
+    def test_bktree_matches_brute_force(self):
+        rng = random.Random(7)
+        values = [rng.getrandbits(64) for _ in range(300)]
+        values += [value ^ (1 << rng.randrange(64)) for value in values[:100]]
+        tree = BKTree()
+        for item_id, value in enumerate(values):
+            tree.add(value, item_id)
+        tree.remove(values[0], 0)
+
+        for probe in values[:50]:
+            for radius in (0, 3, 20):
+                expected = {
+                    (item_id, hamming_distance(probe, value))
+                    for item_id, value in enumerate(values)
+                    if item_id != 0 and hamming_distance(probe, value) <= radius
+                }
+                self.assertEqual(set(tree.query(probe, radius)), expected)
+
+    def test_picks_up_hashes_written_and_rows_deleted_elsewhere(self):
+        original = create_hashed_artwork(self.artist, self.category, 'original', self.base)
+        copy = create_hashed_artwork(self.artist, self.category, 'copy', 'f' * 64)
+        index = get_duplicate_index()
+        self.assertEqual(index.query(self.base, 5), [(original.id, 0)])
+
+        # A worker process fills in the hash with a plain UPDATE; no local signal fires
+        Artwork.objects.filter(pk=copy.pk).update(
+            perceptual_hash=flip_bits(self.base, 3, 9), updated_at=timezone.now()
+        )
+        self.assertEqual(index.query(self.base, 5), [(original.id, 0), (copy.id, 2)])
+
+        # ...and another process deletes the original without signals reaching this one
+        Artwork.objects.filter(pk=original.pk)._raw_delete(connection.alias)
+        self.assertEqual(index.query(self.base, 5), [(copy.id, 2)])
+
+
+class DuplicateClusterTests(TestCase):
+    """Catalog-wide clustering finds close pairs across blocks and chains them into groups"""
+
+    def test_groups_chain_through_neighbours_across_blocks(self):
+        base = 'ab' * 32
+        rows = [
+            (1, base),
+            (2, flip_bits(base, 0, 1, 2)),  # 3 bits from 1
+            (3, flip_bits(base, 0, 1, 2, 3, 4, 5)),  # 3 bits from 2, 6 from 1
+            (4, flip_bits(base, *range(100, 140))),  # far from everything
+            (5, 'zz' * 32),  # not hex: skipped
+            (6, 'ab'),  # odd length: skipped
+        ]
+        ids, matrix = pack_hashes(rows)
+        self.assertEqual(ids.tolist(), [1, 2, 3, 4])
+        self.assertEqual(matrix.shape, (4, 4))
+
+        # block_size 1 puts every pair in a different block
+        groups = find_duplicate_groups(rows, threshold=5, block_size=1)
+        self.assertEqual(len(groups), 1)
+        self.assertEqual(groups[0]['artwork_ids'], [1, 2, 3])
+        self.assertEqual(groups[0]['max_distance'], 3)
+        self.assertEqual(groups[0]['nearest_distances'], {1: 3, 2: 3, 3: 3})
+        self.assertEqual(groups, find_duplicate_groups(rows, threshold=5))
+
+    def test_endpoint_validates_threshold_and_reports_risk(self):
+        admin = CustomUser.objects.create_user(username='admin', password='x', user_type='admin')
+        category = Category.objects.create(name='Painting')
+        create_hashed_artwork(admin, category, 'a', 'ab' * 32)
+        create_hashed_artwork(admin, category, 'b', flip_bits('ab' * 32, 1))
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        for threshold in (-1, 65, 'x'):
+            response = client.get('/api/admin/duplicate-clusters/', {'threshold': threshold})
+            self.assertEqual(response.status_code, 400)
+        data = client.get('/api/admin/duplicate-clusters/', {'threshold': 5}).data
+        self.assertEqual([artwork['duplicate_risk'] for artwork in data['groups'][0]['artworks']], ['HIGH', 'HIGH'])
+
+        # Without the clustering context the stored flag decides
+        artworks = Artwork.objects.order_by('id')
+        Artwork.objects.filter(title='b').update(has_duplicates=False)
+        risks = [row['duplicate_risk'] for row in AdminArtworkSerializer(artworks, many=True).data]
+        self.assertEqual(risks, ['HIGH', 'NONE'])
+
+
+class DuplicateFlagTests(TestCase):
+    """has_duplicates follows available neighbours and can be resynced in bulk"""
+
+    def setUp(self):
+        get_duplicate_index().reset()
+        self.addCleanup(get_duplicate_index().reset)
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.category = Category.objects.create(name='Painting')
+
+    def flags(self):
+        return dict(Artwork.objects.values_list('title', 'has_duplicates'))
+
+    def test_signals_keep_neighbour_flags_current(self):
+        base = 'ab' * 32
+        create_hashed_artwork(self.artist, self.category, 'a', base)
+        create_hashed_artwork(self.artist, self.category, 'far', flip_bits(base, *range(64)))
+        self.assertEqual(self.flags(), {'a': False, 'far': False})
+
+        b = create_hashed_artwork(self.artist, self.category, 'b', flip_bits(base, 7))
+        self.assertEqual(self.flags(), {'a': True, 'far': False, 'b': True})
+
+        # Only available neighbours count
+        b.is_available = False
+        b.save()
+        self.assertEqual(self.flags(), {'a': False, 'far': False, 'b': True})
+        b.delete()
+        self.assertEqual(self.flags(), {'a': False, 'far': False})
+
+    def test_sync_repairs_drift_in_chunks(self):
+        base = 'cd' * 32
+        Artwork.objects.bulk_create(
+            Artwork(artist=self.artist, category=self.category, title=f'stale {i}', description='Oil',
+                    price=10, image=f'artworks/{i}.jpg', has_duplicates=True)
+            for i in range(1200)
+        )
+        Artwork.objects.bulk_create(
+            Artwork(artist=self.artist, category=self.category, title=title, description='Oil',
+                    price=10, image=f'artworks/{title}.jpg', perceptual_hash=perceptual_hash)
+            for title, perceptual_hash in [('x', base), ('y', flip_bits(base, 2))]
+        )
+
+        self.assertEqual(sync_duplicate_flags(), 2)
+        self.assertEqual(set(Artwork.objects.filter(has_duplicates=True).values_list('title', flat=True)), {'x', 'y'})
+
+    def test_admin_actions_refresh_neighbour_flags(self):
+        base = 'ef' * 32
+        create_hashed_artwork(self.artist, self.category, 'a', base)
+        create_hashed_artwork(self.artist, self.category, 'b', flip_bits(base, 3))
+        artwork_admin = ArtworkAdmin(Artwork, admin.site)
+        with patch.object(ArtworkAdmin, 'message_user'):
+            artwork_admin.reject_artworks(None, Artwork.objects.filter(title='b'))
+            self.assertEqual(self.flags(), {'a': False, 'b': True})
+            artwork_admin.approve_artworks(None, Artwork.objects.filter(title='b'))
+        self.assertEqual(self.flags(), {'a': True, 'b': True})
+
+
+def image_upload(name='art.png', size=(240, 180), seed=0, image_format='PNG'):
+    """An in-memory image upload with a seed-dependent gradient"""
+    image = Image.new('RGB', size)
+    image.putdata([((x * 3 + seed) % 256, (y * 5) % 256, (x + y + seed * 7) % 256)
+                   for y in range(size[1]) for x in range(size[0])])
+    buffer = BytesIO()
+    image.save(buffer, image_format)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{image_format.lower()}')
+
+
+class TemporaryMediaMixin:
+    """Stores uploaded files in a throwaway MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+
+@override_settings(ARTWORK_ASYNC_PROCESSING=True)
+class ArtworkProcessingQueueTests(TemporaryMediaMixin, TestCase):
+    """Uploads are hashed right away and watermarked later by process_artwork_jobs"""
+
+    def setUp(self):
+        super().setUp()
+        get_duplicate_index().reset()
+        self.addCleanup(get_duplicate_index().reset)
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.category = Category.objects.create(name='Painting')
+        self.client = APIClient()
+        self.client.force_authenticate(self.artist)
+
+    def upload(self, url='/api/artworks/', **extra):
+        data = {'title': 'Dunes', 'description': 'Sand', 'price': '10.00', 'category_id': self.category.id,
+                'image': image_upload(), **extra}
+        response = self.client.post(url, data, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Artwork.objects.get(pk=response.data['artwork']['id'])
+
+    def test_worker_processes_queued_uploads(self):
+        artwork = self.upload()
+        self.assertEqual(artwork.processing_status, 'pending')
+        self.assertTrue(artwork.perceptual_hash)
+        self.assertFalse(artwork.watermarked_image)
+        status_url = f'/api/artworks/{artwork.id}/processing-status/'
+        self.assertEqual(self.client.get(status_url).data['job']['status'], 'pending')
+
+        out = StringIO()
+        call_command('process_artwork_jobs', '--once', '--workers', '0', stdout=out)
+        self.assertIn('Processed 1 artworks, 0 failures', out.getvalue())
+        artwork.refresh_from_db()
+        self.assertEqual(artwork.processing_status, 'ready')
+        self.assertTrue(artwork.watermarked_image)
+        job = ArtworkProcessingJob.objects.get(artwork=artwork)
+        self.assertEqual((job.status, job.attempts), ('completed', 1))
+        self.assertEqual(self.client.get(status_url).data['processing_status'], 'ready')
+
+    def test_force_upload_stores_the_hash(self):
+        original = self.upload()
+        self.assertEqual(self.client.post('/api/artworks/', {
+            'title': 'Copy', 'description': 'Sand', 'price': '10.00', 'image': image_upload()
+        }, format='multipart').status_code, 409)
+
+        copy = self.upload('/api/artworks/force_upload/', confirm_duplicate_upload='true')
+        self.assertEqual(copy.perceptual_hash, original.perceptual_hash)
+        self.assertEqual(copy.processing_status, 'pending')
+        self.assertIn(copy.id, [artwork_id for artwork_id, _ in get_duplicate_index().query(original.perceptual_hash, 0)])
+
+
+class WatermarkTests(TestCase):
+    """The cached periodic-tile watermark matches the per-tile reference renderer"""
+
+    def test_matches_reference_pixel_for_pixel(self):
+        for size in [(300, 200), (257, 611), (900, 420)]:
+            img = Image.open(image_upload(size=size, seed=size[0]))
+            rendered = watermark.render_watermark(img)
+            self.assertEqual(rendered.mode, 'RGB')
+            self.assertEqual(rendered.size, size)
+            self.assertEqual(rendered.tobytes(), watermark.render_watermark_reference(img).tobytes())
+
+    def test_only_the_cell_is_cached(self):
+        watermark.get_cell.cache_clear()
+        for seed in range(3):
+            watermark.render_watermark(Image.new('RGB', (320, 240 + seed * 100)))
+        info = watermark.get_cell.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+        cell = watermark.get_cell(watermark.WATERMARK_TEXT, watermark.font_size_for(320), watermark.WATERMARK_ANGLE)
+        self.assertEqual(watermark.get_cell.cache_info().currsize, cell.width * cell.height * 4)
+        self.assertEqual(watermark.watermark_strip(320, 10).size, (320, 10))
+        self.assertEqual(watermark.watermark_strip(320, 5000).size, (320, cell.height))
+        # 400, 576 and 784 bytes; the oldest is evicted and what doesn't fit at all isn't kept
+        blank = watermark._image_cache(maxbytes=1400)(lambda side: Image.new('RGBA', (side, side)))
+        for side in (10, 10, 12, 14, 30):
+            blank(side)
+        info = blank.cache_info()
+        self.assertEqual((info.hits, info.misses, info.currsize), (1, 4, 576 + 784))
+
+        short = Image.open(image_upload(size=(320, 12), seed=3))
+        self.assertEqual(
+            watermark.render_watermark(short).tobytes(), watermark.render_watermark_reference(short).tobytes()
+        )
+
+
+class ImageIngestTests(TemporaryMediaMixin, TestCase):
+    """An upload is opened and hashed once however many steps use it"""
+
+    def test_upload_is_opened_and_hashed_once(self):
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        client = APIClient()
+        client.force_authenticate(artist)
+        upload = image_upload('dunes.jpg', size=(640, 480), seed=11, image_format='JPEG')
+
+        with patch.object(ImageIngest, '__init__', autospec=True, side_effect=ImageIngest.__init__) as opened, \
+                patch('api.image_ingest.compute_perceptual_hash', wraps=compute_perceptual_hash) as hashed:
+            response = client.post('/api/artworks/', {
+                'title': 'Dunes', 'description': 'Sand', 'price': '10.00', 'image': upload
+            }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(opened.call_count, 1)
+        self.assertEqual(hashed.call_count, 1)
+
+        artwork = Artwork.objects.get()
+        self.assertTrue(artwork.watermarked_image)
+        self.assertEqual(artwork.perceptual_hash, hash_image(artwork.image.path))
+
+    def test_get_ingest_reuses_the_attached_ingest(self):
+        upload = image_upload()
+        ingest = get_ingest(upload)
+        self.assertIs(get_ingest(upload), ingest)
+        self.assertEqual((ingest.size, ingest.format), ((240, 180), 'PNG'))
+
+
+class DraftDecodeTests(TestCase):
+    """Validation reads headers first and hashing uses reduced-scale decodes"""
+
+    @override_settings(MAX_IMAGE_PIXELS=10000)
+    def test_pixel_budget_is_checked_before_decoding(self):
+        upload = image_upload(size=(400, 300))
+        with self.assertRaisesMessage(ValidationError, 'too many pixels'):
+            validate_artwork_image(upload)
+        ingest = get_ingest(upload)
+        self.assertIsNone(ingest._thumbnail)
+        self.assertFalse(ingest._loaded)
+
+    def test_draft_hash_is_close_to_full_decode(self):
+        upload = image_upload('large.jpg', size=(2048, 1536), seed=3, image_format='JPEG')
+        ingest = get_ingest(upload)
+        self.assertLess(ingest.thumbnail.width, 2048)
+        self.assertFalse(ingest._loaded)
+
+        upload.seek(0)
+        full_hash = compute_perceptual_hash(Image.open(upload))
+        self.assertLessEqual(hamming_distance(int(ingest.perceptual_hash, 16), int(full_hash, 16)), 8)
+
+    def test_truncated_upload_is_rejected(self):
+        data = image_upload('cut.jpg', size=(400, 300), image_format='JPEG').read()
+        truncated = SimpleUploadedFile('cut.jpg', data[:len(data) // 2], content_type='image/jpeg')
+        with self.assertRaises(ValidationError):
+            validate_artwork_image(truncated)
+
+
+class RehashArtworksTests(TemporaryMediaMixin, TestCase):
+    """rehash_artworks hashes in checkpointed chunks and can resume"""
+
+    def test_resumes_from_the_checkpoint(self):
+        get_duplicate_index().reset()
+        self.addCleanup(get_duplicate_index().reset)
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        names = [default_storage.save(f'artworks/{i}.png', image_upload(seed=i * 40)) for i in range(3)]
+        Artwork.objects.bulk_create(
+            Artwork(artist=artist, title=name, description='Oil', price=10, image=name) for name in names
+        )
+        checkpoint = os.path.join(tempfile.mkdtemp(), 'rehash.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(checkpoint))
+        options = ['--workers', '1', '--chunk-size', '1', '--checkpoint', checkpoint]
+
+        call_command('rehash_artworks', '--limit', '2', *options, stdout=StringIO())
+        with open(checkpoint) as f:
+            state = json.load(f)
+        first_two = list(Artwork.objects.order_by('id').values_list('id', flat=True))[:2]
+        self.assertEqual((state['last_id'], state['processed'], state['changed']), (first_two[1], 2, 2))
+        self.assertEqual(Artwork.objects.filter(perceptual_hash__isnull=True).count(), 1)
+
+        out = StringIO()
+        call_command('rehash_artworks', '--resume', *options, stdout=out)
+        self.assertIn('Hashed 1 artworks', out.getvalue())
+        self.assertFalse(os.path.exists(checkpoint))
+        for artwork in Artwork.objects.all():
+            self.assertEqual(artwork.perceptual_hash, hash_image(artwork.image.path))
+
+
+class RenditionTests(TemporaryMediaMixin, TestCase):
+    """Renditions are generated on first request and then served from storage"""
+
+    def setUp(self):
+        super().setUp()
+        get_duplicate_index().reset()
+        self.addCleanup(get_duplicate_index().reset)
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.artwork = Artwork.objects.create(
+            artist=artist, title='Dunes', description='Sand', price=10,
+            image=image_upload('dunes.png', size=(1000, 700), seed=5)
+        )
+        self.client = APIClient()
+
+    def url(self, size, ext, artwork=None):
+        return reverse('artwork-renditions', kwargs={'pk': (artwork or self.artwork).pk, 'size': size, 'ext': ext})
+
+    def test_generates_once_then_redirects_to_the_stored_file(self):
+        with patch('api.renditions.render_rendition', wraps=render_rendition) as rendered:
+            first = self.client.get(self.url('thumbnail', 'webp'))
+            second = self.client.get(self.url('thumbnail', 'webp'))
+        self.assertEqual((first.status_code, second.status_code), (302, 302))
+        self.assertEqual(first['Location'], second['Location'])
+        self.assertEqual(rendered.call_count, 1)
+
+        self.artwork.refresh_from_db()
+        with default_storage.open(rendition_name(self.artwork.rendition_key, 'thumbnail', 'webp')) as f:
+            image = Image.open(f)
+            self.assertEqual((image.format, image.size), ('WEBP', (320, 224)))
+
+        # Images are never upscaled
+        self.assertEqual(self.client.get(self.url('large', 'jpeg')).status_code, 302)
+        with default_storage.open(rendition_name(self.artwork.rendition_key, 'large', 'jpeg')) as f:
+            self.assertEqual(Image.open(f).size, (1000, 700))
+
+    def test_goes_through_the_viewset_queryset(self):
+        self.artwork.is_available = False
+        self.artwork.save(update_fields=['is_available'])
+        self.assertEqual(self.client.get(self.url('medium', 'jpeg')).status_code, 404)
+        self.assertEqual(self.client.get(f'/api/artworks/{self.artwork.pk}/processing-status/').status_code, 404)
+
+
+class ArtworkIsLikedQueryCountTests(TestCase):
+    """is_liked on artwork lists must not cost one query per artwork"""
+
+    def setUp(self):
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.viewer = CustomUser.objects.create_user(username='viewer', password='x')
+        self.category = Category.objects.create(name='Painting')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def create_artworks(self, count):
+        # bulk_create skips Artwork.save, so no image processing runs
+        artworks = Artwork.objects.bulk_create(
+            Artwork(
+                artist=self.artist, category=self.category, title=f'Sunset {i}',
+                description='Oil on canvas', price=10, image=f'artworks/{i}.jpg',
+                is_featured=True,
+            )
+            for i in range(count)
+        )
+        ArtworkLike.objects.bulk_create(
+            ArtworkLike(user=self.viewer, artwork=artwork) for artwork in artworks[::2]
+        )
+        return artworks
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries), response.data
+
+    def assert_constant_queries(self, url):
+        self.create_artworks(2)
+        few, _ = self.count_queries(url)
+        self.create_artworks(8)
+        many, _ = self.count_queries(url)
+        self.assertEqual(few, many)
+
+    def test_list_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('/api/artworks/')
+
+    def test_featured_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries('/api/artworks/featured/')
+
+    def test_artist_artworks_queries_do_not_grow_with_page_size(self):
+        self.assert_constant_queries(f'/api/artist-profiles/{self.artist.pk}/artworks/')
+
+    def test_global_search_queries_do_not_grow_with_result_count(self):
+        self.assert_constant_queries('/api/search/?q=Sunset')
+
+    def test_list_reports_liked_artworks(self):
+        artworks = self.create_artworks(4)
+        liked = {artwork.pk for artwork in artworks[::2]}
+        _, data = self.count_queries('/api/artworks/')
+        self.assertEqual({item['id'] for item in data['results'] if item['is_liked']}, liked)
+
+
+class ViewCounterTests(TestCase):
+    """Artwork views are buffered and written with atomic increments"""
+
+    def setUp(self):
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.artworks = Artwork.objects.bulk_create(
+            Artwork(artist=artist, title=f'Sunset {i}', description='Oil on canvas',
+                    price=10, image=f'artworks/{i}.jpg', views_count=5)
+            for i in range(2)
+        )
+
+    def views(self, artwork):
+        return Artwork.objects.values_list('views_count', flat=True).get(pk=artwork.pk)
+
+    def test_views_are_buffered_until_flush(self):
+        counter = ViewCounter(flush_interval=3600, flush_threshold=100)
+        first, second = self.artworks
+        for _ in range(3):
+            counter.record(first.pk)
+        self.assertEqual(counter.record(second.pk), 1)
+        self.assertEqual(counter.pending(first.pk), 3)
+        self.assertEqual(self.views(first), 5)
+
+        self.assertEqual(counter.flush(), 4)
+        self.assertEqual((self.views(first), self.views(second)), (8, 6))
+        self.assertEqual(counter.pending(first.pk), 0)
+
+    def test_threshold_triggers_flush(self):
+        counter = ViewCounter(flush_interval=3600, flush_threshold=2)
+        artwork = self.artworks[0]
+        counter.record(artwork.pk)
+        self.assertEqual(counter.record(artwork.pk), 2)
+        self.assertEqual(self.views(artwork), 7)
+        self.assertEqual(counter.pending(artwork.pk), 0)
+
+    def test_retrieve_does_not_write_and_returns_fresh_count(self):
+        artwork = self.artworks[0]
+        counter = ViewCounter(flush_interval=3600, flush_threshold=100)
+        with patch('api.view_counter._counter', counter):
+            APIClient().get(f'/api/artworks/{artwork.pk}/')
+            response = APIClient().get(f'/api/artworks/{artwork.pk}/')
+        self.assertEqual(response.data['views_count'], 7)
+        self.assertEqual(self.views(artwork), 5)
+        counter.flush()
+        self.assertEqual(self.views(artwork), 7)
+
+
+class ArtworkLikeCountTests(TestCase):
+    """Liking keeps likes_count in step with the ArtworkLike rows"""
+
+    def setUp(self):
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.viewer = CustomUser.objects.create_user(username='viewer', password='x')
+        self.artwork = Artwork.objects.bulk_create([
+            Artwork(artist=artist, title='Sunset', description='Oil on canvas',
+                    price=10, image='artworks/sunset.jpg')
+        ])[0]
+
+    def test_toggle_like_moves_count_by_one(self):
+        self.assertEqual(self.artwork.toggle_like(self.viewer), (True, 1))
+        self.assertTrue(ArtworkLike.objects.filter(user=self.viewer, artwork=self.artwork).exists())
+        self.assertEqual(self.artwork.toggle_like(self.viewer), (False, 0))
+        self.assertFalse(ArtworkLike.objects.filter(artwork=self.artwork).exists())
+
+    def test_toggle_like_counts_from_stored_value(self):
+        # Another process's like, made after this instance was loaded
+        Artwork.objects.filter(pk=self.artwork.pk).update(likes_count=4)
+        self.assertEqual(self.artwork.toggle_like(self.viewer), (True, 5))
+
+    def test_reconcile_repairs_drift(self):
+        ArtworkLike.objects.create(user=self.viewer, artwork=self.artwork)
+        Artwork.objects.filter(pk=self.artwork.pk).update(likes_count=7)
+
+        call_command('reconcile_like_counts', '--dry-run', stdout=StringIO())
+        self.artwork.refresh_from_db()
+        self.assertEqual(self.artwork.likes_count, 7)
+
+        call_command('reconcile_like_counts', stdout=StringIO())
+        self.artwork.refresh_from_db()
+        self.assertEqual(self.artwork.likes_count, 1)
+
+
+class UniqueViewerTests(TestCase):
+    """HyperLogLog sketches count distinct viewers per artwork and day"""
+
+    def setUp(self):
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.artwork = Artwork.objects.bulk_create([
+            Artwork(artist=artist, title='Sunset', description='Oil on canvas',
+                    price=10, image='artworks/sunset.jpg')
+        ])[0]
+
+    @staticmethod
+    def hash_of(viewer):
+        return int.from_bytes(hashlib.blake2b(str(viewer).encode(), digest_size=8).digest(), 'big')
+
+    def sketch_of(self, viewers):
+        sketch = HyperLogLog()
+        for viewer in viewers:
+            sketch.add(self.hash_of(viewer))
+        return sketch
+
+    def test_estimate_is_close_and_merge_is_idempotent(self):
+        sketch = self.sketch_of(range(20000))
+        self.assertAlmostEqual(len(sketch), 20000, delta=20000 * 0.07)
+        self.assertEqual(len(self.sketch_of(range(10))), 10)
+
+        merged = self.sketch_of(range(10000))
+        merged |= self.sketch_of(range(5000, 20000))
+        self.assertEqual(len(merged), len(sketch))
+        self.assertEqual(len(HyperLogLog.from_bytes(merged.to_bytes())), len(sketch))
+
+    def test_repeat_views_count_once_across_flushes(self):
+        counter = ViewCounter(flush_interval=3600, flush_threshold=1000)
+        for _ in range(2):
+            for viewer in range(50):
+                counter.record(self.artwork.pk, viewer=self.hash_of(viewer))
+            counter.flush()
+
+        self.assertEqual(ArtworkViewSketch.objects.filter(artwork=self.artwork).count(), 1)
+        self.assertEqual(self.views(), 100)
+        self.assertAlmostEqual(unique_viewers_by_artwork([self.artwork.pk])[self.artwork.pk], 50, delta=2)
+
+    def test_detail_views_record_viewers(self):
+        counter = ViewCounter(flush_interval=3600, flush_threshold=1000)
+        viewer = CustomUser.objects.create_user(username='viewer', password='x')
+        with patch('api.view_counter._counter', counter):
+            client = APIClient()
+            client.force_authenticate(viewer)
+            client.get(f'/api/artworks/{self.artwork.pk}/')
+            client.get(f'/api/artworks/{self.artwork.pk}/')
+            APIClient().get(f'/api/artworks/{self.artwork.pk}/', REMOTE_ADDR='10.0.0.7')
+        counter.flush()
+        self.assertEqual(unique_viewers([self.artwork.pk], days=1), 2)
+
+    def test_forwarded_for_is_only_trusted_behind_configured_proxies(self):
+        factory = RequestFactory()
+
+        def viewer(address, forwarded):
+            request = factory.get('/', REMOTE_ADDR=address, HTTP_X_FORWARDED_FOR=forwarded)
+            request.user = AnonymousUser()
+            return viewer_hash(request)
+
+        # Spoofed headers don't mint new viewers
+        self.assertEqual(viewer('10.0.0.7', '1.1.1.1'), viewer('10.0.0.7', '2.2.2.2'))
+        self.assertNotEqual(viewer('10.0.0.7', ''), viewer('10.0.0.8', ''))
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            # Only the entry the proxy appended counts, not what the client sent
+            self.assertEqual(viewer('10.0.0.1', '1.1.1.1, 203.0.113.5'), viewer('10.0.0.2', '203.0.113.5'))
+            self.assertNotEqual(viewer('10.0.0.1', '203.0.113.5'), viewer('10.0.0.1', '203.0.113.6'))
+
+    def views(self):
+        return Artwork.objects.values_list('views_count', flat=True).get(pk=self.artwork.pk)
+
+
+class TrendingScoreTests(TestCase):
+    """recompute_trending folds new events into a stored, decayed score"""
+
+    def setUp(self):
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.fans = [CustomUser.objects.create_user(username=f'fan{i}', password='x') for i in range(5)]
+        self.quiet, self.busy = Artwork.objects.bulk_create(
+            Artwork(artist=artist, title=title, description='Oil on canvas', price=10,
+                    image=f'artworks/{title}.jpg', is_featured=True)
+            for title in ('quiet', 'busy')
+        )
+
+    def recompute(self):
+        call_command('recompute_trending', stdout=StringIO())
+
+    def test_scores_rank_recent_engagement(self):
+        ArtworkLike.objects.bulk_create(ArtworkLike(user=fan, artwork=self.busy) for fan in self.fans)
+        ArtworkLike.objects.create(user=self.fans[0], artwork=self.quiet)
+        counter = ViewCounter(flush_interval=3600, flush_threshold=1000)
+        for viewer in range(4):
+            counter.record(self.busy.pk, viewer=UniqueViewerTests.hash_of(viewer))
+        counter.flush()
+        self.recompute()
+
+        self.busy.refresh_from_db()
+        self.quiet.refresh_from_db()
+        # 5 likes x 3 + 4 unique viewers, all too recent to have decayed
+        self.assertAlmostEqual(decayed_score(self.busy.trending_score), 19, delta=0.5)
+        self.assertAlmostEqual(decayed_score(self.quiet.trending_score), 3, delta=0.1)
+
+        response = APIClient().get('/api/artworks/trending/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.busy.pk])
+        response = APIClient().get('/api/artworks/featured/')
+        self.assertEqual([item['id'] for item in response.data['results']], [self.busy.pk, self.quiet.pk])
+
+    def test_events_are_counted_once(self):
+        ArtworkLike.objects.create(user=self.fans[0], artwork=self.busy)
+        self.recompute()
+        self.busy.refresh_from_db()
+        score = self.busy.trending_score
+        self.recompute()
+        self.busy.refresh_from_db()
+        self.assertEqual(self.busy.trending_score, score)
+
+    def test_likes_committed_after_a_run_are_counted_once(self):
+        ArtworkLike.objects.create(user=self.fans[0], artwork=self.busy)
+        self.recompute()
+        # A like stamped before that run but committed after it
+        late = ArtworkLike.objects.create(user=self.fans[1], artwork=self.busy)
+        self.busy.refresh_from_db()
+        ArtworkLike.objects.filter(pk=late.pk).update(created_at=self.busy.trending_updated_at - timedelta(seconds=5))
+        self.recompute()
+        self.recompute()
+        self.busy.refresh_from_db()
+        self.assertAlmostEqual(decayed_score(self.busy.trending_score), 2 * LIKE_WEIGHT, delta=0.1)
+
+    def test_rebuild_drops_removed_likes(self):
+        ArtworkLike.objects.bulk_create(ArtworkLike(user=fan, artwork=self.busy) for fan in self.fans[:2])
+        self.recompute()
+        ArtworkLike.objects.filter(user=self.fans[0]).delete()
+        call_command('recompute_trending', '--rebuild', stdout=StringIO())
+        self.busy.refresh_from_db()
+        self.assertAlmostEqual(decayed_score(self.busy.trending_score), LIKE_WEIGHT, delta=0.1)
+        self.recompute()
+        self.busy.refresh_from_db()
+        self.assertAlmostEqual(decayed_score(self.busy.trending_score), LIKE_WEIGHT, delta=0.1)
+
+    def test_old_events_decay(self):
+        now = timezone.now()
+        day_ago = event_score(LIKE_WEIGHT, now - timedelta(hours=24))
+        self.assertAlmostEqual(decayed_score(add_events(0, [day_ago]), now), LIKE_WEIGHT / 2)
+        self.assertGreater(event_score(1, now), score_cutoff(1, now) - 1e-9)
+
+
+class CursorPaginationTests(TestCase):
+    """`?pagination=cursor` walks a list in keyset pages; page numbers stay the default"""
+
+    def setUp(self):
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.artworks = Artwork.objects.bulk_create(
+            Artwork(artist=artist, title=f'Sunset {i}', description='Oil on canvas',
+                    price=10, image=f'artworks/{i}.jpg')
+            for i in range(5)
+        )
+        self.client = APIClient()
+
+    def test_default_is_page_numbers(self):
+        response = self.client.get('/api/artworks/?page_size=2')
+        self.assertEqual(response.data['count'], 5)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_cursor_pages_cover_the_list_without_count(self):
+        seen = []
+        url = '/api/artworks/?pagination=cursor&page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertNotIn('count', response.data)
+            seen.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        expected = sorted(self.artworks, key=lambda a: (a.created_at, a.pk), reverse=True)
+        self.assertEqual(seen, [artwork.pk for artwork in expected])
+
+    def test_cursor_queries_do_not_count_rows(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/artworks/?pagination=cursor')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+
+
+class AdminDashboardStatsTests(TestCase):
+    """admin_dashboard_stats aggregates each table once and is cached"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_user(username='admin', password='x', user_type='admin')
+        artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        buyer = CustomUser.objects.create_user(username='buyer', password='x', is_verified=True)
+        Payment.objects.create(payer=buyer, payee=artist, amount=Decimal('40.00'), payment_method='stripe', status='completed')
+        Payment.objects.create(payer=buyer, payee=artist, amount=Decimal('15.00'), payment_method='stripe', status='pending')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_stats_match_and_second_request_hits_cache(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/admin/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        # Ten tables aggregated once each, plus the four recent-activity lists
+        self.assertEqual(len(context.captured_queries), 14)
+
+        user_stats = response.data['user_stats']
+        self.assertEqual((user_stats['total_users'], user_stats['artists'], user_stats['buyers']), (3, 1, 1))
+        self.assertEqual(user_stats['verified_users'], 1)
+        financial_stats = response.data['financial_stats']
+        self.assertEqual(financial_stats['total_revenue'], Decimal('40.00'))
+        self.assertEqual(financial_stats['revenue_today'], Decimal('40.00'))
+        self.assertEqual((financial_stats['completed_payments'], financial_stats['pending_payments']), (1, 1))
+        self.assertEqual(response.data['activity_stats']['average_rating'], 0)
+
+        with CaptureQueriesContext(connection) as context:
+            cached = self.client.get('/api/admin/dashboard/')
+        self.assertEqual(cached.data['generated_at'], response.data['generated_at'])
+        self.assertFalse(any('COUNT(' in query['sql'] for query in context.captured_queries))
+
+
+class UserDashboardStatsTests(TestCase):
+    """dashboard_stats reads counters kept current by signals"""
+
+    def setUp(self):
+        cache.clear()
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='x', user_type='buyer')
+        ArtistProfile.objects.create(user=self.artist, skills='painting')
+        self.client = APIClient()
+
+    def stats(self, user):
+        self.client.force_authenticate(user)
+        return self.client.get('/api/dashboard/stats/').data
+
+    def create_job(self, **kwargs):
+        return Job.objects.create(
+            buyer=self.buyer, title='Mural', description='A wall', budget_min=10, budget_max=20,
+            duration_days=5, required_skills='painting', deadline=timezone.now() + timedelta(days=9),
+            **kwargs
+        )
+
+    def test_counters_follow_writes(self):
+        job = self.create_job()
+        bid = Bid.objects.create(job=job, artist=self.artist, bid_amount=15, delivery_time=4, cover_letter='Hi')
+        self.assertEqual(self.stats(self.artist)['active_bids'], 1)
+        self.assertEqual(self.stats(self.buyer)['active_jobs'], 1)
+
+        job.hired_artist = self.artist
+        job.status = 'in_progress'
+        job.save()
+        bid.status = 'accepted'
+        bid.save()
+        artist_stats = self.stats(self.artist)
+        self.assertEqual((artist_stats['active_bids'], artist_stats['ongoing_projects']), (0, 1))
+        buyer_stats = self.stats(self.buyer)
+        self.assertEqual((buyer_stats['active_jobs'], buyer_stats['ongoing_projects']), (0, 1))
+
+        Payment.objects.create(payer=self.buyer, payee=self.artist, job=job, amount=Decimal('15.00'),
+                               payment_method='stripe', status='completed')
+        self.assertEqual(self.stats(self.artist)['total_earnings'], 15.0)
+        self.assertEqual(self.stats(self.buyer)['total_spent'], 15.0)
+
+    def test_read_is_a_single_query(self):
+        self.stats(self.buyer)
+        self.client.force_authenticate(self.buyer)
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/api/dashboard/stats/')
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_rebuild_repairs_drift(self):
+        self.create_job()
+        self.stats(self.buyer)
+        UserDashboardStats.objects.filter(pk=self.buyer.pk).update(projects_posted=9, active_jobs=9)
+        out = StringIO()
+        call_command('rebuild_user_stats', stdout=out)
+        self.assertIn('1 had drifted', out.getvalue())
+        buyer_stats = self.stats(self.buyer)
+        self.assertEqual((buyer_stats['projects_posted'], buyer_stats['active_jobs']), (1, 1))
+
+    def test_admin_bulk_actions_refresh_counters(self):
+        create_hashed_artwork(self.artist, Category.objects.create(name='Painting'), 'Sunset', 'ab' * 32)
+        Payment.objects.create(payer=self.buyer, payee=self.artist, amount=Decimal('15.00'),
+                               payment_method='stripe', status='completed')
+        self.assertEqual(self.stats(self.artist)['total_artworks'], 1)
+        self.assertEqual(self.stats(self.buyer)['total_spent'], 15.0)
+
+        with patch.object(ArtworkAdmin, 'message_user'), patch.object(PaymentAdmin, 'message_user'):
+            ArtworkAdmin(Artwork, admin.site).reject_artworks(None, Artwork.objects.all())
+            PaymentAdmin(Payment, admin.site).refund_payments(None, Payment.objects.all())
+        artist_stats = self.stats(self.artist)
+        self.assertEqual((artist_stats['total_artworks'], artist_stats['total_earnings']), (0, 0.0))
+        self.assertEqual(self.stats(self.buyer)['total_spent'], 0.0)
+
+
+class AnalyticsRollupTests(TestCase):
+    """Platform analytics are summed from hourly deltas recorded by signals"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='x', user_type='admin')
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def create_job(self):
+        return Job.objects.create(
+            buyer=self.buyer, title='Mural', description='A wall', budget_min=10, budget_max=20,
+            duration_days=5, required_skills='painting', deadline=timezone.now() + timedelta(days=9),
+        )
+
+    def create_payment(self, amount, status):
+        return Payment.objects.create(payer=self.buyer, payee=self.artist, amount=Decimal(amount),
+                                      payment_method='stripe', status=status)
+
+    def test_events_are_recorded_as_deltas(self):
+        job = self.create_job()
+        job.status = 'completed'
+        job.save()
+        self.create_payment('40.00', 'completed')
+        pending = self.create_payment('15.00', 'pending')
+        pending.status = 'completed'
+        pending.save()
+        self.create_job().delete()
+
+        totals = rollup_totals()
+        self.assertEqual(
+            (totals['users_joined'], totals['artists_joined'], totals['buyers_joined'], totals['admins_joined']),
+            (3, 1, 1, 1)
+        )
+        self.assertEqual((totals['jobs_posted'], totals['jobs_completed']), (1, 1))
+        self.assertEqual((totals['revenue'], totals['platform_fees']), (Decimal('55.00'), Decimal('2.75')))
+        self.assertEqual(AnalyticsRollup.objects.get().bucket, bucket_start())
+
+        self.buyer.user_type = 'artist'
+        self.buyer.save()
+        job.status = 'in_progress'
+        job.save()
+        pending.delete()
+        totals = rollup_totals()
+        self.assertEqual((totals['users_joined'], totals['artists_joined'], totals['buyers_joined']), (3, 2, 0))
+        self.assertEqual(totals['jobs_completed'], 0)
+        self.assertEqual(totals['revenue'], Decimal('40.00'))
+
+    def test_calculate_today_reads_rollups(self):
+        self.create_job()
+        self.create_payment('40.00', 'completed')
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/analytics/calculate-today/')
+        self.assertFalse(any('"api_payment"' in query['sql'] for query in context.captured_queries))
+        self.assertEqual((response.data['total_users'], response.data['total_jobs_posted']), (3, 1))
+        self.assertEqual(Decimal(response.data['total_platform_fees']), Decimal('2.00'))
+
+        response = self.client.get('/api/analytics/rollups/', {'granularity': 'hour', 'days': 1})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['jobs_posted'], 1)
+
+    def test_backfill_rebuilds_history(self):
+        job = self.create_job()
+        job.status = 'completed'
+        job.save()
+        self.create_payment('40.00', 'completed')
+        self.create_payment('15.00', 'pending')
+        category = Category.objects.create(name='Painting')
+        Artwork.objects.bulk_create(
+            Artwork(artist=self.artist, category=category, title=f'Sunset {i}', description='Oil on canvas',
+                    price=10, image=f'artworks/{i}.jpg')
+            for i in range(3)
+        )
+        earlier = timezone.now() - timedelta(hours=3)
+        CustomUser.objects.update(date_joined=earlier)
+        Job.objects.update(created_at=earlier, updated_at=earlier)
+        Payment.objects.update(created_at=earlier)
+        Artwork.objects.update(created_at=earlier)
+        AnalyticsRollup.objects.update(users_joined=99)
+
+        out = StringIO()
+        call_command('backfill_analytics_rollups', batch_size=2, stdout=out)
+        self.assertIn('Backfilled 1 hourly rollups', out.getvalue())
+        rollup = AnalyticsRollup.objects.get(bucket=bucket_start(earlier))
+        self.assertEqual((rollup.users_joined, rollup.jobs_posted, rollup.jobs_completed), (3, 1, 1))
+        self.assertEqual(rollup.artworks_uploaded, 3)
+        self.assertEqual((rollup.revenue, rollup.platform_fees), (Decimal('40.00'), Decimal('2.00')))
+        self.assertFalse(AnalyticsRollup.objects.filter(bucket=bucket_start()).exists())
+
+    def test_backfill_counts_events_of_the_current_hour_once(self):
+        job = self.create_job()
+        pending = self.create_payment('15.00', 'pending')
+        earlier = timezone.now() - timedelta(hours=3)
+        Job.objects.update(created_at=earlier, updated_at=earlier)
+        Payment.objects.update(created_at=earlier)
+        call_command('backfill_analytics_rollups', stdout=StringIO())
+
+        # Completed this hour, after being created earlier
+        job.status = 'completed'
+        job.save()
+        pending.status = 'completed'
+        pending.save()
+        call_command('backfill_analytics_rollups', stdout=StringIO())
+        totals = rollup_totals()
+        self.assertEqual((totals['jobs_posted'], totals['jobs_completed']), (1, 1))
+        self.assertEqual(totals['revenue'], Decimal('15.00'))
+
+
+class RevenueReportTests(TestCase):
+    """admin_revenue_report reads daily rollups kept current by signals"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='x', user_type='admin')
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='x')
+        self.other_buyer = CustomUser.objects.create_user(username='other', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def pay(self, payer, amount, status='completed', method='stripe'):
+        return Payment.objects.create(payer=payer, payee=self.artist, amount=Decimal(amount),
+                                      payment_method=method, status=status)
+
+    def report(self):
+        with CaptureQueriesContext(connection) as context:
+            data = self.client.get('/api/admin/revenue-report/').data
+        self.assertFalse(any('"api_payment"' in query['sql'] for query in context.captured_queries))
+        return data
+
+    def test_report_follows_payment_status(self):
+        self.pay(self.buyer, '40.00')
+        self.pay(self.other_buyer, '10.00', method='paypal')
+        pending = self.pay(self.other_buyer, '15.00', status='pending')
+
+        data = self.report()
+        self.assertEqual((data['total_revenue'], data['total_transactions']), (Decimal('50.00'), 2))
+        self.assertEqual([row['payment_method'] for row in data['revenue_by_method']], ['stripe', 'paypal'])
+        self.assertEqual(data['top_buyers'][0], {'payer__username': 'buyer', 'total_spent': Decimal('40.00'),
+                                                 'payment_count': 1})
+        self.assertEqual(data['top_artists'][0]['total_earned'], Decimal('50.00'))
+
+        pending.status = 'completed'
+        pending.save()
+        pending.status = 'refunded'
+        pending.amount = Decimal('99.00')
+        pending.save()
+        Payment.objects.get(payment_method='paypal').delete()
+        data = self.report()
+        self.assertEqual((data['total_revenue'], data['total_transactions']), (Decimal('40.00'), 1))
+        self.assertEqual(len(data['revenue_by_method']), 1)
+        self.assertEqual([row['payer__username'] for row in data['top_buyers']], ['buyer'])
+
+    def test_backfill_rebuilds_rollups(self):
+        self.pay(self.buyer, '40.00')
+        self.pay(self.buyer, '5.00')
+        self.pay(self.other_buyer, '10.00', status='failed')
+        RevenueRollup.objects.update(total=0)
+        BuyerSpendRollup.objects.all().delete()
+
+        out = StringIO()
+        call_command('backfill_revenue_rollups', batch_size=1, stdout=out)
+        self.assertIn('Rebuilt 1 revenue and 1 buyer spend rollups', out.getvalue())
+        data = self.report()
+        self.assertEqual((data['total_revenue'], data['total_transactions']), (Decimal('45.00'), 2))
+        self.assertEqual(data['top_buyers'][0]['payment_count'], 2)
+
+    def test_payments_without_payee_share_one_rollup(self):
+        for amount in ('40.00', '5.00'):
+            Payment.objects.create(payer=self.buyer, amount=Decimal(amount), payment_method='stripe',
+                                   status='completed')
+        rollup = RevenueRollup.objects.get(payee=None)
+        self.assertEqual((rollup.total, rollup.payment_count), (Decimal('45.00'), 2))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            RevenueRollup.objects.create(day=rollup.day, payment_method='stripe')
+
+
+class AdminExportTests(TestCase):
+    """Admin exports stream every filtered row as CSV or NDJSON"""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(username='admin', password='x', user_type='admin')
+        self.artist = CustomUser.objects.create_user(username='=artist', password='x', user_type='artist')
+        for amount, status in [('40.00', 'completed'), ('15.00', 'pending'), ('7.50', 'completed')]:
+            Payment.objects.create(payer=self.admin, payee=self.artist, amount=Decimal(amount),
+                                   payment_method='stripe', status=status)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def content(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    @override_settings(ADMIN_EXPORT_CHUNK_SIZE=2)
+    def test_csv_honors_filters(self):
+        response = self.client.get('/api/admin/exports/payments.csv', {'status': 'completed', 'min_amount': 5})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(self.content(response).splitlines()))
+        self.assertEqual([row['amount'] for row in rows], ['40.00', '7.50'])
+        self.assertEqual(rows[0]['payee_username'], "'=artist")
+        self.assertEqual(rows[0]['order_id'], '')
+
+    def test_ndjson(self):
+        response = self.client.get('/api/admin/exports/users.ndjson', {'user_type': 'artist'})
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual((rows[0]['username'], rows[0]['is_active']), ('=artist', True))
+        self.assertNotIn('password', rows[0])
+
+    def test_errors(self):
+        self.assertEqual(self.client.get('/api/admin/exports/payments.csv', {'min_amount': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/admin/exports/bids.csv').status_code, 404)
+        self.client.force_authenticate(self.artist)
+        self.assertEqual(self.client.get('/api/admin/exports/orders.csv').status_code, 403)
+
+
+class SearchIndexTests(TestCase):
+    """Searches are answered by the FTS5 index, kept in sync by signals"""
+
+    def setUp(self):
+        self.artist = CustomUser.objects.create_user(username='artist', password='x', user_type='artist')
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='x')
+        self.client = APIClient()
+
+    def create_job(self, title, **kwargs):
+        return Job.objects.create(
+            buyer=self.buyer, title=title, description='A wall', budget_min=10, budget_max=20,
+            duration_days=5, required_skills='painting', deadline=timezone.now() + timedelta(days=9),
+            **kwargs
+        )
+
+    def search_jobs(self, text):
+        return [job['title'] for job in self.client.get('/api/jobs/', {'search': text}).data['results']]
+
+    def test_signals_keep_jobs_in_sync(self):
+        job = self.create_job('Portrait mural')
+        self.create_job('Logo design')
+        self.assertEqual(self.search_jobs('MUR'), ['Portrait mural'])
+
+        job.title = 'Portrait sketch'
+        job.save()
+        self.assertEqual(self.search_jobs('mural'), [])
+        self.buyer.username = 'gallery'
+        self.buyer.save()
+        self.assertEqual(sorted(self.search_jobs('galler')), ['Logo design', 'Portrait sketch'])
+        job.delete()
+        self.assertEqual(self.search_jobs('portrait'), [])
+
+    def test_global_search_is_ranked(self):
+        category = Category.objects.create(name='Painting')
+        Artwork.objects.bulk_create([
+            Artwork(artist=self.artist, category=category, title=title, description=description,
+                    price=10, image=f'artworks/{i}.jpg', is_available=available)
+            for i, (title, description, available) in enumerate([
+                ('Harbour', 'A sunset over the water', True),
+                ('Sunset', 'Oil on canvas', True),
+                ('Sunset study', 'Hidden', False),
+            ])
+        ])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('Indexed 3 artworks', out.getvalue())
+
+        data = self.client.get('/api/search/', {'q': 'sunset'}).data
+        self.assertEqual([artwork['title'] for artwork in data['artworks']], ['Sunset', 'Harbour'])
+        self.assertEqual(
+            list(ArtworkFilter({'search': 'oil canv'}, queryset=Artwork.objects.all()).qs.values_list('title', flat=True)),
+            ['Sunset']
+        )
+
+    def test_emails_are_not_searchable(self):
+        self.artist.email = 'owner@example.com'
+        self.artist.save()
+        profile = ArtistProfile.objects.create(user=self.artist, bio='Portraits')
+        self.assertEqual(search_index.ranked_ids(search_index.ARTIST, 'portraits'), [profile.id])
+        self.assertEqual(search_index.ranked_ids(search_index.ARTIST, 'owner example'), [])
+
+    def test_ranking_is_limited_after_filtering(self):
+        hidden = [self.create_job(f'Mural {i}', status='completed') for i in range(3)]
+        open_job = self.create_job('Small mural sketch')
+        open_jobs = Job.objects.filter(status='open')
+        self.assertEqual(search_index.ranked_ids(search_index.JOB, 'mural', 1, open_jobs), [open_job.id])
+        self.assertEqual(search_index.ranked(open_jobs, search_index.JOB, 'mural', 1), [open_job])
+        self.assertIn(search_index.ranked_ids(search_index.JOB, 'mural', 1)[0], [job.id for job in hidden])
+
+
+class TrigramSearchTests(TestCase):
+    """Fuzzy search matches misspelled words by trigram similarity"""
+
+    def setUp(self):
+        self.picasso = CustomUser.objects.create_user(username='picasso', password='x', user_type='artist')
+        self.monet = CustomUser.objects.create_user(username='monet', password='x', user_type='artist')
+        self.picasso_profile = ArtistProfile.objects.create(user=self.picasso, skills='Cubism, sculpture')
+        self.monet_profile = ArtistProfile.objects.create(user=self.monet, skills='Watercolour painting')
+        self.client = APIClient()
+
+    def test_trigrams_are_padded(self):
+        self.assertEqual(trigrams('art'), {'  a', ' ar', 'art', 'rt '})
+
+    def test_misspellings_match(self):
+        data = self.client.get('/api/search/', {'q': 'picaso', 'fuzzy': 'true'}).data
+        self.assertEqual([artist['user']['username'] for artist in data['artists']], ['picasso'])
+        self.assertEqual(self.client.get('/api/search/', {'q': 'picaso'}).data['artists'], [])
+
+        ids = [object_id for object_id, _ in fuzzy_ids(search_index.ARTIST, 'watercolor paintng')]
+        self.assertEqual(ids, [self.monet_profile.id])
+
+    def test_postings_follow_writes(self):
+        self.picasso.username = 'pablo'
+        self.picasso.save()
+        self.assertEqual(fuzzy_ids(search_index.ARTIST, 'picasso'), [])
+        self.assertEqual(fuzzy_ids(search_index.ARTIST, 'pabol')[0][0], self.picasso_profile.id)
+
+        self.monet_profile.delete()
+        self.assertFalse(SearchTrigram.objects.filter(object_id=self.monet_profile.id).exists())
+        SearchTrigram.objects.all().delete()
+        call_command('rebuild_trigram_index', stdout=StringIO())
+        self.assertEqual(fuzzy_ids(search_index.ARTIST, 'cubsm')[0][0], self.picasso_profile.id)
+
+    def test_matches_are_limited_after_filtering(self):
+        self.picasso_profile.skills = 'painting'
+        self.picasso_profile.is_available = False
+        self.picasso_profile.save()
+        self.assertEqual(fuzzy_ids(search_index.ARTIST, 'paintng', 1)[0][0], self.picasso_profile.id)
+        available = ArtistProfile.objects.filter(is_available=True)
+        self.assertEqual(fuzzy_ids(search_index.ARTIST, 'paintng', 1, queryset=available)[0][0], self.monet_profile.id)
+        self.assertEqual(fuzzy(available, search_index.ARTIST, 'paintng', 1), [self.monet_profile])
+
+
+class SearchSuggestTests(TestCase):
+    """Suggestions come from the in-memory prefix index, kept current by signals"""
+
+    def setUp(self):
+        get_suggestion_index().reset()
+        self.addCleanup(get_suggestion_index().reset)
+        for username, skills in [('monet', 'Painting, gardens'), ('renoir', 'painting'), ('rodin', 'Sculpture')]:
+            user = CustomUser.objects.create_user(username=username, password='x', user_type='artist')
+            ArtistProfile.objects.create(user=user, skills=skills)
+        self.category = Category.objects.create(name='Pastels')
+        self.client = APIClient()
+
+    def suggest(self, prefix):
+        response = self.client.get('/api/search/suggest/', {'q': prefix})
+        return [(item['type'], item['text']) for item in response.data['suggestions']]
+
+    def test_prefixes_match_any_word(self):
+        Artwork.objects.bulk_create([
+            Artwork(artist=CustomUser.objects.get(username='monet'), category=self.category, title=title,
+                    description='Oil', price=10, image='artworks/a.jpg')
+            for title in ['Water lilies', 'Garden path']
+        ])
+        self.assertEqual(self.suggest('PA'), [('skill', 'painting'), ('category', 'Pastels'), ('artwork', 'Garden path')])
+        self.assertEqual(self.suggest('lil'), [('artwork', 'Water lilies')])
+
+        with CaptureQueriesContext(connection) as context:
+            self.suggest('ro')
+        self.assertEqual(len(context.captured_queries), 0)
+
+    def test_signals_update_the_index(self):
+        self.assertEqual(self.suggest('past'), [('category', 'Pastels')])
+        self.category.name = 'Charcoal'
+        self.category.save()
+        self.assertEqual(self.suggest('past'), [])
+        self.assertEqual(self.suggest('char'), [('category', 'Charcoal')])
+
+        rodin = CustomUser.objects.get(username='rodin')
+        rodin.first_name, rodin.last_name = 'Auguste', 'Rodin'
+        rodin.save()
+        self.assertEqual(self.suggest('rod'), [('artist', 'rodin'), ('artist', 'Auguste Rodin')])
+        rodin.artist_profile.delete()
+        self.assertEqual(self.suggest('rod'), [])
+        self.assertEqual(self.suggest('sculp'), [])
+
+    def test_whole_prefix_range_is_ranked(self):
+        index = SuggestionIndex()
+        with patch.object(SuggestionIndex, '_read', return_value=([], {}, {})):
+            index.suggest('p')
+        for pk in range(300):
+            index.update(('artwork', pk), [('artwork', f'Paint {pk:03}')])
+        for pk in range(300, 303):
+            index.update(('artwork', pk), [('artwork', 'Pz')])
+        self.assertEqual(index.suggest('p', 2), [('artwork', 'Pz'), ('artwork', 'Paint 000')])
+        index.discard(('artwork', 0))
+        self.assertEqual(index.suggest('p', 2), [('artwork', 'Pz'), ('artwork', 'Paint 001')])
+
+    def test_writes_only_invalidate_their_own_prefixes(self):
+        index = SuggestionIndex()
+        with patch.object(SuggestionIndex, '_read', return_value=([], {}, {})):
+            index.suggest('p')
+        index.update(('artwork', 1), [('artwork', 'Pastel dunes')])
+        self.assertEqual(index.suggest('p'), [('artwork', 'Pastel dunes')])
+        with patch.object(index, '_rank', wraps=index._rank) as rank:
+            index.update(('artwork', 2), [('artwork', 'Seascape')])
+            index.suggest('p')
+            self.assertEqual(rank.call_count, 0)
+            index.update(('artwork', 3), [('artwork', 'Stormy pier')])
+            self.assertEqual(index.suggest('p'), [('artwork', 'Stormy pier'), ('artwork', 'Pastel dunes')])
+            self.assertEqual(rank.call_count, 1)
+
+    def test_bulk_availability_changes_update_suggestions(self):
+        admin_user = CustomUser.objects.create_user(username='staff', password='x', user_type='admin')
+        artwork = Artwork.objects.create(
+            artist=CustomUser.objects.get(username='monet'), category=self.category, title='Water lilies',
+            description='Oil', price=10, image='artworks/a.jpg', watermarked_image='watermarked/a.jpg',
+            perceptual_hash='ab' * 32,
+        )
+        self.assertEqual(self.suggest('lil'), [('artwork', 'Water lilies')])
+        client = APIClient()
+        client.force_authenticate(admin_user)
+        client.post('/api/admin/bulk/artworks/', {'artwork_ids': [artwork.id], 'action': 'reject'}, format='json')
+        self.assertEqual(self.suggest('lil'), [])
+        with patch.object(ArtworkAdmin, 'message_user'):
+            ArtworkAdmin(Artwork, admin.site).approve_artworks(None, Artwork.objects.all())
+        self.assertEqual(self.suggest('lil'), [('artwork', 'Water lilies')])
+
+    def test_reload_reads_outside_the_lock(self):
+        index = SuggestionIndex()
+        with patch.object(SuggestionIndex, '_read', return_value=([], {}, {})):
+            index.suggest('s')
+        index.update(('artwork', 1), [('artwork', 'Seascape')])
+        seen = []
+
+        def read():
+            # Another request is served from the old index meanwhile, and its writes are kept
+            reader = threading.Thread(target=lambda: seen.append(index.suggest('sea')))
+            reader.start()
+            reader.join(timeout=5)
+            index.update(('artwork', 2), [('artwork', 'Sea wall')])
+            return SuggestionIndex._entries_of({('artwork', 3): [('artwork', 'Seabirds')]})
+
+        with patch.object(SuggestionIndex, 'MAX_AGE', -1), patch.object(SuggestionIndex, '_read', side_effect=read):
+            index.suggest('sea')
+        self.assertEqual(seen, [[('artwork', 'Seascape')]])
+        with patch.object(SuggestionIndex, 'MAX_AGE', 3600):
+            self.assertEqual(index.suggest('sea'), [('artwork', 'Sea wall'), ('artwork', 'Seabirds')])
+
+
+class SkillTagTests(TestCase):
+    """Skill filters are exact matches on the normalized skill tags"""
+
+    def setUp(self):
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='x', user_type='buyer')
+        for username, skills in [('ana', 'Art, Painting'), ('ben', 'cartoon,  painting '), ('cy', 'art')]:
+            user = CustomUser.objects.create_user(username=username, password='x', user_type='artist')
+            ArtistProfile.objects.create(user=user, skills=skills)
+        self.client = APIClient()
+
+    def create_job(self, title, required_skills):
+        return Job.objects.create(
+            buyer=self.buyer, title=title, description='A wall', budget_min=10, budget_max=20,
+            duration_days=5, required_skills=required_skills, deadline=timezone.now() + timedelta(days=9),
+        )
+
+    def usernames(self, queryset):
+        return sorted(queryset.values_list('user__username', flat=True))
+
+    def test_saves_sync_the_tags(self):
+        self.assertEqual(list(Skill.objects.values_list('name', flat=True)), ['art', 'cartoon', 'painting'])
+        profile = ArtistProfile.objects.get(user__username='cy')
+        profile.skills = 'Sculpture'
+        profile.save(update_fields=['skills'])
+        self.assertEqual([skill.name for skill in profile.skill_tags.all()], ['sculpture'])
+
+        job = self.create_job('Mural', 'painting, Art')
+        self.assertEqual([skill.name for skill in job.skill_tags.all()], ['art', 'painting'])
+
+    def test_filtersets_match_whole_skills(self):
+        profiles = ArtistProfile.objects.all()
+        self.assertEqual(self.usernames(ArtistProfileFilter({'skills': 'ART'}, queryset=profiles).qs), ['ana', 'cy'])
+        self.assertEqual(self.usernames(ArtistProfileFilter({'skills': 'art,painting'}, queryset=profiles).qs), ['ana'])
+        self.assertFalse(ArtistProfileFilter({'skills': 'art,welding'}, queryset=profiles).qs.exists())
+
+        self.create_job('Mural', 'painting')
+        self.create_job('Comic', 'cartoon')
+        jobs = JobFilter({'skills': 'cartoon'}, queryset=Job.objects.all()).qs
+        self.assertEqual(list(jobs.values_list('title', flat=True)), ['Comic'])
+
+    def test_global_search_filters_by_skills(self):
+        self.create_job('Painted mural', 'painting, art')
+        self.create_job('Painted comic', 'painting, cartoon')
+        data = self.client.get('/api/search/', {'q': 'painted', 'skills': 'Art'}).data
+        self.assertEqual([job['title'] for job in data['jobs']], ['Painted mural'])
+        self.assertEqual(data['skills'], ['art'])
+
+
+class JobRecommendationTests(TestCase):
+    """Recommended artists are precomputed per job and kept current by signals"""
+
+    def setUp(self):
+        self.buyer = CustomUser.objects.create_user(username='buyer', password='x', user_type='buyer')
+        self.profiles = {}
+        with self.captureOnCommitCallbacks(execute=True):
+            for username, skills, level, rate, rating in [
+                ('ana', 'painting, murals', 'expert', 20, '4.50'),
+                ('ben', 'painting', 'beginner', 20, '5.00'),
+                ('cy', 'murals, painting', 'expert', 500, '4.50'),
+                ('dee', 'sculpture', 'expert', 10, '5.00'),
+            ]:
+                user = CustomUser.objects.create_user(username=username, password='x', user_type='artist')
+                self.profiles[username] = ArtistProfile.objects.create(
+                    user=user, skills=skills, experience_level=level, hourly_rate=rate, rating=Decimal(rating)
+                )
+            self.job = Job.objects.create(
+                buyer=self.buyer, title='Mural', description='A wall', budget_min=500, budget_max=1000,
+                duration_days=5, required_skills='Painting, Murals', experience_level='expert',
+                deadline=timezone.now() + timedelta(days=9),
+            )
+        self.client = APIClient()
+
+    def recommended(self):
+        response = self.client.get(f'/api/jobs/{self.job.id}/recommended-artists/')
+        return [row['username'] for row in response.data['results']]
+
+    def test_ranks_by_skills_experience_and_rate(self):
+        # dee shares no skill; cy is over budget; ben matches half the skills at a lower level
+        self.assertEqual(self.recommended(), ['ana', 'cy', 'ben'])
+        first = self.job.recommendations.first()
+        self.assertEqual((first.rank, first.matched_skills), (1, 2))
+
+        with CaptureQueriesContext(connection) as context:
+            self.recommended()
+        self.assertLessEqual(len(context.captured_queries), 3)
+
+    def test_signals_refresh_the_lists(self):
+        ben = self.profiles['ben']
+        ben.skills, ben.experience_level = 'painting, murals', 'expert'
+        with self.captureOnCommitCallbacks(execute=True):
+            ben.save()
+        self.assertEqual(self.recommended(), ['ben', 'ana', 'cy'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profiles['ana'].delete()
+        self.assertEqual(self.recommended(), ['ben', 'cy'])
+
+        self.job.required_skills = 'sculpture'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.save()
+        self.assertEqual(self.recommended(), ['dee'])
+
+        self.job.status = 'cancelled'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.job.save(update_fields=['status'])
+        self.assertFalse(JobRecommendation.objects.exists())
+
+    def test_saves_keeping_the_ranking_fields_skip_rescoring(self):
+        ana = self.profiles['ana']
+        ana.bio, ana.hourly_rate = 'Murals since 2001', Decimal('20.00')
+        with self.captureOnCommitCallbacks() as callbacks:
+            ana.save()
+            self.job.description = 'A longer wall'
+            self.job.save()
+        self.assertEqual(callbacks, [])
+
+    @override_settings(JOB_RECOMMENDATION_ASYNC=True)
+    def test_async_refreshes_are_queued_for_the_worker(self):
+        ben = self.profiles['ben']
+        ben.skills, ben.experience_level = 'painting, murals', 'expert'
+        with self.captureOnCommitCallbacks() as callbacks:
+            ben.save()
+            ben.save(update_fields=['skills', 'experience_level'])
+            self.job.required_skills = 'Painting, Murals, Sculpture'
+            self.job.save()
+        self.assertEqual(callbacks, [])
+        self.assertEqual(RecommendationRefresh.objects.count(), 2)
+        self.assertEqual(self.recommended(), ['ana', 'cy', 'ben'])
+
+        out = StringIO()
+        call_command('process_recommendation_refreshes', once=True, stdout=out)
+        self.assertIn('Ran 2 queued refreshes', out.getvalue())
+        self.assertFalse(RecommendationRefresh.objects.exists())
+        self.assertEqual(self.recommended(), ['ben', 'ana', 'cy', 'dee'])
+
+    @override_settings(JOB_RECOMMENDATION_TOP_K=2)
+    def test_command_rebuilds_top_k(self):
+        JobRecommendation.objects.all().delete()
+        out = StringIO()
+        call_command('refresh_job_recommendations', stdout=out)
+        self.assertIn('Stored 2 recommendations for 1 open jobs', out.getvalue())
+        self.assertEqual(self.recommended(), ['ana', 'cy'])
@@ -0,0 +1,61 @@
+"""
+Time-decayed trending score of artworks.
+
+An event of weight w at time t is worth w * 2 ** -((now - t) / half_life)
+now. Artwork.trending_score stores the log2 of the sum of all events, each
+decayed to a fixed EPOCH instead of to now:
+
+    trending_score = log2(sum(w * 2 ** ((t - EPOCH) / half_life)))
+
+Moving "now" forward scales every artwork's sum by the same factor, so the
+stored score never has to be decayed and ordering by it is ordering by the
+current decayed score. New events are folded in with logaddexp2, which is
+what lets the recompute_trending command work incrementally. The events
+are new likes and newly counted unique viewers (see api.unique_views).
+"""
+
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+DEFAULT_HALF_LIFE_HOURS = 24
+DEFAULT_MIN_SCORE = 10
+
+LIKE_WEIGHT = 3
+VIEWER_WEIGHT = 1
+
+
+def half_life_seconds():
+    return getattr(settings, 'ARTWORK_TRENDING_HALF_LIFE_HOURS', DEFAULT_HALF_LIFE_HOURS) * 3600
+
+
+def event_score(weight, at):
+    """Log-domain score of one event of the given weight at time `at`"""
+    return float(np.log2(weight)) + (at - EPOCH).total_seconds() / half_life_seconds()
+
+
+def add_events(score, event_scores):
+    """Fold log-domain event scores into a stored score"""
+    return float(np.logaddexp2.reduce([score, *event_scores]))
+
+
+def decayed_score(score, now=None):
+    """The stored score as a plain decayed engagement value at `now`"""
+    now = now or timezone.now()
+    return 2 ** (score - (now - EPOCH).total_seconds() / half_life_seconds())
+
+
+def score_cutoff(min_score=None, now=None):
+    """
+    Stored score an artwork needs to be trending at `now`, i.e. a decayed
+    engagement of at least min_score. Filtering on it is an index range scan.
+    """
+    if min_score is None:
+        min_score = getattr(settings, 'ARTWORK_TRENDING_MIN_SCORE', DEFAULT_MIN_SCORE)
+    now = now or timezone.now()
+    return float(np.log2(min_score)) + (now - EPOCH).total_seconds() / half_life_seconds()
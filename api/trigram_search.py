@@ -0,0 +1,145 @@
+"""
+Typo-tolerant search over artwork titles and artist usernames and skills.
+
+Every word of an indexed field is split into trigrams, padded like
+PostgreSQL's pg_trgm ("paint" -> "  p", " pa", "pai", "ain", "int", "nt "),
+and stored as (trigram, kind, object_id, word) rows in SearchTrigram. A
+query word is compared with the indexed words that share trigrams with it,
+found with an index lookup per trigram, so the candidates grow with the
+number of similar words rather than with the catalog. Words are scored by
+
+    shared / (query trigrams + word trigrams - shared)
+
+and a document by the mean over the query words of its best word's score.
+The signals in api.signals keep the postings in sync; the
+rebuild_trigram_index command refills them.
+"""
+
+import math
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import ArtistProfile, Artwork, SearchTrigram
+from .search_index import ARTIST, ARTWORK
+
+
+DEFAULT_THRESHOLD = 0.3
+MAX_WORD_LENGTH = 64
+
+DOCUMENTS = {
+    ARTWORK: (Artwork.objects.only('pk', 'title'), lambda artwork: [artwork.title]),
+    ARTIST: (
+        ArtistProfile.objects.select_related('user').only('pk', 'skills', 'user__username'),
+        lambda profile: [profile.user.username, profile.skills],
+    ),
+}
+
+
+def threshold():
+    return getattr(settings, 'SEARCH_TRIGRAM_THRESHOLD', DEFAULT_THRESHOLD)
+
+
+def words(text):
+    return {word[:MAX_WORD_LENGTH] for word in re.findall(r'\w+', (text or '').lower())}
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def document_postings(texts):
+    """(trigram, word) postings of a document's texts"""
+    return [
+        (trigram, word)
+        for word in set().union(*(words(text) for text in texts))
+        for trigram in trigrams(word)
+    ]
+
+
+def _postings(kind, objects):
+    build = DOCUMENTS[kind][1]
+    return [
+        SearchTrigram(trigram=trigram, kind=kind, object_id=obj.pk, word=word)
+        for obj in objects
+        for trigram, word in document_postings(build(obj))
+    ]
+
+
+def index_objects(kind, objects):
+    """Replace the postings of the given artworks or artist profiles"""
+    with transaction.atomic():
+        SearchTrigram.objects.filter(kind=kind, object_id__in=[obj.pk for obj in objects]).delete()
+        SearchTrigram.objects.bulk_create(_postings(kind, objects), batch_size=1000)
+
+
+def remove_objects(kind, pks):
+    SearchTrigram.objects.filter(kind=kind, object_id__in=list(pks)).delete()
+
+
+def rebuild(batch_size=1000):
+    """Refill every posting, in keyset chunks; {kind: documents}"""
+    counts = {}
+    with transaction.atomic():
+        SearchTrigram.objects.all().delete()
+        for kind, (queryset, _) in DOCUMENTS.items():
+            counts[kind] = 0
+            last_id = 0
+            while True:
+                batch = list(queryset.filter(pk__gt=last_id).order_by('pk')[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].pk
+                SearchTrigram.objects.bulk_create(_postings(kind, batch), batch_size=1000)
+                counts[kind] += len(batch)
+    return counts
+
+
+def _word_scores(kind, word, min_score, queryset=None):
+    """{object_id: best score of its words against `word`}, for rows of `queryset` if given"""
+    query = trigrams(word)
+    # shared / (q + w - shared) >= min_score needs shared >= min_score * q / (1 + min_score)
+    min_shared = max(1, math.ceil(min_score * len(query) / (1 + min_score) - 1e-9))
+    candidates = SearchTrigram.objects.filter(kind=kind, trigram__in=query).values(
+        'object_id', 'word'
+    ).annotate(shared=Count('id')).filter(shared__gte=min_shared).order_by()
+    if queryset is not None:
+        candidates = candidates.filter(object_id__in=queryset.order_by().values('pk'))
+
+    scores = {}
+    for row in candidates:
+        shared = row['shared']
+        score = shared / (len(query) + len(trigrams(row['word'])) - shared)
+        if score > scores.get(row['object_id'], 0):
+            scores[row['object_id']] = score
+    return scores
+
+
+def fuzzy_ids(kind, text, limit=100, min_score=None, queryset=None):
+    """
+    [(object_id, score)] of the documents most similar to `text`, best
+    first; only rows of `queryset` if given, filtered before the limit
+    """
+    query_words = words(text)
+    if not query_words:
+        return []
+    min_score = threshold() if min_score is None else min_score
+    totals = {}
+    for word in query_words:
+        for object_id, score in _word_scores(kind, word, min_score, queryset).items():
+            totals[object_id] = totals.get(object_id, 0) + score
+    ranked = sorted(
+        ((object_id, total / len(query_words)) for object_id, total in totals.items()),
+        key=lambda item: (-item[1], item[0])
+    )
+    return [(object_id, score) for object_id, score in ranked if score >= min_score][:limit]
+
+
+def fuzzy(queryset, kind, text, limit):
+    """The first `limit` rows of the queryset most similar to `text`"""
+    ids = [object_id for object_id, _ in fuzzy_ids(kind, text, limit, queryset=queryset)]
+    rows = queryset.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
@@ -0,0 +1,134 @@
+"""
+Unique-viewer counting with HyperLogLog sketches.
+
+Every artwork gets one sketch per day (ArtworkViewSketch). A viewer, the user
+id when logged in or a hash of the client IP otherwise, is hashed to 64 bits.
+The top PRECISION bits pick one of REGISTER_COUNT registers, and the register
+keeps the highest rank (leading zeros + 1) seen among the remaining bits.
+Sketches of several days or several artworks merge by taking the
+register-wise maximum, so unique viewers over any date range are counted
+without storing a row per view. The standard error is 1.04 / sqrt(2048),
+about 2.3%.
+
+Registers are stored zlib-compressed; a day with a handful of viewers takes
+a few dozen bytes, a saturated sketch at most REGISTER_COUNT.
+"""
+
+import hashlib
+import math
+import zlib
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+PRECISION = 11
+REGISTER_COUNT = 1 << PRECISION
+_RANK_BITS = 64 - PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTER_COUNT)
+
+
+def client_address(request):
+    """
+    IP of the client. X-Forwarded-For can be set by anyone, so it is only
+    read behind TRUSTED_PROXY_COUNT proxies: each appends the address it saw,
+    and the entry the outermost trusted proxy added is the client.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    if proxies > 0:
+        forwarded = [part.strip() for part in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')]
+        forwarded = [part for part in forwarded if part]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def viewer_hash(request):
+    """
+    64-bit hash identifying the viewer of a request. The IP is hashed with
+    SECRET_KEY so the raw address never leaves the request.
+    """
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        key = f'user:{user.pk}'
+    else:
+        key = f'ip:{client_address(request)}'
+    digest = hashlib.blake2b(
+        key.encode(), digest_size=8, key=settings.SECRET_KEY.encode()[:64]
+    ).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HyperLogLog:
+    """Register array of one sketch; merge with |= and count with len()"""
+
+    __slots__ = ('registers',)
+
+    def __init__(self, registers=None):
+        if registers is None:
+            registers = np.zeros(REGISTER_COUNT, dtype=np.uint8)
+        self.registers = registers
+
+    @classmethod
+    def from_bytes(cls, data):
+        registers = np.frombuffer(zlib.decompress(data), dtype=np.uint8).copy()
+        if registers.size != REGISTER_COUNT:
+            raise ValueError(f'Sketch has {registers.size} registers, expected {REGISTER_COUNT}')
+        return cls(registers)
+
+    def to_bytes(self):
+        return zlib.compress(self.registers.tobytes())
+
+    def add(self, value):
+        """Add a 64-bit hash"""
+        index = value >> _RANK_BITS
+        rank = _RANK_BITS - (value & ((1 << _RANK_BITS) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def __ior__(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def __len__(self):
+        return estimate(self.registers)
+
+
+def estimate(registers):
+    """Cardinality estimate of one register array, with the small-range correction"""
+    raw = _ALPHA * REGISTER_COUNT * REGISTER_COUNT / np.ldexp(1.0, -registers.astype(np.int32)).sum()
+    zeros = REGISTER_COUNT - np.count_nonzero(registers)
+    if raw <= 2.5 * REGISTER_COUNT and zeros:
+        return round(REGISTER_COUNT * math.log(REGISTER_COUNT / zeros))
+    return round(raw)
+
+
+def _sketches(artwork_ids, days):
+    from .models import ArtworkViewSketch
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    return ArtworkViewSketch.objects.filter(
+        artwork_id__in=artwork_ids, day__gte=since
+    ).values_list('artwork_id', 'registers')
+
+
+def unique_viewers_by_artwork(artwork_ids, days=7):
+    """{artwork_id: unique viewers over the last `days` days, today included}"""
+    merged = {}
+    for artwork_id, data in _sketches(artwork_ids, days):
+        sketch = HyperLogLog.from_bytes(data)
+        if artwork_id in merged:
+            merged[artwork_id] |= sketch
+        else:
+            merged[artwork_id] = sketch
+    return {artwork_id: len(sketch) for artwork_id, sketch in merged.items()}
+
+
+def unique_viewers(artwork_ids, days=30):
+    """Distinct viewers of any of the artworks over the last `days` days"""
+    merged = HyperLogLog()
+    for _, data in _sketches(artwork_ids, days):
+        merged |= HyperLogLog.from_bytes(data)
+    return len(merged)
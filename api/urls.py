@@ -55,6 +55,7 @@ urlpatterns = [
     
     # ===== Global Search =====
     path('search/', global_search, name='global-search'),
+    path('search/suggest/', search_suggest, name='search-suggest'),
     
     # ===== Artist Profile Custom Actions =====
     path('artist-profiles/<int:pk>/reviews/', 
@@ -84,6 +85,9 @@ urlpatterns = [
     path('jobs/<int:pk>/bids/', 
          JobViewSet.as_view({'get': 'bids'}), 
          name='job-bids'),
+    path('jobs/<int:pk>/recommended-artists/', 
+         JobViewSet.as_view({'get': 'recommended_artists'}), 
+         name='job-recommended-artists'),
     path('jobs/<int:pk>/hire/', 
          JobViewSet.as_view({'post': 'hire_artist'}), 
          name='hire-artist'),
@@ -212,6 +216,9 @@ ARTWORKS:
 - DELETE /api/artworks/{id}/
 - POST   /api/artworks/{id}/like/
 - GET    /api/artworks/featured/
+- GET    /api/artworks/trending/
+- GET    /api/artworks/{id}/processing-status/
+- GET    /api/artworks/{id}/renditions/{thumbnail|medium|large}.{webp|jpeg}/
 
 JOBS:
 - GET    /api/jobs/
@@ -221,6 +228,7 @@ JOBS:
 - PATCH  /api/jobs/{id}/
 - DELETE /api/jobs/{id}/
 - GET    /api/jobs/{id}/bids/
+- GET    /api/jobs/{id}/recommended-artists/
 - POST   /api/jobs/{id}/hire/
 - POST   /api/jobs/{id}/complete/
 
@@ -296,9 +304,11 @@ ANALYTICS (Admin only):
 - GET    /api/analytics/
 - GET    /api/analytics/{id}/
 - POST   /api/analytics/calculate-today/
+- GET    /api/analytics/rollups/
 
 SEARCH:
 - GET    /api/search/?q=keyword
+- GET    /api/search/suggest/?q=prefix
 
 DASHBOARD:
 - GET    /api/dashboard/stats/
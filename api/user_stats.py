@@ -0,0 +1,172 @@
+"""
+Materialized per-user dashboard statistics.
+
+UserDashboardStats holds one row of counters per user so that dashboard_stats
+is a single primary-key read. The counters are split into groups, one per
+source table. The signals in api.signals recompute only the groups a saved or
+deleted row affects, for only the users it references, with one grouped
+aggregate query per group. Code that bypasses the save signals with
+QuerySet.update() calls refresh_user_stats itself. The rebuild_user_stats
+command recomputes every group for every user to correct any drift.
+"""
+
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import (
+    ArtistProfile, Artwork, Bid, CustomUser, Job, Order, Payment, Review, UserDashboardStats
+)
+
+
+RECENT_REVIEWS = 5
+COMPLETED_ORDER_STATUSES = ['delivered', 'completed']
+
+_json_encoder = JSONEncoder()
+
+
+def _grouped(queryset, user_field, **aggregates):
+    rows = queryset.order_by().values(user_field).annotate(**aggregates)
+    return {row.pop(user_field): row for row in rows}
+
+
+def _hired_jobs(user_ids):
+    return _grouped(
+        Job.objects.filter(hired_artist_id__in=user_ids), 'hired_artist_id',
+        total_projects=Count('id', filter=Q(status='completed')),
+        ongoing_projects=Count('id', filter=Q(status='in_progress')),
+    )
+
+
+def _posted_jobs(user_ids):
+    return _grouped(
+        Job.objects.filter(buyer_id__in=user_ids), 'buyer_id',
+        projects_posted=Count('id'),
+        active_jobs=Count('id', filter=Q(status='open')),
+        ongoing_posted_projects=Count('id', filter=Q(status='in_progress')),
+    )
+
+
+def _bids(user_ids):
+    return _grouped(
+        Bid.objects.filter(artist_id__in=user_ids, status='pending'), 'artist_id',
+        active_bids=Count('id'),
+    )
+
+
+def _artworks(user_ids):
+    return _grouped(
+        Artwork.objects.filter(artist_id__in=user_ids, is_available=True), 'artist_id',
+        total_artworks=Count('id'),
+    )
+
+
+def _earnings(user_ids):
+    return _grouped(
+        Payment.objects.filter(payee_id__in=user_ids, status='completed'), 'payee_id',
+        total_earnings=Sum('amount'),
+    )
+
+
+def _payments(user_ids):
+    return _grouped(
+        Payment.objects.filter(payer_id__in=user_ids), 'payer_id',
+        total_spent=Sum('amount', filter=Q(status='completed')),
+        pending_payments=Count('id', filter=Q(status='pending')),
+    )
+
+
+def _orders(user_ids):
+    completed = Q(status__in=COMPLETED_ORDER_STATUSES)
+    return _grouped(
+        Order.objects.filter(buyer_id__in=user_ids), 'buyer_id',
+        total_orders=Count('id'),
+        pending_orders=Count('id', filter=Q(status='pending')),
+        completed_orders=Count('id', filter=completed),
+        completed_order_total=Sum('total_amount', filter=completed),
+    )
+
+
+def _reviews(user_ids):
+    stats = {
+        user_id: {'current_rating': rating}
+        for user_id, rating in ArtistProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'rating')
+    }
+    reviews = Review.objects.filter(artist_id__in=user_ids).order_by('artist_id', '-created_at').values(
+        'artist_id', 'rating', 'comment', 'created_at'
+    )
+    for review in reviews:
+        recent = stats.setdefault(review.pop('artist_id'), {}).setdefault('recent_reviews', [])
+        if len(recent) < RECENT_REVIEWS:
+            # Stored as JSON, rendered exactly as the API renders datetimes
+            review['created_at'] = _json_encoder.default(review['created_at'])
+            recent.append(review)
+    return stats
+
+
+# group name: (compute function, {field: value when the user has no rows})
+STAT_GROUPS = {
+    'hired_jobs': (_hired_jobs, {'total_projects': 0, 'ongoing_projects': 0}),
+    'posted_jobs': (_posted_jobs, {'projects_posted': 0, 'active_jobs': 0, 'ongoing_posted_projects': 0}),
+    'bids': (_bids, {'active_bids': 0}),
+    'artworks': (_artworks, {'total_artworks': 0}),
+    'earnings': (_earnings, {'total_earnings': Decimal('0')}),
+    'payments': (_payments, {'total_spent': Decimal('0'), 'pending_payments': 0}),
+    'orders': (_orders, {
+        'total_orders': 0, 'pending_orders': 0, 'completed_orders': 0, 'completed_order_total': Decimal('0'),
+    }),
+    'reviews': (_reviews, {'current_rating': Decimal('0'), 'recent_reviews': []}),
+}
+
+
+def compute_user_stats(user_ids, groups=None):
+    """{user_id: {field: value}} for the given stat groups (all by default)"""
+    stats = {user_id: {} for user_id in user_ids}
+    for group in groups or STAT_GROUPS:
+        compute, defaults = STAT_GROUPS[group]
+        rows = compute(user_ids)
+        for user_id, values in stats.items():
+            row = rows.get(user_id, {})
+            for field, default in defaults.items():
+                value = row.get(field)
+                values[field] = default if value is None else value
+    return stats
+
+
+def refresh_user_stats(user_ids, *groups):
+    """Recompute the given stat groups (all by default) of the given users"""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    groups = groups or tuple(STAT_GROUPS)
+    existing = UserDashboardStats.objects.in_bulk(user_ids)
+    # New rows need every group; users deleted meanwhile are skipped
+    missing = set(
+        CustomUser.objects.filter(pk__in=user_ids - existing.keys()).values_list('pk', flat=True)
+    )
+
+    if existing:
+        stats = compute_user_stats(list(existing), groups)
+        now = timezone.now()
+        for row in existing.values():
+            for field, value in stats[row.pk].items():
+                setattr(row, field, value)
+            row.updated_at = now
+        fields = [field for group in groups for field in STAT_GROUPS[group][1]]
+        UserDashboardStats.objects.bulk_update(list(existing.values()), fields + ['updated_at'])
+    if missing:
+        UserDashboardStats.objects.bulk_create([
+            UserDashboardStats(user_id=user_id, **values)
+            for user_id, values in compute_user_stats(missing).items()
+        ], ignore_conflicts=True)
+
+
+def get_user_stats(user):
+    """The user's stats row, built on first use"""
+    try:
+        return UserDashboardStats.objects.get(pk=user.pk)
+    except UserDashboardStats.DoesNotExist:
+        refresh_user_stats([user.pk])
+        return UserDashboardStats.objects.get(pk=user.pk)
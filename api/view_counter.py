@@ -0,0 +1,168 @@
+"""
+Write-behind buffer for artwork view counts.
+
+Artwork detail views are counted in memory and written to the database in
+batches, as one atomic `views_count = views_count + n` UPDATE per distinct n.
+A GET therefore no longer takes SQLite's write lock, and concurrent views
+are never lost to a read-modify-write race.
+
+Each worker process keeps its own buffer. It is flushed from the request
+that finds it older than ARTWORK_VIEW_FLUSH_INTERVAL seconds or holding
+ARTWORK_VIEW_FLUSH_THRESHOLD views, and once more when the process exits.
+Views still buffered when a process is killed are lost.
+
+When the viewer is known, the view is also added to an in-memory HyperLogLog
+sketch of the artwork's viewers for the day (see api.unique_views). A flush
+merges those into the stored ArtworkViewSketch rows.
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .unique_views import HyperLogLog
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_INTERVAL = 10  # seconds
+DEFAULT_FLUSH_THRESHOLD = 500  # buffered views
+
+
+class ViewCounter:
+    """Per-process accumulator of artwork views, flushed in batches"""
+
+    def __init__(self, flush_interval=None, flush_threshold=None):
+        self.flush_interval = flush_interval
+        self.flush_threshold = flush_threshold
+        self._pending = Counter()
+        self._pending_total = 0
+        self._sketches = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _interval(self):
+        if self.flush_interval is not None:
+            return self.flush_interval
+        return getattr(settings, 'ARTWORK_VIEW_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+
+    def _threshold(self):
+        if self.flush_threshold is not None:
+            return self.flush_threshold
+        return getattr(settings, 'ARTWORK_VIEW_FLUSH_THRESHOLD', DEFAULT_FLUSH_THRESHOLD)
+
+    def record(self, artwork_id, viewer=None):
+        """
+        Count one view of an artwork, by the viewer with the given
+        unique_views.viewer_hash if known. Returns the number of its views
+        still buffered after this one, to add to the stored count for display.
+        """
+        with self._lock:
+            if viewer is not None:
+                key = (artwork_id, timezone.localdate())
+                sketch = self._sketches.get(key)
+                if sketch is None:
+                    sketch = self._sketches[key] = HyperLogLog()
+                sketch.add(viewer)
+            self._pending[artwork_id] += 1
+            self._pending_total += 1
+            pending = self._pending[artwork_id]
+            due = (
+                self._pending_total >= self._threshold()
+                or time.monotonic() - self._last_flush >= self._interval()
+            )
+        if due:
+            # The caller's stored count predates this flush, so `pending` is
+            # still what it is missing
+            self.flush()
+        return pending
+
+    def pending(self, artwork_id):
+        """Views of an artwork buffered in this process and not yet written"""
+        with self._lock:
+            return self._pending.get(artwork_id, 0)
+
+    def flush(self):
+        """Write all buffered views to the database; returns the number written"""
+        with self._lock:
+            batch = self._pending
+            sketches = self._sketches
+            self._pending = Counter()
+            self._pending_total = 0
+            self._sketches = {}
+            self._last_flush = time.monotonic()
+        if not batch:
+            return 0
+
+        from .models import Artwork
+
+        # One UPDATE per distinct increment rather than one per artwork
+        by_increment = defaultdict(list)
+        for artwork_id, count in batch.items():
+            by_increment[count].append(artwork_id)
+        try:
+            with transaction.atomic():
+                for count, artwork_ids in by_increment.items():
+                    Artwork.objects.filter(pk__in=artwork_ids).update(
+                        views_count=F('views_count') + count
+                    )
+                if sketches:
+                    self._merge_sketches(sketches)
+        except Exception:
+            logger.exception('Failed to flush %d artwork views, keeping them buffered', sum(batch.values()))
+            with self._lock:
+                self._pending.update(batch)
+                self._pending_total += sum(batch.values())
+                for key, sketch in sketches.items():
+                    if key in self._sketches:
+                        self._sketches[key] |= sketch
+                    else:
+                        self._sketches[key] = sketch
+            return 0
+        return sum(batch.values())
+
+    @staticmethod
+    def _merge_sketches(sketches):
+        """Merge buffered sketches into the stored ones; runs inside flush's transaction"""
+        from .models import Artwork, ArtworkViewSketch
+
+        # Views of artworks deleted since are dropped
+        live_ids = set(
+            Artwork.objects.filter(pk__in={artwork_id for artwork_id, _ in sketches})
+            .values_list('pk', flat=True)
+        )
+        sketches = {key: sketch for key, sketch in sketches.items() if key[0] in live_ids}
+        stored = ArtworkViewSketch.objects.select_for_update().filter(
+            artwork_id__in=live_ids, day__in={day for _, day in sketches}
+        )
+        now = timezone.now()
+        updated = []
+        for row in stored:
+            sketch = sketches.pop((row.artwork_id, row.day), None)
+            if sketch is None:
+                continue
+            sketch |= HyperLogLog.from_bytes(row.registers)
+            row.registers = sketch.to_bytes()
+            row.updated_at = now
+            updated.append(row)
+        ArtworkViewSketch.objects.bulk_update(updated, ['registers', 'updated_at'])
+        ArtworkViewSketch.objects.bulk_create([
+            ArtworkViewSketch(artwork_id=artwork_id, day=day, registers=sketch.to_bytes())
+            for (artwork_id, day), sketch in sketches.items()
+        ])
+
+
+_counter = ViewCounter()
+atexit.register(_counter.flush)
+
+
+def get_view_counter():
+    """The process-wide view counter"""
+    return _counter
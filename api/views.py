@@ -9,12 +9,26 @@ from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 
 from django.shortcuts import get_object_or_404
+from django.http import HttpResponseRedirect
+from django.core.files.storage import default_storage
 from django.db.models import Q, Avg, Count, Sum
 from django.utils import timezone
 import os
+import logging
 from .models import *
 from .serializers import *
 from .permissions import IsOwnerOrReadOnly, IsArtistOrReadOnly, IsBuyerOrReadOnly
+from .pagination import CursorSelectablePaginationMixin
+from .renditions import ensure_rendition
+from .trending import score_cutoff
+from .unique_views import unique_viewers, viewer_hash
+from .stats_cache import get_or_compute
+from .user_stats import get_user_stats, refresh_user_stats
+from .analytics_rollups import rollup_series, rollup_totals
+from . import search_index, trigram_search
+from .suggest_index import get_suggestion_index
+from .skill_tags import filter_by_skills, parse_skills
+from .search_index import IndexedSearchFilter
 from api.notifications.utils import send_notification_email, send_contract_notification_email
 
 
@@ -24,6 +38,8 @@ from django.conf import settings
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+logger = logging.getLogger(__name__)
+
 
 
 # Custom Pagination
@@ -32,6 +48,11 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 100
 
+
+class KeysetResultsSetPagination(CursorSelectablePaginationMixin, StandardResultsSetPagination):
+    """Standard pages, or keyset pages on (created_at, id) with `?pagination=cursor`"""
+
+
 # Authentication Views
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -434,9 +455,10 @@ class ArtistProfileViewSet(ModelViewSet):
     serializer_class = ArtistProfileSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['experience_level', 'is_available']
     search_fields = ['user__username', 'user__first_name', 'user__last_name', 'skills']
+    search_index_kind = search_index.ARTIST
     ordering_fields = ['rating', 'total_projects_completed', 'hourly_rate']
     ordering = ['-rating']
     
@@ -471,12 +493,14 @@ class ArtistProfileViewSet(ModelViewSet):
     def artworks(self, request, pk=None):
         """Get artist artworks"""
         artist_profile = self.get_object()
-        artworks = Artwork.objects.filter(artist=artist_profile.user, is_available=True)
+        artworks = Artwork.objects.select_related('artist', 'category').filter(
+            artist=artist_profile.user, is_available=True
+        )
         page = self.paginate_queryset(artworks)
         if page is not None:
-            serializer = ArtworkListSerializer(page, many=True)
+            serializer = ArtworkListSerializer(page, many=True, context=artwork_list_context(request, page))
             return self.get_paginated_response(serializer.data)
-        serializer = ArtworkListSerializer(artworks, many=True)
+        serializer = ArtworkListSerializer(artworks, many=True, context=artwork_list_context(request, artworks))
         return Response(serializer.data)
 
 
@@ -554,11 +578,14 @@ class ArtworkViewSet(ModelViewSet):
     queryset = Artwork.objects.select_related('artist', 'category').filter(is_available=True)
     serializer_class = ArtworkSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
+    # featured and trending keep their score ordering and page numbers
+    cursor_paginated_actions = ['list']
     parser_classes = [MultiPartParser, FormParser]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'artwork_type', 'is_featured']
     search_fields = ['title', 'description', 'artist__username']
+    search_index_kind = search_index.ARTWORK
     ordering_fields = ['price', 'created_at', 'views_count', 'likes_count']
     ordering = ['-created_at']
     
@@ -571,11 +598,14 @@ class ArtworkViewSet(ModelViewSet):
             queryset = self.queryset
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
+            serializer = self.get_serializer(page, many=True, context=self._list_context(page))
             return self.get_paginated_response(serializer.data)
-        serializer = self.get_serializer(queryset, many=True)
+        serializer = self.get_serializer(queryset, many=True, context=self._list_context(queryset))
         return Response(serializer.data)
 
+    def _list_context(self, artworks):
+        """Serializer context with the user's likes for these artworks prefetched"""
+        return artwork_list_context(self.request, artworks, self.get_serializer_context())
     
     
     
@@ -589,6 +619,20 @@ class ArtworkViewSet(ModelViewSet):
             return [IsAuthenticated(), IsArtistOrReadOnly()]
         return [IsAuthenticatedOrReadOnly()]
     
+    def _processing_kwargs(self):
+        """Defer hashing/watermarking to the background worker when enabled"""
+        if getattr(settings, 'ARTWORK_ASYNC_PROCESSING', False):
+            return {'processing_status': 'pending'}
+        return {}
+    
+    def _upload_hash(self, image_file):
+        """Perceptual hash of an uploaded image, or None if it can't be decoded"""
+        try:
+            return Artwork.hash_image_file(image_file)
+        except Exception as e:
+            logger.error(f"Error hashing uploaded image: {str(e)}")
+            return None
+    
     def create(self, request, *args, **kwargs):
         """Create artwork with duplicate detection"""
         # Validate user is artist
@@ -600,6 +644,7 @@ class ArtworkViewSet(ModelViewSet):
         
         # Check for duplicates before creating artwork
         image_file = request.FILES.get('image')
+        image_hash = None
         if image_file:
             # Check for duplicates with similarity threshold of 5
             # You can adjust this value: 
@@ -607,11 +652,13 @@ class ArtworkViewSet(ModelViewSet):
             # 4-6 = Strict (recommended for production)
             # 7-10 = Moderate 
             # 11+ = Lenient
-            duplicates = Artwork.find_duplicates_for_image(image_file, similarity_threshold=5)
-            
-            # IMPORTANT: Reset file pointer after duplicate check
-            if hasattr(image_file, 'seek'):
-                image_file.seek(0)
+            # The upload is decoded once here and reused by validation and save
+            image_hash = self._upload_hash(image_file)
+            duplicates = []
+            if image_hash:
+                duplicates = Artwork.find_duplicates_for_image(
+                    image_file, similarity_threshold=5, image_hash=image_hash
+                )
             
             if duplicates:
                 # Found potential duplicates - return warning with details
@@ -638,7 +685,12 @@ class ArtworkViewSet(ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        artwork = serializer.save(artist=request.user)
+        # Reuse the hash computed for the duplicate check
+        artwork = serializer.save(
+            artist=request.user,
+            perceptual_hash=image_hash,
+            **self._processing_kwargs()
+        )
         
         # Prepare response
         response_data = {
@@ -695,7 +747,7 @@ class ArtworkViewSet(ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         """Override retrieve to increment views"""
         instance = self.get_object()
-        instance.increment_views()
+        instance.increment_views(viewer_hash(request))
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
@@ -745,13 +797,26 @@ class ArtworkViewSet(ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        """Get featured artworks"""
-        featured_artworks = self.queryset.filter(is_featured=True)
+        """Get featured artworks, most trending first"""
+        featured_artworks = self.queryset.filter(is_featured=True).order_by('-trending_score', '-pk')
         page = self.paginate_queryset(featured_artworks)
         if page is not None:
-            serializer = ArtworkListSerializer(page, many=True)
+            serializer = ArtworkListSerializer(page, many=True, context=self._list_context(page))
+            return self.get_paginated_response(serializer.data)
+        serializer = ArtworkListSerializer(featured_artworks, many=True, context=self._list_context(featured_artworks))
+        return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def trending(self, request):
+        """Get trending artworks, ordered by their decayed engagement score"""
+        trending_artworks = self.queryset.filter(
+            trending_score__gte=score_cutoff()
+        ).order_by('-trending_score', '-pk')
+        page = self.paginate_queryset(trending_artworks)
+        if page is not None:
+            serializer = ArtworkListSerializer(page, many=True, context=self._list_context(page))
             return self.get_paginated_response(serializer.data)
-        serializer = ArtworkListSerializer(featured_artworks, many=True)
+        serializer = ArtworkListSerializer(trending_artworks, many=True, context=self._list_context(trending_artworks))
         return Response(serializer.data)
     
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
@@ -825,6 +890,56 @@ class ArtworkViewSet(ModelViewSet):
             'threshold_used': similarity_threshold
         })
     
+    @action(detail=True, methods=['get'], url_name='renditions',
+            url_path=r'renditions/(?P<size>thumbnail|medium|large)\.(?P<ext>webp|jpeg)')
+    def rendition(self, request, pk=None, size=None, ext=None):
+        """Redirect to a cached rendition of the watermarked image, generating it if needed"""
+        artwork = self.get_object()
+        try:
+            name = ensure_rendition(artwork, size, ext)
+        except Exception as e:
+            logger.error(f"Error generating {size} {ext} rendition for artwork #{artwork.id}: {str(e)}")
+            return Response(
+                {'error': 'Could not generate rendition'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        
+        if name is None:
+            return Response(
+                {'error': 'Artwork image is still being processed',
+                 'processing_status': artwork.processing_status},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        response = HttpResponseRedirect(default_storage.url(name))
+        # Rendition files are named by content, so a redirect stays valid for a while
+        response['Cache-Control'] = 'public, max-age=3600'
+        return response
+    
+    @action(detail=True, methods=['get'], url_path='processing-status')
+    def processing_status(self, request, pk=None):
+        """Background processing state of an uploaded artwork"""
+        artwork = self.get_object()
+        job = ArtworkProcessingJob.objects.filter(artwork=artwork).first()
+        
+        data = {
+            'artwork_id': artwork.id,
+            'processing_status': artwork.processing_status,
+            'watermarked_image': artwork.watermarked_image.url if artwork.watermarked_image else None,
+            'job': None,
+        }
+        if job:
+            data['job'] = {
+                'status': job.status,
+                'attempts': job.attempts,
+                'created_at': job.created_at,
+                'started_at': job.started_at,
+                'completed_at': job.completed_at,
+            }
+            if request.user == artwork.artist:
+                data['job']['last_error'] = job.last_error
+        return Response(data)
+    
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def force_upload(self, request):
         """Force upload artwork even if duplicates are detected (with confirmation)"""
@@ -846,7 +961,15 @@ class ArtworkViewSet(ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        artwork = serializer.save(artist=request.user)
+        # Store the hash now so the upload is in the duplicate index right away,
+        # even when the watermark is left to the background worker
+        image_file = request.FILES.get('image')
+        image_hash = self._upload_hash(image_file) if image_file else None
+        artwork = serializer.save(
+            artist=request.user,
+            perceptual_hash=image_hash,
+            **self._processing_kwargs()
+        )
         
         return Response({
             'message': 'Artwork uploaded successfully (duplicate check bypassed)',
@@ -871,9 +994,10 @@ class JobViewSet(ModelViewSet):
     serializer_class = JobSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     pagination_class = StandardResultsSetPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['category', 'experience_level', 'status']
     search_fields = ['title', 'description', 'required_skills']
+    search_index_kind = search_index.JOB
     ordering_fields = ['budget_min', 'budget_max', 'deadline', 'created_at']
     ordering = ['-created_at']
     
@@ -913,6 +1037,18 @@ class JobViewSet(ModelViewSet):
         return Response(serializer.data)
 
 
+    # --------------------------------------------------
+    #              RECOMMENDED ARTISTS
+    # --------------------------------------------------
+    @action(detail=True, methods=['get'], url_path='recommended-artists')
+    def recommended_artists(self, request, pk=None):
+        """Best matching available artists, precomputed by api.recommendations"""
+        job = self.get_object()
+        recommendations = job.recommendations.select_related('artist_profile__user')
+        serializer = JobRecommendationSerializer(recommendations, many=True)
+        return Response({'job_id': job.id, 'status': job.status, 'results': serializer.data})
+
+
     # --------------------------------------------------
     #              HIRE ARTIST (WITH EMAILS)
     # --------------------------------------------------
@@ -955,7 +1091,10 @@ class JobViewSet(ModelViewSet):
             bid.save()
 
             # Reject all other bids
-            job.bids.exclude(id=bid_id).update(status='rejected')
+            other_bids = job.bids.exclude(id=bid_id)
+            rejected_artist_ids = list(other_bids.values_list('artist_id', flat=True))
+            other_bids.update(status='rejected')
+            refresh_user_stats(rejected_artist_ids, 'bids')
 
             # Step 3: Create contract
             contract = Contract.objects.create(
@@ -1321,7 +1460,7 @@ class PaymentViewSet(ModelViewSet):
     """Payment CRUD operations with Stripe integration"""
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['payment_method', 'status']
     ordering_fields = ['created_at', 'amount']
@@ -1569,7 +1708,10 @@ class PaymentViewSet(ModelViewSet):
         # Update bid statuses
         bid.status = 'accepted'
         bid.save()
-        job.bids.exclude(id=bid_id).update(status='rejected')
+        other_bids = job.bids.exclude(id=bid_id)
+        rejected_artist_ids = list(other_bids.values_list('artist_id', flat=True))
+        other_bids.update(status='rejected')
+        refresh_user_stats(rejected_artist_ids, 'bids')
 
         try:
             # 🔹 Step 2: Create Stripe PaymentIntent
@@ -1684,7 +1826,7 @@ class MessageViewSet(ModelViewSet):
     """Message CRUD operations"""
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['is_read', 'job']
     ordering_fields = ['created_at']
@@ -1869,7 +2011,7 @@ class NotificationViewSet(ReadOnlyModelViewSet):
     """Notification read operations"""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = KeysetResultsSetPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['notification_type', 'is_read']
     ordering = ['-created_at']
@@ -1901,7 +2043,7 @@ class NotificationViewSet(ReadOnlyModelViewSet):
 
 # Analytics Views (Admin only)
 class PlatformAnalyticsViewSet(ReadOnlyModelViewSet):
-    """Platform analytics for admin"""
+    """Platform analytics for admin, computed from the hourly rollups"""
     queryset = PlatformAnalytics.objects.all()
     serializer_class = PlatformAnalyticsSerializer
     permission_classes = [IsAuthenticated]
@@ -1925,6 +2067,32 @@ class PlatformAnalyticsViewSet(ReadOnlyModelViewSet):
         serializer = self.get_serializer(analytics)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def rollups(self, request):
+        """
+        Activity deltas per hour or day (?granularity=hour|day, default day)
+        over the last ?days (default 30), plus the running totals
+        """
+        if request.user.user_type != 'admin' and not request.user.is_staff:
+            return Response({'error': 'Not authorized'}, status=status.HTTP_403_FORBIDDEN)
+
+        granularity = request.query_params.get('granularity', 'day')
+        if granularity not in ('hour', 'day'):
+            return Response({'error': 'granularity must be hour or day'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = min(max(int(request.query_params.get('days', 30)), 1), 366)
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        since = timezone.now() - timezone.timedelta(days=days)
+        if granularity == 'day':
+            since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        return Response({
+            'granularity': granularity,
+            'totals': rollup_totals(),
+            'results': rollup_series(since, granularity),
+        })
+
 
 
 # Dashboard Views
@@ -1932,69 +2100,53 @@ class PlatformAnalyticsViewSet(ReadOnlyModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    """Get dashboard statistics for current user"""
+    """
+    Get dashboard statistics for current user. Artist and buyer counters are
+    read from their materialized UserDashboardStats row (see api.user_stats).
+    """
     user = request.user
     stats = {}
 
     if user.user_type == 'artist':
-        artist_profile, _ = ArtistProfile.objects.get_or_create(user=user)
-        
-        # Calculate real-time stats
-        total_projects = user.hired_projects.filter(status='completed').count()
-        total_earnings = user.artist_payments.filter(status='completed').aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-        
-        active_bids = user.my_bids.filter(status='pending').count()
-        ongoing_projects = user.hired_projects.filter(status='in_progress').count()
-        total_artworks = user.artworks.filter(is_available=True).count()
+        user_stats = get_user_stats(user)
+        # Distinct people who viewed any of the artist's artworks
+        viewers = get_or_compute(
+            f'dashboard_stats:unique_viewers:{user.pk}',
+            lambda: {
+                'unique_viewers_7d': unique_viewers(user.artworks.values('pk'), days=7),
+                'unique_viewers_30d': unique_viewers(user.artworks.values('pk'), days=30),
+            },
+            ttl=600,
+        )
         
         stats = {
-            'total_projects': total_projects,
-            'total_earnings': float(total_earnings),
-            'current_rating': float(artist_profile.rating),
-            'active_bids': active_bids,
-            'ongoing_projects': ongoing_projects,
-            'total_artworks': total_artworks,
-            'recent_reviews': list(
-                user.reviews.order_by('-created_at')[:5].values('rating', 'comment', 'created_at')
-            ),
+            'total_projects': user_stats.total_projects,
+            'total_earnings': float(user_stats.total_earnings),
+            'current_rating': float(user_stats.current_rating),
+            'active_bids': user_stats.active_bids,
+            'ongoing_projects': user_stats.ongoing_projects,
+            'total_artworks': user_stats.total_artworks,
+            **viewers,
+            'recent_reviews': user_stats.recent_reviews,
         }
 
     elif user.user_type == 'buyer':
-        buyer_profile, _ = BuyerProfile.objects.get_or_create(user=user)
-        
-        # Calculate real-time stats instead of relying on stored values
-        total_orders = user.buyer_orders.count()
-        
-        # Handle case where user has no payments but has orders
-        completed_payments = user.buyer_payments.filter(status='completed')
-        total_spent = completed_payments.aggregate(total=Sum('amount'))['total'] or 0
+        user_stats = get_user_stats(user)
         
         # If no payments but has orders, calculate from order amounts
-        if total_spent == 0 and total_orders > 0:
-            completed_orders = user.buyer_orders.filter(status__in=['delivered', 'completed'])
-            order_total = completed_orders.aggregate(total=Sum('total_amount'))['total'] or 0
-            total_spent = order_total
-        
-        projects_posted = user.posted_jobs.count()
-        active_jobs = user.posted_jobs.filter(status='open').count()
-        ongoing_projects = user.posted_jobs.filter(status='in_progress').count()
-        pending_payments = user.buyer_payments.filter(status='pending').count()
-        
-        # Add more meaningful stats for buyers
-        pending_orders = user.buyer_orders.filter(status='pending').count()
-        completed_orders = user.buyer_orders.filter(status__in=['delivered', 'completed']).count()
+        total_spent = user_stats.total_spent
+        if total_spent == 0 and user_stats.total_orders > 0:
+            total_spent = user_stats.completed_order_total
         
         stats = {
             'total_spent': float(total_spent),
-            'projects_posted': projects_posted,
-            'active_jobs': active_jobs,
-            'ongoing_projects': ongoing_projects,
-            'total_orders': total_orders,
-            'pending_orders': pending_orders,
-            'completed_orders': completed_orders,
-            'pending_payments': pending_payments,
+            'projects_posted': user_stats.projects_posted,
+            'active_jobs': user_stats.active_jobs,
+            'ongoing_projects': user_stats.ongoing_posted_projects,
+            'total_orders': user_stats.total_orders,
+            'pending_orders': user_stats.pending_orders,
+            'completed_orders': user_stats.completed_orders,
+            'pending_payments': user_stats.pending_payments,
         }
 
     elif user.user_type == 'admin':
@@ -2069,45 +2221,96 @@ def dashboard_stats(request):
         }
 
     return Response(stats)
+
+
 # Search Views
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_suggest(request):
+    """
+    Search box suggestions for a prefix, answered from the in-memory
+    suggestion index of this process (see api.suggest_index)
+    """
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 20)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+    suggestions = get_suggestion_index().suggest(query, limit)
+    return Response({
+        'query': query,
+        'suggestions': [{'type': kind, 'text': text} for kind, text in suggestions],
+    })
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def global_search(request):
-    """Global search across artworks, jobs, and artists"""
+    """
+    Global search across artworks, jobs, and artists, ranked by the
+    full-text index where available (see api.search_index). With
+    `?fuzzy=true` artworks and artists are matched by trigram similarity
+    instead, which tolerates misspellings (see api.trigram_search).
+    `?skills=a,b` limits jobs and artists to those tagged with every listed
+    skill (see api.skill_tags).
+    """
     query = request.GET.get('q', '')
     if not query:
         return Response({'error': 'Query parameter required'}, status=status.HTTP_400_BAD_REQUEST)
+    fuzzy = request.GET.get('fuzzy', '').lower() in ('1', 'true', 'yes')
     
+    available_artworks = Artwork.objects.select_related('artist', 'category').filter(is_available=True)
+    open_jobs = Job.objects.filter(status='open')
+    available_artists = ArtistProfile.objects.filter(is_available=True)
+    skills = request.GET.get('skills', '')
+    if skills:
+        open_jobs = filter_by_skills(open_jobs, skills)
+        available_artists = filter_by_skills(available_artists, skills)
+
     # Search artworks
-    artworks = Artwork.objects.filter(
-        Q(title__icontains=query) | 
-        Q(description__icontains=query) |
-        Q(artist__username__icontains=query),
-        is_available=True
-    )[:10]
+    if fuzzy:
+        artworks = trigram_search.fuzzy(available_artworks, search_index.ARTWORK, query, 10)
+    else:
+        artworks = search_index.ranked(available_artworks, search_index.ARTWORK, query, 10)
+    if artworks is None:
+        artworks = available_artworks.filter(
+            Q(title__icontains=query) | 
+            Q(description__icontains=query) |
+            Q(artist__username__icontains=query)
+        )[:10]
     
     # Search jobs
-    jobs = Job.objects.filter(
-        Q(title__icontains=query) |
-        Q(description__icontains=query) |
-        Q(required_skills__icontains=query),
-        status='open'
-    )[:10]
+    jobs = search_index.ranked(open_jobs, search_index.JOB, query, 10)
+    if jobs is None:
+        jobs = open_jobs.filter(
+            Q(title__icontains=query) |
+            Q(description__icontains=query) |
+            Q(required_skills__icontains=query)
+        )[:10]
     
     # Search artists
-    artists = ArtistProfile.objects.filter(
-        Q(user__username__icontains=query) |
-        Q(user__first_name__icontains=query) |
-        Q(user__last_name__icontains=query) |
-        Q(skills__icontains=query),
-        is_available=True
-    )[:10]
+    if fuzzy:
+        artists = trigram_search.fuzzy(available_artists, search_index.ARTIST, query, 10)
+    else:
+        artists = search_index.ranked(available_artists, search_index.ARTIST, query, 10)
+    if artists is None:
+        artists = available_artists.filter(
+            Q(user__username__icontains=query) |
+            Q(user__first_name__icontains=query) |
+            Q(user__last_name__icontains=query) |
+            Q(skills__icontains=query)
+        )[:10]
     
     results = {
-        'artworks': ArtworkListSerializer(artworks, many=True).data,
+        'artworks': ArtworkListSerializer(
+            artworks, many=True, context=artwork_list_context(request, artworks)
+        ).data,
         'jobs': JobListSerializer(jobs, many=True).data,
         'artists': ArtistProfileSerializer(artists, many=True).data,
-        'query': query
+        'query': query,
+        'fuzzy': fuzzy,
+        'skills': parse_skills(skills)
     }
     
     return Response(results)
@@ -192,6 +192,42 @@ ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp']
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
 MIN_IMAGE_DIMENSION = 100  # 100x100 pixels minimum
 MAX_IMAGE_DIMENSION = 10000  # 10000x10000 pixels maximum
+MAX_IMAGE_PIXELS = 50 * 1000 * 1000  # 50 megapixels (~200MB decoded as RGBA)
+
+# Artwork upload post-processing (hash + watermark)
+# When True uploads return immediately and `manage.py process_artwork_jobs` does the work;
+# only enable it where that worker is deployed
+ARTWORK_ASYNC_PROCESSING = os.getenv('ARTWORK_ASYNC_PROCESSING', 'False') == 'True'
+ARTWORK_PROCESSING_MAX_ATTEMPTS = 3
+
+# Artwork detail views are buffered per process and written in batches
+ARTWORK_VIEW_FLUSH_INTERVAL = 10  # seconds
+ARTWORK_VIEW_FLUSH_THRESHOLD = 500  # buffered views
+
+# Reverse proxies in front of the app that append to X-Forwarded-For; 0 ignores the
+# header and identifies anonymous viewers by REMOTE_ADDR, see api/unique_views.py
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+
+# Trending score decay, see api/trending.py and `manage.py recompute_trending`
+ARTWORK_TRENDING_HALF_LIFE_HOURS = 24
+ARTWORK_TRENDING_MIN_SCORE = 10  # decayed likes x3 + unique viewers
+
+# Seconds the admin dashboard statistics are cached, see api/stats_cache.py
+ADMIN_DASHBOARD_CACHE_TTL = 60
+
+# Rows fetched per database round trip by the streaming admin exports
+ADMIN_EXPORT_CHUNK_SIZE = 2000
+
+# Minimum trigram similarity of fuzzy search matches, see api/trigram_search.py
+SEARCH_TRIGRAM_THRESHOLD = 0.3
+
+# Artists stored per open job by the recommendation engine, see api/recommendations.py
+JOB_RECOMMENDATION_TOP_K = 20
+# When False (default) the rescoring still runs in the saving request, right after its
+# transaction commits; a profile save scores the profile against every open job.
+# When True saves only queue it and `manage.py process_recommendation_refreshes` runs it,
+# so enable it where that worker is deployed
+JOB_RECOMMENDATION_ASYNC = os.getenv('JOB_RECOMMENDATION_ASYNC', 'False') == 'True'
 CORS_ALLOW_ALL_ORIGINS = True
 
 